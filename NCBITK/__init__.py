@@ -2,3 +2,18 @@ import NCBITK.config as config
 import NCBITK.sync as sync
 import NCBITK.curate as curate
 import NCBITK.get_resources as get_resources
+import NCBITK.genomes as genomes
+import NCBITK.sketch as sketch
+import NCBITK.taxonomy as taxonomy
+import NCBITK.transfer as transfer
+import NCBITK.export as export
+import NCBITK.fsck as fsck
+import NCBITK.schedule as schedule
+import NCBITK.lease as lease
+import NCBITK.catalog as catalog
+import NCBITK.dedup as dedup
+import NCBITK.views as views
+import NCBITK.contigs as contigs
+import NCBITK.rsync_log as rsync_log
+import NCBITK.plan as plan
+import NCBITK.events as events
@@ -1,31 +1,107 @@
 import logging
 import os
+import sys
 import click
 
-from NCBITK import config, curate, get_resources, sync
+from NCBITK import (catalog, config, contigs, curate, dedup, events, export,
+                    fsck, genomes, get_resources, lease, plan, rsync_log,
+                    schedule, sketch, sync, taxonomy, views)
 
 
-def setup(genbank_mirror, species, update_assembly_summary):
+class DefaultGroup(click.Group):
+    """
+    Fall back to the sync command when the first argument is not a
+    subcommand, so `ncbitk GENBANK [SPECIES]...` keeps working.
+    """
+
+    default_command = 'sync'
+
+    def parse_args(self, ctx, args):
+        if args and args[0] not in self.commands and args[0] != '--help':
+            args.insert(0, self.default_command)
+        return super(DefaultGroup, self).parse_args(ctx, args)
+
+
+def select_taxa(info_dir, assembly_summary, taxa):
+    """
+    Species under taxa.  An unknown taxon or one without species would
+    otherwise select every species in the summary.
+    """
+
+    taxonomy_path = taxonomy.get_taxonomy_path(info_dir)
+    if not os.path.isfile(taxonomy_path):
+        raise click.UsageError(
+            '{} not found; run once with --update-assembly to download the '
+            'taxonomy dump'.format(taxonomy_path))
+    tree = taxonomy.Taxonomy(taxonomy_path)
+    for taxon in taxa:
+        if not tree.resolve(taxon):
+            raise click.BadParameter('Unknown taxon {}'.format(taxon),
+                                     param_hint='--taxon')
+    species = taxonomy.get_taxon_species(assembly_summary, tree, taxa)
+    if not species:
+        raise click.BadParameter(
+            'No species in the assembly summary under {}'.format(
+                ', '.join(taxa)), param_hint='--taxon')
+
+    return species
+
+
+def setup(genbank_mirror, species, update_assembly_summary, taxa=(),
+          sections=('genbank', ), cooperate=False):
     path_vars = config.instantiate_path_vars(genbank_mirror)
     info_dir, slurm, out, logger = path_vars
-    assembly_summary = get_resources.get_resources(genbank_mirror,
-                                                   update_assembly_summary)
+    # a plain species list can be filtered while the summary is read
+    streamed_species = species if species and not taxa else None
+    if cooperate and update_assembly_summary:
+        # one worker refreshes the shared .info files, the rest wait for it
+        # and read its copies
+        refreshed, assembly_summary = lease.run_once(
+            lease.get_resources_lock_path(genbank_mirror),
+            lambda: get_resources.get_resources(
+                genbank_mirror, True, sections, streamed_species))
+        if not refreshed:
+            assembly_summary = get_resources.get_resources(
+                genbank_mirror, False, sections, streamed_species)
+    else:
+        assembly_summary = get_resources.get_resources(
+            genbank_mirror, update_assembly_summary, sections,
+            streamed_species)
+    if taxa:
+        species = tuple(species) + select_taxa(info_dir, assembly_summary,
+                                               taxa)
     species = curate.get_species(assembly_summary, species)
     genbank_status = curate.assess_genbank_mirror(
         genbank_mirror, assembly_summary, species, logger)
+    update_catalog(genbank_mirror, genbank_status[0])
 
     return path_vars, assembly_summary, species, genbank_status
 
 
+def update_catalog(genbank_mirror, local_genomes):
+
+    catalog_path = catalog.get_catalog_path(genbank_mirror)
+    if os.path.isfile(catalog_path):
+        catalog.update_local(catalog_path, local_genomes)
+
+
 def show_genbank_status(genbank_status):
 
-    local_genomes, new_genomes, old_genomes = genbank_status
+    (local_genomes, new_genomes, old_genomes, sketch_files,
+     missing_sketch_files) = genbank_status
     print('{} local genome(s)'.format(len(local_genomes)))
     print('{} new genome(s)'.format(len(new_genomes)))
     print('{} old genome(s)'.format(len(old_genomes)))
+    print('{} sketch file(s)'.format(len(sketch_files)))
+    print('{} missing sketch file(s)'.format(len(missing_sketch_files)))
+
 
+@click.group(cls=DefaultGroup)
+def main():
+    pass
 
-@click.command()
+
+@main.command('sync')
 @click.option('--update/--no-update',
               help='Sync your collection with '
               'the latest assembly versions',
@@ -35,30 +111,324 @@ def show_genbank_status(genbank_status):
               'Or use your local copies.',
               default=True)
 @click.option('--from-file', type=click.File('r'))
+@click.option('--refseq', is_flag=True, default=False,
+              help='Also mirror RefSeq (GCF) assemblies. RefSeq assemblies '
+              'identical to a GenBank assembly are linked, not downloaded.')
+@click.option('--taxon',
+              help='Select every species under a taxon (name or taxid). '
+              'May be given more than once.',
+              multiple=True)
+@click.option('--shards', type=int, default=1,
+              help='Number of concurrent rsync processes. New genomes are '
+              'split between them by expected size.')
+@click.option('--cooperate', is_flag=True, default=False,
+              help='Share the sync with other ncbitk processes pointed at the '
+              'same directory, e.g. on several transfer nodes.')
+@click.option('--batch-size', type=int, default=100,
+              help='Genomes per batch in --cooperate mode.')
+@click.option('--lease-time', type=int, default=600,
+              help='Seconds before an unrenewed batch may be taken over by '
+              'another worker in --cooperate mode.')
 @click.option('--status',
               help='Show the current status of your genome collection',
               is_flag=True,
               default=False)
+@click.option('--plan', 'show_plan', is_flag=True, default=False,
+              help='Report the bytes to transfer, the expected duration and '
+              'the disk space needed, then exit without syncing.')
 @click.argument('genbank')
 @click.argument('species', nargs=-1, required=False)
-def main(update, update_assembly, from_file, status, genbank, species):
+def sync_genbank(update, update_assembly, from_file, refseq, taxon, shards,
+                 cooperate, batch_size, lease_time, status, show_plan, genbank,
+                 species):
+    """
+    Sync the local collection with the latest assembly versions.
+    """
+
     if from_file:
-        species = from_file
+        species = tuple(name.strip() for name in from_file)
+    sections = ('genbank', 'refseq') if refseq else ('genbank', )
     path_vars, assembly_summary, species, genbank_status = setup(
-        genbank, species, update_assembly)
+        genbank, species, update_assembly, taxon, sections, cooperate)
     info_dir, slurm, out, logger = path_vars
-    local_genomes, new_genomes, old_genomes = genbank_status
+    (local_genomes, new_genomes, old_genomes, sketch_files,
+     missing_sketch_files) = genbank_status
     if status:
         show_genbank_status(genbank_status)
+    if show_plan:
+        pairs = curate.get_identical_pairs(assembly_summary)
+        new_genomes, paired_genomes = curate.split_paired_genomes(
+            new_genomes, local_genomes, pairs)
+        transfer_plan = plan.plan_transfer(
+            genbank, assembly_summary, new_genomes,
+            [local_genomes[accession] for accession in old_genomes])
+        for line in plan.format_plan(transfer_plan):
+            click.echo(line)
+        return
     if update:
         curate.create_species_dirs(genbank, logger, species)
-        curate.remove_old_genomes(genbank, assembly_summary,
-                                  local_genomes, old_genomes, logger)
-        sync.rsync_latest_genomes(genbank, assembly_summary,
-                                  new_genomes)
-        curate.post_rsync_cleanup(genbank, assembly_summary, logger)
-        curate.unzip_genbank(genbank)
-        curate.rename_genbank(genbank, assembly_summary)
+        broken = curate.remove_old_genomes(genbank, assembly_summary,
+                                           local_genomes, old_genomes, logger)
+        for accession in broken:
+            del local_genomes[accession]
+        new_genomes = new_genomes + broken
+        pairs = curate.get_identical_pairs(assembly_summary)
+        new_genomes, paired_genomes = curate.split_paired_genomes(
+            new_genomes, local_genomes, pairs)
+        if cooperate:
+            cooperative_sync(genbank, assembly_summary, pairs, new_genomes,
+                             batch_size, lease_time, logger)
+            return
+        priority = species if isinstance(species, (tuple, list)) else None
+        rsync_logs = sync.rsync_latest_genomes(genbank, assembly_summary,
+                                               new_genomes, shards, priority)
+        received = rsync_log.read_rsync_logs(rsync_logs)
+        received.log_stats(logger)
+        received.write_stats(rsync_log.get_rsync_stats_path(genbank))
+        with events.EventStream(events.get_events_dir(genbank)) as stream:
+            received.emit_events(stream)
+        plan.record_throughput(genbank, received.received, received.seconds)
+        schedule.write_remote_sizes(genbank, received.get_sizes())
+        # only the files rsync reports are touched from here on
+        moved = curate.post_rsync_cleanup(genbank, assembly_summary, logger,
+                                          received.get_arrived())
+        unzipped = curate.unzip_genbank(genbank, moved)
+        local_genomes = {accession: path
+                         for accession, path in local_genomes.items()
+                         if accession not in old_genomes}
+        local_genomes.update(
+            curate.rename_genbank(genbank, assembly_summary, unzipped))
+        ingest(genbank, assembly_summary, pairs, local_genomes, logger)
+
+
+def ingest(genbank, assembly_summary, pairs, local_genomes, logger):
+    """
+    Bring links, views, indexes and the catalog up to date with the
+    genomes in local_genomes after new ones arrived.
+    """
+
+    local_genomes.update(curate.link_paired_genomes(
+        genbank, assembly_summary, pairs, logger, local_genomes))
+    dedup.deduplicate(genbank, logger, local_genomes=local_genomes)
+    views.refresh_views(genbank, assembly_summary, logger, local_genomes)
+    genomes.index_genbank(genbank, local_genomes)
+    contigs.update_contig_index(genbank, local_genomes)
+    sketch_files, missing_sketch_files = sketch.get_sketch_files(
+        genbank, local_genomes)
+    sketch.sketch_genbank(genbank, local_genomes, missing_sketch_files,
+                          logger)
+    update_catalog(genbank, local_genomes)
+
+
+def cooperative_sync(genbank, assembly_summary, pairs, new_genomes,
+                     batch_size, lease_time, logger):
+    """
+    Fetch new genomes through leased batches shared with other workers and
+    index and sketch the genomes this worker fetched.  The worker that
+    removes the finished run then ingests the whole mirror like a sync
+    through rsync.
+    """
+
+    run_id = lease.join_run(genbank, new_genomes, batch_size)
+    run_dir = lease.get_run_dir(genbank, run_id)
+    fetched = lease.run_worker(genbank, assembly_summary, run_id, logger,
+                               lease_time)
+    local_genomes = curate.get_local_genomes(genbank)
+    fetched = [accession for accession in fetched
+               if accession in local_genomes]
+    for accession in fetched:
+        genomes.index_genome(genbank, accession, local_genomes[accession])
+    sketch.sketch_genbank(genbank, local_genomes, fetched, logger)
+    if lease.remove_run(run_dir):
+        ingest(genbank, assembly_summary, pairs, local_genomes, logger)
+
+
+@main.command('export')
+@click.option('--species', multiple=True,
+              help='Species to export. May be given more than once.')
+@click.option('--assembly-level', multiple=True,
+              help='e.g. "Complete Genome". May be given more than once.')
+@click.option('--accessions', type=click.File('r'),
+              help='File with one accession per line.')
+@click.option('--format', 'output_format',
+              type=click.Choice(['fasta', 'tar']), default='fasta')
+@click.option('--output', type=click.File('wb'), default='-',
+              help='Output file, default stdout.')
+@click.option('--rename-headers', is_flag=True, default=False,
+              help='Prefix FASTA headers with the curated genome name.')
+@click.option('--threads', type=int, default=4)
+@click.argument('genbank')
+def export_genbank(species, assembly_level, accessions, output_format,
+                   output, rename_headers, threads, genbank):
+    """
+    Stream selected genomes as one multi-FASTA or a tar archive.
+    """
+
+    assembly_summary = get_resources.get_assembly_summary(genbank, False)
+    if accessions:
+        accessions = [line.strip() for line in accessions if line.strip()]
+    selected = export.select_genomes(assembly_summary, species,
+                                     assembly_level, accessions)
+    missing = export.export_genomes(genbank, assembly_summary, selected,
+                                    output, output_format, rename_headers,
+                                    threads)
+    if missing:
+        click.echo('{} selected genome(s) not in the local collection'.format(
+            len(missing)), err=True)
+
+
+@main.command('fsck')
+@click.option('--repair', is_flag=True, default=False,
+              help='Delete broken files so the next sync fetches them again.')
+@click.option('--processes', type=int, default=None)
+@click.argument('genbank')
+def fsck_genbank(repair, processes, genbank):
+    """
+    Check the mirror for broken, orphaned and duplicate genomes.
+    """
+
+    info_dir, slurm, out, logger = config.instantiate_path_vars(genbank)
+    path_assembly_summary = os.path.join(info_dir, 'assembly_summary.txt')
+    assembly_summary = None
+    if os.path.isfile(path_assembly_summary):
+        assembly_summary = get_resources.get_assembly_summary(genbank, False)
+    problems = fsck.scan(genbank, assembly_summary, processes)
+    for problem in problems:
+        click.echo('{}\t{}'.format(problem.path, problem.problem))
+    fsck.write_repair_queue(genbank, problems)
+    if repair:
+        fsck.repair(problems, logger)
+    logger.info('fsck found {} problem(s)'.format(len(problems)))
+
+
+@main.command('query')
+@click.option('--species', multiple=True)
+@click.option('--taxid', multiple=True, type=int,
+              help='Species or assembly taxid.')
+@click.option('--assembly-level', multiple=True)
+@click.option('--accession', multiple=True)
+@click.option('--isolate', help='Isolate or strain name.')
+@click.option('--local/--missing', default=None,
+              help='Only genomes present in / missing from the collection.')
+@click.option('--count', is_flag=True, default=False)
+@click.option('--group-by', type=click.Choice(catalog.COLUMNS + ['local']))
+@click.option('--format', 'output_format',
+              type=click.Choice(['tsv', 'json']), default='tsv')
+@click.argument('genbank')
+def query_genbank(species, taxid, assembly_level, accession, isolate, local,
+                  count, group_by, output_format, genbank):
+    """
+    Filter and count assemblies in the catalog.
+    """
+
+    catalog_path = catalog.get_catalog_path(genbank)
+    if not os.path.isfile(catalog_path):
+        assembly_summary = get_resources.get_assembly_summary(genbank, False)
+        catalog.build_catalog(catalog_path, assembly_summary)
+        catalog.update_local(catalog_path, curate.get_local_genomes(genbank))
+    results = catalog.query(
+        catalog_path,
+        species=species,
+        taxids=taxid,
+        assembly_levels=assembly_level,
+        accessions=accession,
+        isolate=isolate,
+        local=local,
+        count=count,
+        group_by=group_by)
+    if output_format == 'json':
+        catalog.write_json(results, sys.stdout)
+    else:
+        catalog.write_tsv(results, sys.stdout)
+
+
+@main.command('dedup')
+@click.option('--dry-run', is_flag=True, default=False,
+              help='Only report duplicates and the space they use.')
+@click.option('--reflink', is_flag=True, default=False,
+              help='Use reflinks (copy-on-write clones) instead of hard '
+              'links. Requires a filesystem that supports them.')
+@click.argument('genbank')
+def dedup_genbank(dry_run, reflink, genbank):
+    """
+    Replace byte-identical genomes with links to a single copy.
+    """
+
+    info_dir, slurm, out, logger = config.instantiate_path_vars(genbank)
+    reclaimed = dedup.deduplicate(genbank, logger, dry_run, reflink)
+    click.echo('{} {} bytes'.format(
+        'Would reclaim' if dry_run else 'Reclaimed', reclaimed))
+
+
+@main.command('view')
+@click.option('--species', multiple=True,
+              help='Species to include. May be given more than once.')
+@click.option('--assembly-level', multiple=True,
+              help='e.g. "Complete Genome". May be given more than once.')
+@click.option('--accessions', type=click.File('r'),
+              help='File with one accession per line.')
+@click.option('--one-per-species', is_flag=True, default=False,
+              help='Keep only the most complete, newest genome per species.')
+@click.option('--hardlink', is_flag=True, default=False,
+              help='Hard link genomes instead of symlinking them.')
+@click.argument('genbank')
+@click.argument('view_dir')
+def view_genbank(species, assembly_level, accessions, one_per_species,
+                 hardlink, genbank, view_dir):
+    """
+    Build or refresh a directory of links to a subset of the mirror.
+
+    Without filters an existing view is refreshed with its saved
+    definition.  Views are also refreshed after each sync.
+    """
+
+    info_dir, slurm, out, logger = config.instantiate_path_vars(genbank)
+    if accessions:
+        accessions = [line.strip() for line in accessions if line.strip()]
+    redefine = (species or assembly_level or accessions or one_per_species
+                or hardlink)
+    if redefine or not os.path.isfile(
+            os.path.join(view_dir, views.DEFINITION)):
+        try:
+            views.create_view(view_dir, genbank, species, assembly_level,
+                              accessions or (), one_per_species,
+                              'hardlink' if hardlink else 'symlink')
+        except ValueError as e:
+            raise click.BadParameter(str(e), param_hint='VIEW_DIR')
+    assembly_summary = get_resources.get_assembly_summary(genbank, False)
+    added, removed = views.refresh_view(view_dir, assembly_summary,
+                                        logger=logger)
+    click.echo('{} link(s) added, {} removed'.format(added, removed))
+
+
+@main.command('locate')
+@click.option('--from-file', type=click.File('r'),
+              help='File with one sequence ID per line.')
+@click.argument('genbank')
+@click.argument('ids', nargs=-1)
+def locate_genbank(from_file, genbank, ids):
+    """
+    Find the genomes that contain FASTA records named IDS.
+
+    Prints the ID, genome accession, file and byte offset of the first
+    base for each ID found.
+    """
+
+    if from_file:
+        ids = ids + tuple(line.strip() for line in from_file if line.strip())
+    if not os.path.isfile(contigs.get_contig_index_path(genbank)):
+        contigs.update_contig_index(genbank)
+    index = contigs.ContigIndex(genbank)
+    missing = 0
+    for contig_id, hit in zip(ids, index.lookup(ids)):
+        if hit is None:
+            missing += 1
+            continue
+        accession, path, offset = hit
+        click.echo('{}\t{}\t{}\t{}'.format(contig_id, accession, path,
+                                           offset))
+    if missing:
+        click.echo('{} ID(s) not found'.format(missing), err=True)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,316 @@
+"""
+Measure rsync_latest_genomes and sync_latest_genomes end to end against
+local stand-ins for the NCBI servers, optionally behind a proxy that adds
+latency and limits bandwidth.  Nothing leaves the machine.
+
+    python -m NCBITK.benchmarks.network --genomes 50 --latency 40 \\
+        --bandwidth 10 --shards 4
+"""
+
+import argparse
+import gzip
+import os
+import queue
+import shutil
+import socket
+import subprocess
+import tempfile
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from NCBITK import config, sync, transfer
+from NCBITK.benchmarks import server as http_server
+
+CHUNK_SIZE = 1 << 16
+
+
+def get_genome_dir(accession, asm_name):
+    """
+    Path of an assembly below genomes/all/, laid out as on the NCBI servers.
+    """
+
+    prefix, number = accession.split('.')[0].split('_')
+    genome_id = '{}_{}'.format(accession, asm_name)
+
+    return '/'.join([prefix, number[0:3], number[3:6], number[6:9],
+                     genome_id])
+
+
+def make_tree(root, genomes, size, seed=0):
+    """
+    Write genomes random assemblies of size bases each, with their
+    md5checksums.txt, to root/genomes/all/.  Returns the path of each
+    assembly directory relative to genomes/all/, keyed by accession.
+    """
+
+    rng = np.random.RandomState(seed)
+    bases = np.frombuffer(b'ACGT', dtype=np.uint8)
+    genome_dirs = {}
+    for i in range(genomes):
+        accession = 'GCA_{:09d}.1'.format(i + 1)
+        genome_dir = get_genome_dir(accession, 'ASM{}v1'.format(i + 1))
+        path = os.path.join(root, 'genomes', 'all', genome_dir)
+        os.makedirs(path)
+        seq = bases[rng.randint(0, 4, size)].tobytes()
+        fasta = b'>contig_1\n' + b'\n'.join(
+            seq[j:j + 80] for j in range(0, size, 80)) + b'\n'
+        zipped = '{}_genomic.fna.gz'.format(os.path.basename(genome_dir))
+        with open(os.path.join(path, zipped), 'wb') as f:
+            f.write(gzip.compress(fasta, compresslevel=1))
+        with open(os.path.join(path, 'md5checksums.txt'), 'w') as f:
+            f.write('{}  ./{}\n'.format(
+                transfer.md5sum(os.path.join(path, zipped)), zipped))
+        genome_dirs[accession] = genome_dir
+
+    return genome_dirs
+
+
+def make_summary(genome_dirs, base_url, species=4):
+    """
+    Assembly summary for the synthetic tree served at base_url.
+    """
+
+    accessions = sorted(genome_dirs)
+    summary = pd.DataFrame({
+        'species_taxid': [1000 + i % species for i in range(len(accessions))],
+        'assembly_level': 'Complete_Genome',
+        'ftp_path': ['{}/genomes/all/{}'.format(base_url, genome_dirs[a])
+                     for a in accessions],
+        'scientific_name': ['Species_{}'.format(i % species)
+                            for i in range(len(accessions))],
+    }, index=pd.Index(accessions, name='# assembly_accession'))
+
+    return summary
+
+
+class ShapedProxy(object):
+    """
+    Forward TCP connections on a local port to upstream.  Each chunk is
+    held back for latency seconds and each direction of a connection is
+    limited to bandwidth bytes per second.
+    """
+
+    def __init__(self, upstream_port, latency=0, bandwidth=None,
+                 host='127.0.0.1'):
+
+        self.upstream = (host, upstream_port)
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.sock = socket.socket()
+        self.sock.bind((host, 0))
+        self.sock.listen(128)
+        self.port = self.sock.getsockname()[1]
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def _accept(self):
+
+        while True:
+            try:
+                client, address = self.sock.accept()
+            except OSError:
+                return
+            try:
+                upstream = socket.create_connection(self.upstream)
+            except OSError:
+                client.close()
+                continue
+            done = threading.Semaphore(0)
+            for src, dst in [(client, upstream), (upstream, client)]:
+                self._pipe(src, dst, done)
+            threading.Thread(target=self._close, args=(client, upstream, done),
+                             daemon=True).start()
+
+    def _close(self, client, upstream, done):
+
+        done.acquire()
+        done.acquire()
+        client.close()
+        upstream.close()
+
+    def _pipe(self, src, dst, done):
+
+        chunks = queue.Queue()
+
+        def read():
+            while True:
+                try:
+                    data = src.recv(CHUNK_SIZE)
+                except OSError:
+                    data = b''
+                chunks.put((time.monotonic() + self.latency, data))
+                if not data:
+                    return
+
+        def write():
+            # when the shaped link is next free to send
+            free = time.monotonic()
+            while True:
+                due, data = chunks.get()
+                if not data:
+                    break
+                now = time.monotonic()
+                if self.bandwidth:
+                    free = max(free, now) + len(data) / self.bandwidth
+                    due = max(due, free)
+                if due > now:
+                    time.sleep(due - now)
+                try:
+                    dst.sendall(data)
+                except OSError:
+                    break
+            try:
+                dst.shutdown(socket.SHUT_WR)
+            except OSError:
+                pass
+            done.release()
+
+        threading.Thread(target=read, daemon=True).start()
+        threading.Thread(target=write, daemon=True).start()
+
+    def close(self):
+        self.sock.close()
+
+
+def get_free_port():
+
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port, timeout=10):
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port)).close()
+            return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError('Nothing listening on port {}'.format(port))
+
+
+def start_rsync_daemon(root):
+    """
+    Serve root/genomes as the rsync module genomes.  Returns the process
+    and the port it listens on.
+    """
+
+    port = get_free_port()
+    rsyncd_conf = os.path.join(root, 'rsyncd.conf')
+    with open(rsyncd_conf, 'w') as f:
+        f.write('use chroot = no\n')
+        f.write('uid = {}\ngid = {}\n'.format(os.getuid(), os.getgid()))
+        f.write('[genomes]\n')
+        f.write('    path = {}\n'.format(os.path.join(root, 'genomes')))
+        f.write('    read only = yes\n')
+    process = subprocess.Popen([
+        'rsync', '--daemon', '--no-detach', '--address=127.0.0.1',
+        '--port={}'.format(port), '--config={}'.format(rsyncd_conf)
+    ])
+    wait_for_port(port)
+
+    return process, port
+
+
+def get_received_bytes(genbank_mirror):
+
+    received = 0
+    for root, dirs, files in os.walk(genbank_mirror):
+        dirs[:] = [d for d in dirs if d != '.info']
+        for f in files:
+            if f.endswith('.gz'):
+                received += os.path.getsize(os.path.join(root, f))
+
+    return received
+
+
+def run(name, func, genomes):
+    """
+    Time func(genbank_mirror, logger) in a fresh mirror and print the rate.
+    """
+
+    genbank_mirror = tempfile.mkdtemp(prefix='Genbank_')
+    try:
+        info_dir, slurm, out, logger = config.instantiate_path_vars(
+            genbank_mirror)
+        start = time.time()
+        func(genbank_mirror, logger)
+        elapsed = time.time() - start
+        received = get_received_bytes(genbank_mirror)
+    finally:
+        shutil.rmtree(genbank_mirror)
+
+    print('{:<6} {:>8.2f} genomes/s {:>8.2f} MB/s  ({} bytes in {:.2f}s)'
+          .format(name, genomes / elapsed, received / elapsed / 1e6,
+                  received, elapsed))
+
+
+def main():
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--genomes', type=int, default=50)
+    parser.add_argument('--size', type=int, default=1000000,
+                        help='Bases per genome')
+    parser.add_argument('--latency', type=float, default=0,
+                        help='One way latency in milliseconds')
+    parser.add_argument('--bandwidth', type=float, default=0,
+                        help='Per connection bandwidth in MB/s, 0 for none')
+    parser.add_argument('--shards', type=int, default=1,
+                        help='Parallel rsync processes')
+    parser.add_argument('--mode', choices=['rsync', 'http', 'all'],
+                        default='all')
+    args = parser.parse_args()
+    latency = args.latency / 1000
+    bandwidth = args.bandwidth * 1e6 or None
+
+    root = tempfile.mkdtemp(prefix='ncbi_')
+    rsyncd = None
+    try:
+        genome_dirs = make_tree(root, args.genomes, args.size)
+        print('genomes: {}, {} bases each, latency {}ms, bandwidth {}'.format(
+            args.genomes, args.size, args.latency,
+            '{}MB/s'.format(args.bandwidth) if bandwidth else 'unlimited'))
+
+        if args.mode in ('rsync', 'all'):
+            if shutil.which('rsync') is None:
+                print('rsync   skipped, rsync is not installed')
+            else:
+                rsyncd, port = start_rsync_daemon(root)
+                proxy = ShapedProxy(port, latency, bandwidth)
+                summary = make_summary(genome_dirs, 'ftp://ftp.ncbi.nlm.nih.gov')
+                source = 'rsync://127.0.0.1:{}/genomes/all/'.format(proxy.port)
+                run('rsync', lambda genbank_mirror, logger:
+                    sync.rsync_latest_genomes(
+                        genbank_mirror, summary, list(summary.index),
+                        args.shards, source=source), args.genomes)
+                proxy.close()
+
+        if args.mode in ('http', 'all'):
+            server, port = http_server.serve(root)
+            proxy = ShapedProxy(port, latency, bandwidth)
+            summary = make_summary(genome_dirs,
+                                   'http://127.0.0.1:{}'.format(proxy.port))
+
+            def fetch(genbank_mirror, logger):
+                for species in set(summary.scientific_name):
+                    os.mkdir(os.path.join(genbank_mirror, species))
+                sync.sync_latest_genomes(genbank_mirror, summary,
+                                         list(summary.index), logger)
+
+            run('http', fetch, args.genomes)
+            proxy.close()
+            server.shutdown()
+            server.server_close()
+    finally:
+        if rsyncd is not None:
+            rsyncd.terminate()
+            rsyncd.wait()
+        shutil.rmtree(root)
+
+
+if __name__ == '__main__':
+    main()
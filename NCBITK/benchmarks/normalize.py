@@ -0,0 +1,80 @@
+"""
+Compare the two-pass regex clean up of the assembly summary with
+normalize_column at full-summary scale.
+
+    python -m NCBITK.benchmarks.normalize [rows]
+"""
+
+import shutil
+import sys
+import tempfile
+import time
+from functools import partial
+
+import numpy as np
+import pandas as pd
+
+from NCBITK import get_resources
+
+COLUMNS = ['organism_name', 'infraspecific_name', 'isolate', 'assembly_level']
+
+
+def make_summary(rows, seed=0):
+    """
+    Sample rows from the test summary and add strain suffixes so that the
+    number of distinct values resembles the real GenBank summary.
+    """
+
+    sample = pd.read_csv(
+        'NCBITK/test/resources/assembly_summary.txt', sep='\t', index_col=0)
+    rng = np.random.RandomState(seed)
+    summary = sample.iloc[rng.randint(0, len(sample), rows)].reset_index()
+    strains = rng.randint(0, rows // 4, rows)
+    summary['infraspecific_name'] = [
+        'strain={} #{}'.format(name, strain) if isinstance(name, str) else name
+        for name, strain in zip(summary.infraspecific_name, strains)]
+
+    return summary
+
+
+def two_pass(summary):
+
+    for col in COLUMNS:
+        summary[col] = summary[col].replace(
+            r'[\W]+', '_', regex=True).replace('[_]+', '_', regex=True)
+
+
+def timed(func, summary):
+
+    summary = summary.copy()
+    start = time.time()
+    func(summary)
+    return time.time() - start, summary
+
+
+def main():
+
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 500000
+    summary = make_summary(rows)
+    baseline, expected = timed(two_pass, summary)
+    info_dir = tempfile.mkdtemp(prefix='info_')
+    clean_up = partial(get_resources.clean_up_assembly_summary,
+                       normalized_path=get_resources.get_normalized_path(
+                           info_dir))
+    try:
+        cold, result = timed(clean_up, summary)
+        warm, result = timed(clean_up, summary)
+    finally:
+        shutil.rmtree(info_dir)
+
+    assert expected[COLUMNS].equals(result[COLUMNS])
+    print('rows: {}'.format(rows))
+    for col in COLUMNS:
+        print('{}: {} distinct'.format(col, summary[col].nunique()))
+    print('two pass regex:   {:.2f}s'.format(baseline))
+    print('normalize (cold): {:.2f}s'.format(cold))
+    print('normalize (warm): {:.2f}s'.format(warm))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+"""
+Local HTTP server standing in for the NCBI servers in the benchmarks.
+"""
+
+import os
+import posixpath
+import threading
+from http.server import HTTPServer, SimpleHTTPRequestHandler
+from socketserver import ThreadingMixIn
+from urllib.parse import unquote, urlsplit
+
+
+class ThreadedHTTPServer(ThreadingMixIn, HTTPServer):
+
+    daemon_threads = True
+
+
+class FileHandler(SimpleHTTPRequestHandler):
+    """
+    Serve files below server.directory over keep-alive HTTP/1.1.
+    """
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def translate_path(self, path):
+
+        path = posixpath.normpath(unquote(urlsplit(path).path))
+        parts = [part for part in path.split('/')
+                 if part not in ('', '.', '..')]
+
+        return os.path.join(self.server.directory, *parts)
+
+
+def serve(directory):
+    """
+    Start a server for directory on a free port in a background thread.
+    Returns the server and the port it listens on.
+    """
+
+    server = ThreadedHTTPServer(('127.0.0.1', 0), FileHandler)
+    server.directory = directory
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    return server, server.server_address[1]
@@ -0,0 +1,174 @@
+import json
+import os
+import re
+import sqlite3
+
+COLUMNS = ['scientific_name', 'species_taxid', 'taxid', 'organism_name',
+           'infraspecific_name', 'isolate', 'assembly_level', 'seq_rel_date',
+           'asm_name', 'ftp_path']
+INDEXED = ['scientific_name', 'species_taxid', 'taxid', 'assembly_level',
+           'isolate']
+
+
+def get_catalog_path(genbank_mirror):
+
+    return os.path.join(genbank_mirror, '.info', 'catalog.sqlite')
+
+
+def normalize(value):
+
+    return value.replace(' ', '_')
+
+
+def clean(value):
+    """
+    The form clean_up_assembly_summary leaves strain and isolate names in.
+    """
+
+    return re.sub(r'[\W_]+', '_', value)
+
+
+def build_catalog(catalog_path, assembly_summary):
+    """
+    Load the assembly summary into an indexed SQLite catalog.  The catalog
+    is built beside the old one and swapped in when complete.
+    """
+
+    tmp = '{}.tmp'.format(catalog_path)
+    if os.path.isfile(tmp):
+        os.remove(tmp)
+    columns = [c for c in COLUMNS if c in assembly_summary.columns]
+    conn = sqlite3.connect(tmp)
+    conn.execute('CREATE TABLE assemblies (accession TEXT PRIMARY KEY, {})'
+                 .format(', '.join(columns)))
+    conn.execute('CREATE TABLE local (accession TEXT PRIMARY KEY, path TEXT)')
+    rows = assembly_summary[columns].astype(object).where(
+        assembly_summary[columns].notnull(), None).itertuples()
+    conn.executemany(
+        'INSERT OR REPLACE INTO assemblies VALUES ({})'.format(
+            ', '.join('?' * (len(columns) + 1))),
+        (tuple(normalize_row(row)) for row in rows))
+    for column in INDEXED:
+        if column in columns:
+            conn.execute('CREATE INDEX {0}_index ON assemblies ({0})'.format(
+                column))
+    conn.commit()
+    conn.close()
+    os.replace(tmp, catalog_path)
+
+
+def normalize_row(row):
+
+    for value in row:
+        if hasattr(value, 'item'):
+            value = value.item()
+        yield value
+
+
+def update_local(catalog_path, local_genomes):
+    """
+    Replace the record of which accessions are present locally.
+    """
+
+    conn = sqlite3.connect(catalog_path)
+    with conn:
+        conn.execute('DELETE FROM local')
+        conn.executemany('INSERT OR REPLACE INTO local VALUES (?, ?)',
+                         local_genomes.items())
+    conn.close()
+
+
+def build_query(species=(), taxids=(), assembly_levels=(), accessions=(),
+                isolate=None, local=None, count=False, group_by=None):
+    """
+    Return (sql, params) for the filters.  Filters of the same kind are
+    OR'd, different kinds are AND'd.
+    """
+
+    where = []
+    params = []
+
+    def any_of(column, values):
+        if values:
+            where.append('a.{} IN ({})'.format(column,
+                                               ', '.join('?' * len(values))))
+            params.extend(values)
+
+    # match both the raw and the cleaned up forms of names
+    any_of('scientific_name',
+           sorted(set(species) | set(normalize(s) for s in species)))
+    any_of('assembly_level',
+           sorted(set(assembly_levels) |
+                  set(normalize(l) for l in assembly_levels)))
+    any_of('accession', list(accessions))
+    if taxids:
+        taxids = [int(t) for t in taxids]
+        marks = ', '.join('?' * len(taxids))
+        where.append('(a.species_taxid IN ({0}) OR a.taxid IN ({0}))'.format(
+            marks))
+        params.extend(taxids * 2)
+    if isolate is not None:
+        where.append('(a.isolate IN (?, ?) OR a.infraspecific_name IN (?, ?))')
+        params.extend([isolate, clean(isolate), 'strain={}'.format(isolate),
+                       'strain_{}'.format(clean(isolate))])
+    if local is True:
+        where.append('l.accession IS NOT NULL')
+    elif local is False:
+        where.append('l.accession IS NULL')
+
+    if group_by:
+        if group_by not in COLUMNS + ['local']:
+            raise ValueError('Cannot group by {}'.format(group_by))
+        group = ('l.accession IS NOT NULL' if group_by == 'local' else
+                 'a.{}'.format(group_by))
+        select = '{} AS {}, COUNT(*) AS count'.format(group, group_by)
+    elif count:
+        select = 'COUNT(*) AS count'
+    else:
+        select = 'a.*, l.accession IS NOT NULL AS local'
+
+    sql = 'SELECT {} FROM assemblies a LEFT JOIN local l USING (accession)'\
+        .format(select)
+    if where:
+        sql += ' WHERE ' + ' AND '.join(where)
+    if group_by:
+        sql += ' GROUP BY 1 ORDER BY count DESC'
+    elif not count:
+        sql += ' ORDER BY a.accession'
+
+    return sql, params
+
+
+def query(catalog_path, **filters):
+    """
+    Yield the column names, then each result row, without loading the
+    result set into memory.
+    """
+
+    sql, params = build_query(**filters)
+    conn = sqlite3.connect(catalog_path)
+    try:
+        cursor = conn.execute(sql, params)
+        yield [d[0] for d in cursor.description]
+        for row in cursor:
+            yield row
+    finally:
+        conn.close()
+
+
+def write_tsv(results, out):
+
+    for row in results:
+        out.write('\t'.join('' if v is None else str(v) for v in row))
+        out.write('\n')
+
+
+def write_json(results, out):
+    """
+    Write one JSON object per line.
+    """
+
+    header = next(results)
+    for row in results:
+        out.write(json.dumps(dict(zip(header, row))))
+        out.write('\n')
@@ -1,8 +1,12 @@
 #!/usr/bin/env python
 
 import os
+import atexit
+import queue
+import socket
 import time
 import logging
+from logging.handlers import QueueHandler, QueueListener
 
 
 def instantiate_path_vars(genbank_mirror):
@@ -13,16 +17,31 @@ def instantiate_path_vars(genbank_mirror):
     ymd = time.strftime("%y.%m.%d_%I:%M:%S_%p")
 
     for d in [genbank_mirror, info_dir, slurm, out]:
-        if not os.path.isdir(d):
-            os.mkdir(d)
+        # other workers may be creating the same directories
+        os.makedirs(d, exist_ok=True)
 
-    log_file = os.path.join(info_dir, 'log_{}.txt'.format(ymd))
+    log_file = os.path.join(info_dir, 'log_{}_{}.{}.txt'.format(
+        ymd, socket.gethostname(), os.getpid()))
     logger = instantiate_logger(log_file)
 
     return info_dir, slurm, out, logger
 
 
+# the queue listener of this process and the pid it was started in; forked
+# children start their own
+_listener = None
+_listener_pid = None
+
+
 def instantiate_logger(log_file):
+    """
+    Log to log_file from a background thread.  Records are handed to the
+    thread through a queue, so logging never waits on the disk.  The
+    logger has a single handler per process: calling this again points the
+    existing listener at the new file instead of adding another handler.
+    """
+
+    global _listener, _listener_pid
 
     logger = logging.getLogger(__name__)
     logger.setLevel(logging.DEBUG)
@@ -33,6 +52,38 @@ def instantiate_logger(log_file):
     formatter = logging.Formatter('%(asctime)s:%(levelname)s:%(message)s')
     fh.setFormatter(formatter)
 
-    logger.addHandler(fh)
+    if _listener is not None and _listener_pid == os.getpid():
+        # stop() drains the queue into the old file first
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener.handlers = (fh, )
+        _listener.start()
+        return logger
+
+    for handler in list(logger.handlers):
+        if isinstance(handler, QueueHandler):
+            logger.removeHandler(handler)
+    log_queue = queue.Queue()
+    logger.addHandler(QueueHandler(log_queue))
+    _listener = QueueListener(log_queue, fh, respect_handler_level=True)
+    _listener.start()
+    if _listener_pid is None:
+        atexit.register(stop_logger)
+    _listener_pid = os.getpid()
 
     return logger
+
+
+def stop_logger():
+    """
+    Write out queued records and stop the listener.
+    """
+
+    global _listener
+
+    if _listener is not None and _listener_pid == os.getpid():
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+    _listener = None
@@ -0,0 +1,164 @@
+import os
+
+import numpy as np
+
+from NCBITK import curate, genomes
+
+
+def get_contig_index_path(genbank_mirror):
+
+    return os.path.join(genbank_mirror, '.info', 'contigs.npz')
+
+
+def empty_contig_index():
+
+    return {
+        'names': np.array([], dtype='S1'),
+        'rows': np.array([], dtype=np.int32),
+        'offsets': np.array([], dtype=np.int64),
+        'accessions': np.array([], dtype='U1'),
+        'paths': np.array([], dtype='U1'),
+        'fai_mtimes': np.array([], dtype=np.int64),
+    }
+
+
+def read_contig_index(path):
+
+    if not os.path.isfile(path):
+        return empty_contig_index()
+
+    with np.load(path) as arrays:
+        return {name: arrays[name] for name in arrays.files}
+
+
+def write_contig_index(path, arrays):
+
+    tmp = '{}.tmp.npz'.format(path[:-len('.npz')])
+    np.savez(tmp, **arrays)
+    os.replace(tmp, path)
+
+
+def update_contig_index(genbank_mirror, local_genomes=None):
+    """
+    Merge the .fai index of every genome into one table of FASTA header
+    IDs sorted by ID.  Rows of genomes whose .fai is unchanged are carried
+    over as they are, so only new and replaced genomes are read.  Returns
+    the number of genomes that were read.
+    """
+
+    if local_genomes is None:
+        local_genomes = curate.get_local_genomes(genbank_mirror)
+    path = get_contig_index_path(genbank_mirror)
+    old = read_contig_index(path)
+
+    fai_mtimes = {}
+    for accession, fasta in local_genomes.items():
+        fai = genomes.index_genome(genbank_mirror, accession, fasta)
+        fai_mtimes[accession] = os.stat(fai).st_mtime_ns
+
+    accessions = sorted(local_genomes)
+    position = {accession: i for i, accession in enumerate(accessions)}
+    # map the genome rows of the old table onto the new one, -1 if stale
+    remap = np.array([
+        position[accession] if fai_mtimes.get(accession) == mtime else -1
+        for accession, mtime in zip(old['accessions'].tolist(),
+                                    old['fai_mtimes'].tolist())
+    ], dtype=np.int32)
+    rows = remap[old['rows']]
+    kept = rows >= 0
+    names = [old['names'][kept]]
+    new_rows = [rows[kept]]
+    offsets = [old['offsets'][kept]]
+
+    unchanged = set(old['accessions'][remap >= 0].tolist())
+    stale = [accession for accession in accessions
+             if accession not in unchanged]
+    index_dir = genomes.get_index_dir(genbank_mirror)
+    for accession in stale:
+        entries = genomes.read_fai(os.path.join(
+            index_dir, '{}.fai'.format(accession))).values()
+        names.append(np.array([e.name for e in entries], dtype='S'))
+        new_rows.append(np.full(len(entries), position[accession],
+                                dtype=np.int32))
+        offsets.append(np.array([e.offset for e in entries], dtype=np.int64))
+
+    names = np.concatenate(names)
+    new_rows = np.concatenate(new_rows)
+    offsets = np.concatenate(offsets)
+    # sort by ID, then by accession so that GCA comes before GCF
+    order = np.lexsort((new_rows, names))
+    arrays = {
+        'names': names[order],
+        'rows': new_rows[order],
+        'offsets': offsets[order],
+        'accessions': np.array(accessions, dtype='U'),
+        'paths': np.array([local_genomes[a] for a in accessions], dtype='U'),
+        'fai_mtimes': np.array([fai_mtimes[a] for a in accessions],
+                               dtype=np.int64),
+    }
+    write_contig_index(path, arrays)
+
+    return len(stale)
+
+
+class ContigIndex(object):
+    """
+    Find the genome holding a FASTA header ID.  Lookups are binary searches
+    over the sorted IDs and take a whole batch of IDs at a time.
+    """
+
+    def __init__(self, genbank_mirror):
+
+        arrays = read_contig_index(get_contig_index_path(genbank_mirror))
+        self.names = arrays['names']
+        self.rows = arrays['rows']
+        self.offsets = arrays['offsets']
+        self.accessions = arrays['accessions']
+        self.paths = arrays['paths']
+
+    def __len__(self):
+        return len(self.names)
+
+    def find(self, ids):
+        """
+        Return the position of the first entry for each of ids, or -1.
+        """
+
+        ids = np.asarray(ids, dtype='S')
+        if not len(self.names):
+            return np.full(len(ids), -1)
+        found = np.searchsorted(self.names, ids)
+        found[found == len(self.names)] = 0
+        found[self.names[found] != ids] = -1
+
+        return found
+
+    def get(self, i):
+        """
+        (accession, path, offset) of entry i.  offset is the position of
+        the first base of the record in the file.
+        """
+
+        row = self.rows[i]
+        return (str(self.accessions[row]), str(self.paths[row]),
+                int(self.offsets[i]))
+
+    def lookup(self, ids):
+        """
+        Yield (accession, path, offset) for each of ids, or None.
+        """
+
+        for i in self.find(ids).tolist():
+            yield None if i < 0 else self.get(i)
+
+    def lookup_all(self, contig_id):
+        """
+        Every genome that has a record named contig_id, e.g. both copies
+        of a linked GCA/GCF pair.
+        """
+
+        contig_id = contig_id.encode()
+        start = np.searchsorted(self.names, contig_id, 'left')
+        end = np.searchsorted(self.names, contig_id, 'right')
+
+        return [self.get(i) for i in range(start, end)]
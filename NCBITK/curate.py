@@ -4,6 +4,8 @@ import re
 import shutil
 from io import TextIOWrapper
 
+from NCBITK import sketch
+
 
 def get_species(assembly_summary, species):
 
@@ -28,13 +30,12 @@ def create_species_dirs(genbank_mirror, logger, species_list):
             species_dir = os.path.join(genbank_mirror, species)
         except TypeError:
             continue
-        if not os.path.isdir(species_dir):
-            os.mkdir(species_dir)
+        os.makedirs(species_dir, exist_ok=True)
 
 
 def parse_genome_id(genome):
 
-    genome_id = re.match('GCA_\d+\.\d', genome)
+    genome_id = re.match(r'GC[AF]_\d+\.\d+', genome)
 
     return genome_id
 
@@ -52,7 +53,9 @@ def get_local_genomes(genbank_mirror):
 
     for root, dirs, files in os.walk(genbank_mirror):
         for f in files:
-            if re.match('GCA.*fasta', f):
+            if f.endswith('.part'):
+                continue
+            if re.match('GC[AF].*fasta', f):
                 genome_id = parse_genome_id(f).group(0)
                 genome_path = os.path.join(root, f)
                 local_genomes[genome_id] = genome_path
@@ -90,27 +93,131 @@ def assess_genbank_mirror(genbank_mirror, assembly_summary, species_list,
         assembly_summary, species_list)
     new_genomes = get_new_genomes(latest_assembly_versions, local_genomes)
     old_genomes = get_old_genomes(local_genomes, latest_assembly_versions)
+    sketch_files, missing_sketch_files = sketch.get_sketch_files(
+        genbank_mirror, local_genomes)
 
     logger.info(
         "{} genomes present in local collection.".format(len(local_genomes)))
     logger.info(
         "{} genomes missing from local collection.".format(len(new_genomes)))
     logger.info("{} old genomes to be removed.".format(len(old_genomes)))
+    logger.info("{} genomes missing sketch files.".format(
+        len(missing_sketch_files)))
     if not new_genomes:
         logger.info(
             "Local collection is up to date with assembly_summary.txt.")
 
-    return local_genomes, new_genomes, old_genomes
+    return (local_genomes, new_genomes, old_genomes, sketch_files,
+            missing_sketch_files)
+
+
+def get_identical_pairs(assembly_summary):
+    """
+    Map RefSeq (GCF) accessions to the GenBank (GCA) accession of an
+    identical assembly, using the gbrs_paired_asm and paired_asm_comp
+    columns.
+    """
+
+    refseq = assembly_summary[
+        assembly_summary.index.str.startswith('GCF_')
+        & (assembly_summary.paired_asm_comp == 'identical')]
+    refseq = refseq[refseq.gbrs_paired_asm.isin(assembly_summary.index)]
+
+    return refseq.gbrs_paired_asm.to_dict()
+
+
+def split_paired_genomes(new_genomes, local_genomes, pairs):
+    """
+    Split new_genomes into those that have to be downloaded and RefSeq
+    genomes that can be linked to an identical GenBank genome that is
+    already present or downloaded in the same run.
+    """
+
+    available = set(new_genomes) | set(local_genomes)
+    to_fetch = []
+    to_link = []
+    for accession in new_genomes:
+        if pairs.get(accession) in available:
+            to_link.append(accession)
+        else:
+            to_fetch.append(accession)
+
+    return to_fetch, to_link
+
+
+def link_paired_genomes(genbank_mirror, assembly_summary, pairs, logger,
+                        local_genomes=None):
+    """
+    Store each identical GCA/GCF pair once by linking the GenBank FASTA
+    under its RefSeq name.  Hard links are used where possible.
+    Returns the paths of the new links keyed by RefSeq accession.
+    """
+
+    if local_genomes is None:
+        local_genomes = get_local_genomes(genbank_mirror)
+    linked = {}
+    for refseq, genbank in pairs.items():
+        if refseq in local_genomes or genbank not in local_genomes:
+            continue
+        species = assembly_summary.scientific_name.loc[refseq]
+        name = rename_genome(refseq, assembly_summary) or '{}.fasta'.format(
+            refseq)
+        dst = os.path.join(genbank_mirror, species, name)
+        src = local_genomes[genbank]
+        if os.path.islink(dst) and not os.path.exists(dst):
+            # left behind by an earlier GenBank genome
+            os.remove(dst)
+        try:
+            os.link(src, dst)
+        except FileExistsError:
+            # linked by another worker
+            pass
+        except OSError:
+            try:
+                os.symlink(os.path.abspath(src), dst)
+            except FileExistsError:
+                pass
+        linked[refseq] = dst
+        logger.info('Linked {} to {}'.format(refseq, genbank))
+
+    return linked
 
 
 def remove_old_genomes(genbank_mirror, assembly_summary, local_genomes,
                        old_genomes, logger):
+    """
+    Remove old_genomes, and the symbolic links of RefSeq genomes that
+    pointed at one of them.  Returns the accessions of those links, whose
+    genomes have to be fetched again.
+    """
 
     for genome_id in old_genomes:
         genome_path = local_genomes[genome_id]
-        os.remove(genome_path)
+        try:
+            os.remove(genome_path)
+        except FileNotFoundError:
+            # removed by another worker
+            continue
         logger.info("Removed {}".format(genome_id))
 
+    broken = []
+    if not old_genomes:
+        return broken
+    old_genomes = set(old_genomes)
+    for genome_id, genome_path in local_genomes.items():
+        if (genome_id in old_genomes or not os.path.islink(genome_path)
+                or os.path.exists(genome_path)):
+            continue
+        try:
+            os.remove(genome_path)
+        except FileNotFoundError:
+            pass
+        broken.append(genome_id)
+        logger.info("Removed {}, linked to a removed genome".format(
+            genome_id))
+
+    return broken
+
 
 def unzip_genome(root, f, genome_id):
     """
@@ -129,35 +236,90 @@ def unzip_genome(root, f, genome_id):
     unzipped.close()
 
 
-def unzip_genbank(genbank_mirror):
+def walk_files(top):
 
-    for root, dirs, files in os.walk(genbank_mirror):
+    for root, dirs, files in os.walk(top):
         for f in files:
-            if f.endswith("gz"):
-                genome_id = "_".join(f.split("_")[:2])
-                try:
-                    unzip_genome(root, f, genome_id)
-                except OSError:
-                    continue
+            yield os.path.join(root, f)
 
 
-def post_rsync_cleanup(genbank_mirror, assembly_summary, logger):
+def unzip_genbank(genbank_mirror, zipped=None):
+    """
+    Decompress the genomes in zipped, or every compressed genome in the
+    mirror.  Returns the paths of the decompressed genomes.
+    """
 
-    incoming = os.path.join(genbank_mirror, 'incoming')
-    for root, dirs, files in os.walk(incoming):
-        for f in files:
-            accession = '_'.join(f.split('_')[:2])
+    if zipped is None:
+        zipped = walk_files(genbank_mirror)
+    unzipped = []
+    for path in zipped:
+        root, f = os.path.split(path)
+        if f.endswith("gz"):
+            genome_id = "_".join(f.split("_")[:2])
             try:
-                species = assembly_summary.scientific_name.loc[accession]
-            except KeyError:
-                logger.info('KeyError for {}'.format(accession))
+                unzip_genome(root, f, genome_id)
+            except OSError:
                 continue
+            unzipped.append(os.path.join(root, "{}.fasta".format(genome_id)))
+
+    return unzipped
+
+
+def move_incoming(genbank_mirror, assembly_summary, logger, paths):
+
+    moved = []
+    for src in paths:
+        f = os.path.basename(src)
+        accession = '_'.join(f.split('_')[:2])
+        try:
+            species = assembly_summary.scientific_name.loc[accession]
+        except KeyError:
+            logger.info('KeyError for {}'.format(accession))
+            continue
 
-            src = os.path.join(root, f)
-            dst = os.path.join(genbank_mirror, species, f)
+        dst = os.path.join(genbank_mirror, species, f)
+        try:
             shutil.move(src, dst)
+        except FileNotFoundError:
+            logger.info('{} is not in incoming'.format(src))
+            continue
+        moved.append(dst)
+
+    return moved
+
+
+def post_rsync_cleanup(genbank_mirror, assembly_summary, logger,
+                       arrived=None):
+    """
+    Move genomes from incoming into their species directories.  arrived,
+    the paths received according to the rsync logs, are moved first; what
+    is left, e.g. genomes an interrupted run received but never moved, is
+    moved after them.  rsync's hidden temporary files and files of unknown
+    genomes stay in incoming.  Returns the new paths of the moved genomes.
+    """
 
-    shutil.rmtree(incoming)
+    incoming = os.path.join(genbank_mirror, 'incoming')
+    if not os.path.isdir(incoming):
+        return []
+
+    moved = []
+    if arrived is not None:
+        moved += move_incoming(
+            genbank_mirror, assembly_summary, logger,
+            (os.path.join(incoming, path) for path in arrived))
+    left = [path for path in walk_files(incoming)
+            if not os.path.basename(path).startswith('.')]
+    if left and arrived is not None:
+        logger.info('{} file(s) in incoming not in the rsync logs'.format(
+            len(left)))
+    moved += move_incoming(genbank_mirror, assembly_summary, logger, left)
+
+    # prune the directories emptied by the moves
+    for root, dirs, files in os.walk(incoming, topdown=False):
+        if root != incoming and not os.listdir(root):
+            os.rmdir(root)
+
+    return moved
 
 
 def rm_duplicates(seq):
@@ -207,13 +369,25 @@ def rename_genome(genome, assembly_summary):
         return name
 
 
-def rename_genbank(target_dir, assembly_summary):
+def rename_genbank(target_dir, assembly_summary, genomes=None):
+    """
+    Rename the genomes in genomes, or every genome under target_dir, and
+    return their paths keyed by accession.
+    """
 
-    for root, dirs, files in os.walk(target_dir):
-        genomes = [f for f in files if re.match('GCA.*fasta', f)]
-        for genome in genomes:
-            name = rename_genome(genome, assembly_summary)
-            if name:
-                old = os.path.join(root, genome)
-                new = os.path.join(root, name)
-                os.rename(old, new)
+    if genomes is None:
+        genomes = walk_files(target_dir)
+    renamed = {}
+    for path in genomes:
+        root, genome = os.path.split(path)
+        if not re.match('GC[AF].*fasta', genome) or genome.endswith('.part'):
+            continue
+        genome_id = parse_genome_id(genome).group(0)
+        name = rename_genome(genome, assembly_summary)
+        if name:
+            new = os.path.join(root, name)
+            os.rename(path, new)
+            path = new
+        renamed[genome_id] = path
+
+    return renamed
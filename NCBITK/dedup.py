@@ -0,0 +1,178 @@
+import fcntl
+import hashlib
+import os
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from NCBITK import curate
+
+BLOCK_SIZE = 1 << 20
+# ioctl request to share extents between files on btrfs, XFS and others
+FICLONE = 0x40049409
+
+
+def get_hash_index_path(genbank_mirror):
+
+    return os.path.join(genbank_mirror, '.info', 'hash_index.tsv')
+
+
+def sha256sum(path):
+
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(BLOCK_SIZE), b''):
+            sha256.update(block)
+
+    return sha256.hexdigest()
+
+
+class HashIndex(object):
+    """
+    Content hashes of the genomes in the mirror, keyed by path and by
+    digest.  Entries are trusted while a file's size and mtime are
+    unchanged, so only new or modified files are hashed again.
+    """
+
+    def __init__(self, genbank_mirror):
+
+        self.path = get_hash_index_path(genbank_mirror)
+        self.by_path = {}
+        self.by_digest = {}
+        if os.path.isfile(self.path):
+            with open(self.path) as f:
+                for line in f:
+                    digest, size, mtime, shared, path = line.rstrip(
+                        '\n').split('\t')
+                    self.add(path, digest, int(size), int(mtime),
+                             shared == '1')
+
+    def add(self, path, digest, size, mtime, shared=False):
+        """
+        shared marks a reflinked copy, which shares storage with the first
+        path of its digest without being the same inode.
+        """
+
+        self.by_path[path] = (digest, size, mtime, shared)
+        self.by_digest.setdefault(digest, path)
+
+    def is_fresh(self, path, stat):
+
+        entry = self.by_path.get(path)
+        return entry is not None and entry[1:3] == (stat.st_size,
+                                                    stat.st_mtime_ns)
+
+    def find(self, digest):
+        """
+        Return a path with this content, or None.
+        """
+
+        path = self.by_digest.get(digest)
+        if path is not None and path in self.by_path:
+            return path
+
+        return None
+
+    def update(self, paths, threads=4):
+        """
+        Hash the paths that are new or changed and drop entries for files
+        that are gone.
+        """
+
+        paths = set(paths)
+        stats = {path: os.stat(path) for path in paths}
+        stale = [path for path in paths if not self.is_fresh(path,
+                                                               stats[path])]
+        with ThreadPoolExecutor(threads) as executor:
+            for path, digest in zip(stale, executor.map(sha256sum, stale)):
+                self.add(path, digest, stats[path].st_size,
+                         stats[path].st_mtime_ns)
+        self.by_path = {p: e for p, e in self.by_path.items() if p in paths}
+        self.by_digest = {}
+        for path, entry in sorted(self.by_path.items()):
+            self.by_digest.setdefault(entry[0], path)
+
+    def groups(self):
+        """
+        Lists of paths that share a digest.
+        """
+
+        groups = defaultdict(list)
+        for path, entry in sorted(self.by_path.items()):
+            groups[entry[0]].append(path)
+
+        return [paths for paths in groups.values() if len(paths) > 1]
+
+    def write(self):
+
+        tmp = '{}.tmp'.format(self.path)
+        with open(tmp, 'w') as f:
+            for path, entry in sorted(self.by_path.items()):
+                digest, size, mtime, shared = entry
+                f.write('{}\t{}\t{}\t{:d}\t{}\n'.format(digest, size, mtime,
+                                                       shared, path))
+        os.replace(tmp, self.path)
+
+
+def reflink(src, dst):
+
+    with open(src, 'rb') as s, open(dst, 'wb') as d:
+        fcntl.ioctl(d.fileno(), FICLONE, s.fileno())
+
+
+def replace_with_link(keep, duplicate, use_reflink=False):
+    """
+    Atomically replace duplicate with a hard link (or reflink) to keep.
+    """
+
+    tmp = '{}.dedup.tmp'.format(duplicate)
+    try:
+        if use_reflink:
+            reflink(keep, tmp)
+        else:
+            os.link(keep, tmp)
+        os.replace(tmp, duplicate)
+    except OSError:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def deduplicate(genbank_mirror, logger, dry_run=False, use_reflink=False,
+                local_genomes=None):
+    """
+    Replace byte-identical genomes with links to a single copy.  Returns
+    the number of bytes reclaimed (or that would be, with dry_run).
+    """
+
+    if local_genomes is None:
+        local_genomes = curate.get_local_genomes(genbank_mirror)
+    index = HashIndex(genbank_mirror)
+    index.update(local_genomes.values())
+    reclaimed = 0
+
+    for paths in index.groups():
+        keep = paths[0]
+        keep_stat = os.stat(keep)
+        for duplicate in paths[1:]:
+            stat = os.stat(duplicate)
+            if (os.path.samestat(stat, keep_stat)
+                    or index.by_path[duplicate][3]):
+                continue
+            reclaimed += stat.st_size
+            logger.info('Duplicate {} of {}'.format(duplicate, keep))
+            if dry_run:
+                continue
+            try:
+                replace_with_link(keep, duplicate, use_reflink)
+            except OSError as e:
+                logger.info('Could not link {}: {}'.format(duplicate, e))
+                reclaimed -= stat.st_size
+                continue
+            stat = os.stat(duplicate)
+            index.add(duplicate, index.by_path[keep][0], stat.st_size,
+                      stat.st_mtime_ns, use_reflink)
+
+    index.write()
+    logger.info('Reclaimed {} bytes'.format(reclaimed))
+
+    return reclaimed
@@ -0,0 +1,115 @@
+import json
+import os
+import queue
+import socket
+import threading
+import time
+
+# sentinel that tells the writer thread to finish
+_CLOSE = object()
+
+
+def get_events_dir(genbank_mirror):
+
+    return os.path.join(genbank_mirror, '.info', 'events')
+
+
+class EventStream(object):
+    """
+    Append structured events to a JSON lines file from a background
+    thread.  emit only puts the event on a queue; the writer collects up
+    to batch_size events, or whatever arrived within interval seconds, and
+    appends them in one write.  Each process writes a file of its own in
+    events_dir, named after the worker, as appends from several hosts to
+    one file on a network file system can interleave or overwrite lines.
+    """
+
+    def __init__(self, events_dir, batch_size=100, interval=1.0):
+
+        os.makedirs(events_dir, exist_ok=True)
+        self.batch_size = batch_size
+        self.interval = interval
+        self.worker = '{}.{}'.format(socket.gethostname(), os.getpid())
+        self.path = os.path.join(events_dir, '{}.jsonl'.format(self.worker))
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._write, daemon=True)
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def emit(self, event, **fields):
+
+        fields['event'] = event
+        fields['time'] = time.time()
+        fields['worker'] = self.worker
+        self._queue.put(fields)
+
+    def _write(self):
+
+        closing = False
+        while not closing:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.interval
+            while len(batch) < self.batch_size and batch[-1] is not _CLOSE:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+            if batch[-1] is _CLOSE:
+                batch.pop()
+                closing = True
+            if batch:
+                lines = ''.join(json.dumps(event) + '\n' for event in batch)
+                with open(self.path, 'a') as f:
+                    f.write(lines)
+
+    def close(self):
+        """
+        Write out pending events and stop the writer.
+        """
+
+        if self._thread.is_alive():
+            self._queue.put(_CLOSE)
+            self._thread.join()
+
+
+def read_events(path, offset=0):
+    """
+    Yield (event, offset) for each complete line from offset on.  Passing
+    the last offset back in follows the stream as it grows.
+    """
+
+    if not os.path.isfile(path):
+        return
+
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        for line in f:
+            if not line.endswith(b'\n'):
+                # being written
+                return
+            offset += len(line)
+            yield json.loads(line.decode()), offset
+
+
+def read_all_events(events_dir):
+    """
+    Yield the complete events of every worker's file in events_dir, one
+    file after the other.
+    """
+
+    if not os.path.isdir(events_dir):
+        return
+
+    for name in sorted(os.listdir(events_dir)):
+        if name.endswith('.jsonl'):
+            path = os.path.join(events_dir, name)
+            for event, offset in read_events(path):
+                yield event
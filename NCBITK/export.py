@@ -0,0 +1,136 @@
+import io
+import os
+import tarfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from NCBITK import curate
+
+
+def normalize_level(assembly_level):
+
+    return assembly_level.replace(' ', '_')
+
+
+def select_genomes(assembly_summary, species=(), assembly_levels=(),
+                   accessions=()):
+    """
+    Accessions matching every given filter, sorted so that exports are
+    reproducible.
+    """
+
+    selected = assembly_summary
+    if species:
+        selected = selected[selected.scientific_name.isin(species)]
+    if assembly_levels:
+        levels = [normalize_level(level) for level in assembly_levels]
+        selected = selected[selected.assembly_level.str.replace(
+            ' ', '_').isin(levels)]
+    if accessions:
+        selected = selected[selected.index.isin(accessions)]
+
+    return sorted(selected.index.tolist())
+
+
+def get_header_prefix(accession, assembly_summary):
+
+    name = curate.rename_genome(accession, assembly_summary)
+    if name:
+        return os.path.splitext(name)[0]
+
+    return accession
+
+
+def rewrite_headers(data, prefix):
+    """
+    Prefix every FASTA header in data with prefix and a pipe.
+    """
+
+    prefix = '>{}|'.format(prefix).encode()
+    if data.startswith(b'>'):
+        data = prefix + data[1:]
+
+    return data.replace(b'\n>', b'\n' + prefix)
+
+
+def read_genome(path, prefix=None):
+
+    with open(path, 'rb') as f:
+        data = f.read()
+    if prefix:
+        data = rewrite_headers(data, prefix)
+    if data and not data.endswith(b'\n'):
+        data += b'\n'
+
+    return data
+
+
+def iter_genomes(jobs, threads=4, prefetch=16):
+    """
+    Read (path, prefix) jobs in parallel, keeping at most prefetch files in
+    memory, and yield their contents in the order of jobs.
+    """
+
+    jobs = iter(jobs)
+    with ThreadPoolExecutor(threads) as executor:
+        pending = deque()
+        for path, prefix in jobs:
+            pending.append(executor.submit(read_genome, path, prefix))
+            if len(pending) >= prefetch:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def get_export_jobs(genbank_mirror, assembly_summary, accessions,
+                    rename_headers=False):
+    """
+    Return the (path, prefix) jobs for accessions present locally and the
+    list of accessions that are missing.
+    """
+
+    local_genomes = curate.get_local_genomes(genbank_mirror)
+    jobs = []
+    missing = []
+    for accession in accessions:
+        if accession not in local_genomes:
+            missing.append(accession)
+            continue
+        prefix = None
+        if rename_headers:
+            prefix = get_header_prefix(accession, assembly_summary)
+        jobs.append((local_genomes[accession], prefix))
+
+    return jobs, missing
+
+
+def export_fasta(jobs, out, threads=4):
+
+    for data in iter_genomes(jobs, threads):
+        out.write(data)
+
+
+def export_tar(jobs, out, threads=4):
+    """
+    Stream the genomes into an uncompressed tar archive written to out.
+    """
+
+    with tarfile.open(fileobj=out, mode='w|') as tar:
+        for (path, prefix), data in zip(jobs, iter_genomes(jobs, threads)):
+            info = tarfile.TarInfo(os.path.basename(path))
+            info.size = len(data)
+            info.mtime = int(os.path.getmtime(path))
+            tar.addfile(info, io.BytesIO(data))
+
+
+def export_genomes(genbank_mirror, assembly_summary, accessions, out,
+                   output_format='fasta', rename_headers=False, threads=4):
+
+    jobs, missing = get_export_jobs(genbank_mirror, assembly_summary,
+                                    accessions, rename_headers)
+    if output_format == 'tar':
+        export_tar(jobs, out, threads)
+    else:
+        export_fasta(jobs, out, threads)
+
+    return missing
@@ -0,0 +1,199 @@
+import gzip
+import json
+import os
+import zlib
+from collections import defaultdict, namedtuple
+from multiprocessing import Pool
+
+from NCBITK import curate
+
+Problem = namedtuple('Problem', ['path', 'accession', 'problem'])
+
+BLOCK_SIZE = 1 << 20
+EMPTY = 'empty file'
+TRUNCATED = 'truncated gzip'
+CORRUPT = 'corrupt gzip'
+NOT_FASTA = 'not FASTA'
+PARTIAL = 'partial download'
+DEBRIS = 'left in incoming'
+ORPHAN = 'not in assembly summary'
+DUPLICATE = 'duplicate accession'
+
+# Problems that are fixed by deleting the file and syncing again.  Partial
+# downloads are resumed and incoming may be written by a running sync, so
+# both are only reported.
+REPAIRABLE = {EMPTY, TRUNCATED, CORRUPT, NOT_FASTA}
+
+
+def get_cache_path(genbank_mirror):
+
+    return os.path.join(genbank_mirror, '.info', 'fsck_cache.json')
+
+
+def get_repair_queue_path(genbank_mirror):
+
+    return os.path.join(genbank_mirror, '.info', 'fsck_repair.txt')
+
+
+def read_cache(genbank_mirror):
+
+    try:
+        with open(get_cache_path(genbank_mirror)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def write_cache(genbank_mirror, cache):
+
+    cache_path = get_cache_path(genbank_mirror)
+    tmp = '{}.tmp'.format(cache_path)
+    with open(tmp, 'w') as f:
+        json.dump(cache, f)
+    os.replace(tmp, cache_path)
+
+
+def check_gzip(path):
+    """
+    Decompress the whole stream, which is the only way to notice a
+    truncated member, and check that it holds FASTA.
+    """
+
+    try:
+        with gzip.open(path) as f:
+            head = f.read(BLOCK_SIZE)
+            while f.read(BLOCK_SIZE):
+                pass
+    except EOFError:
+        return [TRUNCATED]
+    except (OSError, zlib.error):
+        return [CORRUPT]
+    if not head.lstrip().startswith(b'>'):
+        return [NOT_FASTA]
+
+    return []
+
+
+def check_file(path):
+    """
+    Return a list of problems with a single file.
+    """
+
+    name = os.path.basename(path)
+    if name.endswith('.part'):
+        return [PARTIAL]
+    if os.path.getsize(path) == 0:
+        return [EMPTY]
+    if name.endswith('.gz'):
+        return check_gzip(path)
+    with open(path, 'rb') as f:
+        head = f.read(BLOCK_SIZE).lstrip()
+    if not head.startswith(b'>'):
+        return [NOT_FASTA]
+
+    return []
+
+
+def _check_job(job):
+
+    path, size, mtime = job
+    return path, size, mtime, check_file(path)
+
+
+def get_mirror_files(genbank_mirror):
+    """
+    Genome files and anything in incoming, skipping .info.
+    """
+
+    incoming = os.path.join(genbank_mirror, 'incoming', '')
+    for root, dirs, files in os.walk(genbank_mirror):
+        if root == genbank_mirror and '.info' in dirs:
+            dirs.remove('.info')
+        for f in files:
+            if (os.path.join(root, '').startswith(incoming)
+                    or curate.parse_genome_id(f)):
+                yield os.path.join(root, f)
+
+
+def scan(genbank_mirror, assembly_summary=None, processes=None):
+    """
+    Check every file in the mirror.  Files whose size and mtime match the
+    previous run are not read again.
+    """
+
+    cache = read_cache(genbank_mirror)
+    incoming = os.path.join(genbank_mirror, 'incoming', '')
+    fresh = {}
+    jobs = []
+    for path in get_mirror_files(genbank_mirror):
+        stat = os.stat(path)
+        cached = cache.get(path)
+        if path.startswith(incoming):
+            # only reported, not read
+            fresh[path] = [stat.st_size, stat.st_mtime_ns, []]
+        elif cached and cached[:2] == [stat.st_size, stat.st_mtime_ns]:
+            fresh[path] = cached
+        else:
+            jobs.append((path, stat.st_size, stat.st_mtime_ns))
+
+    if jobs:
+        with Pool(processes) as pool:
+            for path, size, mtime, problems in pool.imap_unordered(
+                    _check_job, jobs, chunksize=16):
+                fresh[path] = [size, mtime, problems]
+    write_cache(genbank_mirror, fresh)
+
+    found = []
+    by_accession = defaultdict(list)
+    for path in sorted(fresh):
+        genome_id = curate.parse_genome_id(os.path.basename(path))
+        accession = genome_id.group(0) if genome_id else None
+        if path.startswith(incoming):
+            found.append(Problem(path, accession, DEBRIS))
+            continue
+        for problem in fresh[path][2]:
+            found.append(Problem(path, accession, problem))
+        if accession is None or PARTIAL in fresh[path][2]:
+            continue
+        by_accession[accession].append(path)
+        if (assembly_summary is not None
+                and accession not in assembly_summary.index):
+            found.append(Problem(path, accession, ORPHAN))
+
+    for accession, paths in sorted(by_accession.items()):
+        if len(paths) > 1:
+            found.extend(Problem(path, accession, DUPLICATE)
+                         for path in paths)
+
+    return found
+
+
+def write_repair_queue(genbank_mirror, problems):
+
+    queue = get_repair_queue_path(genbank_mirror)
+    with open(queue, 'w') as f:
+        for problem in problems:
+            if problem.problem in REPAIRABLE:
+                f.write('{}\t{}\t{}\n'.format(problem.accession or '',
+                                              problem.path, problem.problem))
+
+    return queue
+
+
+def repair(problems, logger):
+    """
+    Delete files that are beyond use so that the next sync fetches them
+    again.  Orphans, duplicates, partial downloads and files in incoming
+    are only reported.
+    """
+
+    removed = set()
+    for problem in problems:
+        if problem.problem in REPAIRABLE and problem.path not in removed:
+            if os.path.isfile(problem.path):
+                os.remove(problem.path)
+            removed.add(problem.path)
+            logger.info('Removed {} ({})'.format(problem.path,
+                                                 problem.problem))
+
+    return removed
@@ -0,0 +1,190 @@
+import mmap
+import os
+from collections import namedtuple
+
+from NCBITK import curate
+
+FaiEntry = namedtuple('FaiEntry',
+                      ['name', 'length', 'offset', 'linebases', 'linewidth'])
+
+
+def get_index_dir(genbank_mirror):
+
+    index_dir = os.path.join(genbank_mirror, '.info', 'fai')
+    if not os.path.isdir(index_dir):
+        os.makedirs(index_dir, exist_ok=True)
+
+    return index_dir
+
+
+def build_fai(fasta):
+    """
+    Build a samtools style index (name, length, offset, linebases,
+    linewidth) for every record in fasta.
+    """
+
+    entries = []
+    record = None
+    offset = 0
+
+    with open(fasta, 'rb') as f:
+        for line in f:
+            if line.startswith(b'>'):
+                if record:
+                    entries.append(FaiEntry(**record))
+                name = line[1:].split(None, 1)[0].decode()
+                record = {'name': name, 'length': 0,
+                          'offset': offset + len(line),
+                          'linebases': 0, 'linewidth': 0}
+            elif record is not None:
+                bases = len(line.rstrip(b'\r\n'))
+                if not record['linebases']:
+                    record['linebases'] = bases
+                    record['linewidth'] = len(line)
+                record['length'] += bases
+            offset += len(line)
+    if record:
+        entries.append(FaiEntry(**record))
+
+    return entries
+
+
+def write_fai(entries, fai):
+
+    tmp = '{}.tmp'.format(fai)
+    with open(tmp, 'w') as f:
+        for entry in entries:
+            f.write('\t'.join(str(i) for i in entry))
+            f.write('\n')
+    os.replace(tmp, fai)
+
+
+def read_fai(fai):
+
+    index = {}
+    with open(fai) as f:
+        for line in f:
+            name, *fields = line.rstrip('\n').split('\t')
+            index[name] = FaiEntry(name, *(int(i) for i in fields))
+
+    return index
+
+
+def is_stale(fai, fasta):
+
+    return (not os.path.isfile(fai)
+            or os.path.getmtime(fai) < os.path.getmtime(fasta))
+
+
+def index_genome(genbank_mirror, accession, fasta):
+
+    fai = os.path.join(get_index_dir(genbank_mirror),
+                       '{}.fai'.format(accession))
+    if is_stale(fai, fasta):
+        write_fai(build_fai(fasta), fai)
+
+    return fai
+
+
+def index_genbank(genbank_mirror, local_genomes=None):
+    """
+    Build or refresh the .fai index of every genome in the mirror.
+    Run after rename_genbank so that indexes point at the final files.
+    """
+
+    if local_genomes is None:
+        local_genomes = curate.get_local_genomes(genbank_mirror)
+    for accession, fasta in local_genomes.items():
+        index_genome(genbank_mirror, accession, fasta)
+
+
+class GenomeCollection(object):
+    """
+    Read-only access to the sequences in a mirror.  Files are mapped with
+    mmap, so concurrent readers share the page cache.  Slices that fall on
+    a single line are returned as zero-copy memoryviews.  A file that is
+    still viewed when the collection is closed stays mapped until its last
+    view is released.
+    """
+
+    def __init__(self, genbank_mirror):
+
+        self.genbank_mirror = genbank_mirror
+        self.genomes = curate.get_local_genomes(genbank_mirror)
+        self._indexes = {}
+        self._maps = {}
+
+    def __contains__(self, accession):
+        return accession in self.genomes
+
+    def __iter__(self):
+        return iter(sorted(self.genomes))
+
+    def __len__(self):
+        return len(self.genomes)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def index(self, accession):
+
+        if accession not in self._indexes:
+            fai = index_genome(self.genbank_mirror, accession,
+                               self.genomes[accession])
+            self._indexes[accession] = read_fai(fai)
+
+        return self._indexes[accession]
+
+    def contigs(self, accession):
+
+        return list(self.index(accession))
+
+    def _map(self, accession):
+
+        if accession not in self._maps:
+            with open(self.genomes[accession], 'rb') as f:
+                self._maps[accession] = mmap.mmap(
+                    f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        return self._maps[accession]
+
+    def fetch(self, accession, contig, start=0, end=None):
+        """
+        Return bases [start, end) of contig.  A memoryview into the mapped
+        file is returned when the range contains no line breaks, otherwise
+        the bases are copied into bytes with line breaks removed.
+        """
+
+        entry = self.index(accession)[contig]
+        end = entry.length if end is None else end
+        if not 0 <= start <= end <= entry.length:
+            raise ValueError('{}:{}-{} is outside of 0-{}'.format(
+                contig, start, end, entry.length))
+        if start == end:
+            return memoryview(b'')
+
+        def position(base):
+            line, column = divmod(base, entry.linebases)
+            return entry.offset + line * entry.linewidth + column
+
+        view = memoryview(self._map(accession))
+        region = view[position(start):position(end - 1) + 1]
+        if start // entry.linebases == (end - 1) // entry.linebases:
+            return region
+
+        seq = bytes(region).replace(b'\n', b'').replace(b'\r', b'')
+        region.release()
+        return seq
+
+    def close(self):
+
+        for mapped in self._maps.values():
+            try:
+                mapped.close()
+            except BufferError:
+                # still viewed; unmapped once the views are gone
+                pass
+        self._maps = {}
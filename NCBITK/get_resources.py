@@ -1,13 +1,25 @@
 #!/usr/bin/env python
 
 import os
+import re
 import logging
 import subprocess
+import numpy as np
 import pandas as pd
 import tarfile
-from urllib.request import urlretrieve
+import ftplib
+from contextlib import closing
+from urllib.error import URLError
+from urllib.request import urlopen
+
+from NCBITK import catalog, taxonomy, transfer
 
 bacteria_assembly_summary = "ftp://ftp.ncbi.nlm.nih.gov/genomes/genbank/bacteria/assembly_summary.txt"
+refseq_bacteria_assembly_summary = "ftp://ftp.ncbi.nlm.nih.gov/genomes/refseq/bacteria/assembly_summary.txt"
+assembly_summary_urls = {
+    'genbank': bacteria_assembly_summary,
+    'refseq': refseq_bacteria_assembly_summary,
+}
 taxdump_url = "ftp://ftp.ncbi.nih.gov/pub/taxonomy/taxdump.tar.gz"
 
 # TODO: Don't write the csvs inside of these functions
@@ -28,7 +40,7 @@ def get_assembly_summary(genbank_mirror, update,
 
     if update:
         assembly_summary = pd.read_csv(
-            bacteria_assembly_summary, sep="\t", index_col=0, skiprows=1)
+            assembly_summary_url, sep="\t", index_col=0, skiprows=1)
     else:
         assembly_summary = pd.read_csv(
             path_assembly_summary, sep="\t", index_col=0)
@@ -36,31 +48,147 @@ def get_assembly_summary(genbank_mirror, update,
     return assembly_summary
 
 
-def get_scientific_names(genbank_mirror, assembly_summary, update=True):
+def stream_assembly_summary(assembly_summary_src, species_taxids=None,
+                            species=None, skiprows=1, chunksize=50000):
     """
-    Get names.dmp from the taxonomy dump
+    Read an assembly summary in chunks, keeping only the rows of
+    species_taxids (or, for an already curated summary, of species by
+    scientific_name).  Memory is bounded by chunksize and the number of
+    matching rows, not by the size of the summary.  URLs are read from the
+    open connection, as pandas would otherwise download them whole first.
+    """
+
+    if re.match(r'(ftp|https?)://', str(assembly_summary_src)):
+        with closing(urlopen(assembly_summary_src, timeout=60)) as f:
+            return stream_assembly_summary(f, species_taxids, species,
+                                           skiprows, chunksize)
+
+    chunks = pd.read_csv(
+        assembly_summary_src,
+        sep="\t",
+        index_col=0,
+        skiprows=skiprows,
+        chunksize=chunksize)
+    kept = []
+    for chunk in chunks:
+        if species_taxids is not None:
+            chunk = chunk[chunk.species_taxid.isin(species_taxids)]
+        if species is not None:
+            chunk = chunk[chunk.scientific_name.isin(species)]
+        kept.append(chunk)
+
+    return pd.concat(kept)
+
+
+def get_taxdump_cache(info_dir):
+    """
+    Paths of the digest of the last taxdump that was built and of the name
+    table built from it.
+    """
+
+    return (os.path.join(info_dir, 'taxdump.md5'),
+            os.path.join(info_dir, 'taxdump_names.pkl'))
+
+
+def read_taxdump_md5(md5_path):
+
+    if not os.path.isfile(md5_path):
+        return None
+
+    with open(md5_path) as f:
+        return f.read().split()[0]
+
+
+def get_taxdump(genbank_mirror, url=taxdump_url):
+    """
+    Download the taxonomy dump, keep the scientific names from names.dmp
+    and build the taxonomy tree from nodes.dmp.
+    Nothing is downloaded or parsed when the published taxdump.tar.gz.md5
+    matches the dump the cache was built from, and the cache is used as is
+    when the dump cannot be fetched.
     """
 
     info_dir = os.path.join(genbank_mirror, ".info")
     names_dmp = os.path.join(genbank_mirror, ".info", 'names.dmp')
+    nodes_dmp = os.path.join(genbank_mirror, ".info", 'nodes.dmp')
+    md5_path, names_cache = get_taxdump_cache(info_dir)
+    taxonomy_path = taxonomy.get_taxonomy_path(info_dir)
+    cached = all(
+        os.path.isfile(path) for path in [md5_path, names_cache, taxonomy_path])
 
-    if update:
-        taxdump = urlretrieve(taxdump_url)
-        taxdump_tar = tarfile.open(taxdump[0])
+    taxdump = os.path.join(info_dir, 'taxdump.tar.gz')
+    with transfer.Transfer() as connections:
+        try:
+            md5 = connections.read('{}.md5'.format(url)).decode().split()[0]
+            if cached and md5 == read_taxdump_md5(md5_path):
+                return pd.read_pickle(names_cache)
+            connections.fetch(url, taxdump, md5=md5)
+        except (URLError, OSError, EOFError, ftplib.Error):
+            # offline, keep using the last taxdump
+            if cached:
+                return pd.read_pickle(names_cache)
+            raise
+    with tarfile.open(taxdump) as taxdump_tar:
         taxdump_tar.extract('names.dmp', info_dir)
+        taxdump_tar.extract('nodes.dmp', info_dir)
+    os.remove(taxdump)
+
+    # TODO: Use fileinput instead of sed
+    sed_cmd = "sed -i '/scientific name/!d' {}".format(
+        names_dmp)  # we only want rows with the scientific name
+    subprocess.Popen(sed_cmd, shell='True').wait()
+    taxonomy.build_taxonomy(nodes_dmp, names_dmp, taxonomy_path)
+    os.remove(nodes_dmp)
+    names = read_names_dmp(names_dmp)
+
+    # the digest is written last so an interrupted build is redone
+    names.to_pickle('{}.tmp'.format(names_cache))
+    os.replace('{}.tmp'.format(names_cache), names_cache)
+    with open('{}.tmp'.format(md5_path), 'w') as f:
+        f.write('{}\n'.format(md5))
+    os.replace('{}.tmp'.format(md5_path), md5_path)
+
+    return names
+
+
+def read_names_dmp(names_dmp):
+
+    names = pd.read_csv(
+        names_dmp, sep='\t', index_col=0, header=None, usecols=[0, 2])
+    names.index.name = 'species_taxid'
+    names.columns = ['scientific_name']
+
+    return names
+
+
+def get_species_taxids(names, species):
+    """
+    Taxids whose normalized scientific name is in species.
+    """
+
+    species = set(normalize_value(name) for name in species)
+    normalized = normalize_column(names.scientific_name)
+
+    return set(names.index[normalized.isin(species)].tolist())
 
-        # TODO: Use fileinput instead of sed
-        sed_cmd = "sed -i '/scientific name/!d' {}".format(
-            names_dmp)  # we only want rows with the scientific name
-        subprocess.Popen(sed_cmd, shell='True').wait()
-        names = pd.read_csv(
-            names_dmp, sep='\t', index_col=0, header=None, usecols=[0, 2])
-        names = names.loc[set(assembly_summary.species_taxid.tolist())]
-        names.index.name = 'species_taxid'
-        names.columns = ['scientific_name']
-        names.scientific_name.replace('[\W]+', '_', regex=True, inplace=True)
-        names.scientific_name.replace('[_]+', '_', regex=True, inplace=True)
-        names.to_csv(names_dmp)
+
+def get_scientific_names(genbank_mirror, assembly_summary, update=True,
+                         names=None, save=True):
+    """
+    Get names.dmp from the taxonomy dump
+    names may be passed in when the taxonomy dump was already fetched with
+    get_taxdump.  save=False keeps the local names.dmp as it is.
+    """
+
+    names_dmp = os.path.join(genbank_mirror, ".info", 'names.dmp')
+
+    if update:
+        if names is None:
+            names = get_taxdump(genbank_mirror)
+        names = names.loc[list(set(assembly_summary.species_taxid.tolist()))]
+        names['scientific_name'] = normalize_column(names.scientific_name)
+        if save:
+            names.to_csv(names_dmp)
     else:
         names = pd.read_csv(names_dmp, index_col=0)
 
@@ -79,31 +207,124 @@ def update_assembly_summary(assembly_summary, names):
     return assembly_summary
 
 
-def clean_up_assembly_summary(assembly_summary):
+# Runs of non-word characters and underscores collapse to one underscore;
+# equivalent to replacing [\W]+ and then [_]+
+NORMALIZE_PATTERN = re.compile(r'[\W_]+')
+
+
+def normalize_value(value):
+
+    return NORMALIZE_PATTERN.sub('_', value)
+
+
+def get_normalized_path(info_dir):
+    """
+    Normalized values of the last cleaned up summary, kept for the next
+    refresh.
+    """
+
+    return os.path.join(info_dir, 'normalized_values.pkl')
+
 
-    # TODO: Do this in a for loop and include replacement pattern:
-    # "[_]+", "_"
+def read_normalized(normalized_path):
 
+    if normalized_path is None or not os.path.isfile(normalized_path):
+        return {}
+
+    return pd.read_pickle(normalized_path)
+
+
+def write_normalized(normalized_path, normalized):
+
+    tmp = '{}.tmp'.format(normalized_path)
+    pd.to_pickle(normalized, tmp)
+    os.replace(tmp, normalized_path)
+
+
+def normalize_column(column, cached=None, normalized=None):
+    """
+    Normalize each distinct value of column once and broadcast the results
+    back.  Values repeat heavily in the assembly summary.  Values found in
+    cached, a dict from an earlier run, are not normalized again; every
+    value of column is added to normalized when it is given.
+    """
+
+    cached = {} if cached is None else cached
+    normalized = {} if normalized is None else normalized
+    codes, uniques = pd.factorize(column)
+    values = []
+    for value in uniques:
+        if isinstance(value, str):
+            normalized[value] = cached.get(value) or normalize_value(value)
+            value = normalized[value]
+        values.append(value)
+    values = np.array(values + [np.nan], dtype=object)
+
+    return pd.Series(values[codes], index=column.index, name=column.name)
+
+
+def clean_up_assembly_summary(assembly_summary, normalized_path=None):
+    """
+    Normalize the name columns.  With normalized_path the normalized values
+    are kept across refreshes; values no longer in the summary are dropped
+    so the file tracks the summary's size.
+    """
+
+    cached = read_normalized(normalized_path)
+    normalized = {}
     cols = ["organism_name", "infraspecific_name", "isolate", "assembly_level"]
     for col in cols:
-        assembly_summary[col].replace('[\W]+', '_', regex=True, inplace=True)
-        assembly_summary[col].replace('[_]+', '_', regex=True, inplace=True)
+        assembly_summary[col] = normalize_column(assembly_summary[col],
+                                                 cached, normalized)
+    if normalized_path is not None and normalized.keys() != cached.keys():
+        write_normalized(normalized_path, normalized)
 
 
-def get_resources(genbank_mirror, update):
+def get_resources(genbank_mirror, update, sections=('genbank', ),
+                  species=None):
     """
     Get assembly summary and taxonomy dump file for bacteria.
     Parse and load into Pandas DataFrames.
+    sections selects the assembly summaries to combine, 'genbank' and/or
+    'refseq'.
+    When species is given, only the rows for those species are kept while
+    the summary is read.  That subset is not saved, so the local summary,
+    names and catalog keep every species from the last full update.
     """
 
     path_assembly_summary = os.path.join(genbank_mirror, ".info",
                                          "assembly_summary.txt")
+    if update and species:
+        names = get_taxdump(genbank_mirror)
+        species_taxids = get_species_taxids(names, species)
+        assembly_summary = pd.concat([
+            stream_assembly_summary(assembly_summary_urls[section],
+                                    species_taxids)
+            for section in sections
+        ])
+    elif update:
+        names = None
+        assembly_summary = pd.concat([
+            get_assembly_summary(genbank_mirror, update,
+                                 assembly_summary_urls[section])
+            for section in sections
+        ])
     if update:
-        assembly_summary = get_assembly_summary(genbank_mirror, update)
-        names = get_scientific_names(genbank_mirror, assembly_summary)
+        full = not species
+        names = get_scientific_names(genbank_mirror, assembly_summary,
+                                     names=names, save=full)
         assembly_summary = update_assembly_summary(assembly_summary, names)
-        clean_up_assembly_summary(assembly_summary)
-        assembly_summary.to_csv(path_assembly_summary, sep='\t')
+        clean_up_assembly_summary(
+            assembly_summary,
+            get_normalized_path(os.path.join(genbank_mirror, ".info"))
+            if full else None)
+        if full:
+            assembly_summary.to_csv(path_assembly_summary, sep='\t')
+            catalog.build_catalog(catalog.get_catalog_path(genbank_mirror),
+                                  assembly_summary)
+    elif species:
+        assembly_summary = stream_assembly_summary(
+            path_assembly_summary, species=species, skiprows=0)
     else:
         assembly_summary = get_assembly_summary(genbank_mirror, update)
 
@@ -0,0 +1,426 @@
+import hashlib
+import os
+import shutil
+import socket
+import time
+from ftplib import Error as FTPError
+from urllib.error import URLError
+
+from NCBITK import curate, sync, transfer
+from NCBITK.events import EventStream, get_events_dir
+
+
+def get_worker_id():
+
+    return '{}.{}'.format(socket.gethostname(), os.getpid())
+
+
+def get_run_id(new_genomes):
+    """
+    Derive a run id from the genomes still to fetch so that workers started
+    against the same mirror and assembly summary agree on it.
+    """
+
+    md5 = hashlib.md5()
+    for accession in sorted(new_genomes):
+        md5.update(accession.encode())
+
+    return md5.hexdigest()[:12]
+
+
+def get_run_dir(genbank_mirror, run_id):
+
+    return os.path.join(genbank_mirror, '.info', 'work', run_id)
+
+
+def publish_batches(genbank_mirror, run_id, new_genomes, batch_size=100):
+    """
+    Write new_genomes to batch files for run_id.  The plan is built in a
+    private directory and renamed into place, so when several workers race
+    only the first plan is kept and everyone works from it.
+    """
+
+    run_dir = get_run_dir(genbank_mirror, run_id)
+    if os.path.isdir(run_dir):
+        return run_dir
+
+    tmp = '{}.{}.tmp'.format(run_dir, get_worker_id())
+    os.makedirs(os.path.join(tmp, 'leases'))
+    new_genomes = sorted(new_genomes)
+    for i in range(0, len(new_genomes), batch_size):
+        batch = os.path.join(tmp, 'batch_{:06d}.txt'.format(i // batch_size))
+        with open(batch, 'w') as f:
+            f.write('\n'.join(new_genomes[i:i + batch_size]))
+            f.write('\n')
+    try:
+        os.rename(tmp, run_dir)
+    except OSError:
+        shutil.rmtree(tmp)
+
+    return run_dir
+
+
+def get_current_path(genbank_mirror):
+    """
+    Pointer to the run that workers join, whatever genomes they see.
+    """
+
+    return os.path.join(genbank_mirror, '.info', 'work', 'current')
+
+
+def read_current(current):
+
+    try:
+        with open(current) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def clear_current(current, run_id):
+    """
+    Remove the pointer if it still names run_id.
+    """
+
+    cleared = '{}.{}.clear'.format(current, get_worker_id())
+    try:
+        os.rename(current, cleared)
+    except FileNotFoundError:
+        return
+    if read_current(cleared) != run_id:
+        # another run was published in the meantime
+        os.rename(cleared, current)
+        return
+    os.remove(cleared)
+
+
+def join_run(genbank_mirror, new_genomes, batch_size=100):
+    """
+    Return the id of the active run, publishing new_genomes as a new run
+    when there is none.  Workers started at different times see different
+    new genomes, but all of them work from the run published first.
+    """
+
+    current = get_current_path(genbank_mirror)
+    while True:
+        run_id = read_current(current)
+        if run_id is not None:
+            if os.path.isdir(get_run_dir(genbank_mirror, run_id)):
+                return run_id
+            # left behind by a run that was removed
+            clear_current(current, run_id)
+            continue
+
+        run_id = get_run_id(new_genomes)
+        publish_batches(genbank_mirror, run_id, new_genomes, batch_size)
+        try:
+            fd = os.open(current, os.O_WRONLY | os.O_CREAT | os.O_EXCL,
+                         0o644)
+        except FileExistsError:
+            # another worker published first
+            continue
+        with os.fdopen(fd, 'w') as f:
+            f.write('{}\n'.format(run_id))
+
+        return run_id
+
+
+def remove_run(run_dir):
+    """
+    Drop a finished plan so that a later run with the same genomes, e.g.
+    ones that failed to download, publishes and fetches them again.  Only
+    one of the workers that finish the run gets True.
+    """
+
+    tmp = '{}.{}.done'.format(run_dir, get_worker_id())
+    try:
+        os.rename(run_dir, tmp)
+    except OSError:
+        # already removed by another worker
+        return False
+    clear_current(os.path.join(os.path.dirname(run_dir), 'current'),
+                  os.path.basename(run_dir))
+    shutil.rmtree(tmp)
+
+    return True
+
+
+def get_batches(run_dir):
+
+    if not os.path.isdir(run_dir):
+        return []
+
+    return sorted(f[:-4] for f in os.listdir(run_dir)
+                  if f.startswith('batch_') and f.endswith('.txt'))
+
+
+def read_batch(run_dir, batch):
+
+    with open(os.path.join(run_dir, '{}.txt'.format(batch))) as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def get_resources_lock_path(genbank_mirror):
+
+    return os.path.join(genbank_mirror, '.info', 'resources.lock')
+
+
+def run_once(lock_path, func, poll=5, stale=3600):
+    """
+    Run func unless another worker holds lock_path, in which case wait for
+    it to finish.  A lock older than stale seconds is taken to belong to a
+    worker that died.  Returns (True, result of func) or (False, None).
+    """
+
+    try:
+        fd = os.open(lock_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+    except FileExistsError:
+        while True:
+            try:
+                age = time.time() - os.path.getmtime(lock_path)
+            except FileNotFoundError:
+                return False, None
+            if age > stale:
+                try:
+                    os.remove(lock_path)
+                except FileNotFoundError:
+                    pass
+                return run_once(lock_path, func, poll, stale)
+            time.sleep(poll)
+
+    with os.fdopen(fd, 'w') as f:
+        f.write('{}\n'.format(get_worker_id()))
+    try:
+        return True, func()
+    finally:
+        os.remove(lock_path)
+
+
+class LeaseLost(Exception):
+    pass
+
+
+class Lease(object):
+    """
+    Exclusive claim on a batch, held in <run>/leases/<batch>.lease until it
+    is marked done or its expiry passes.
+    """
+
+    def __init__(self, run_dir, batch, worker_id, lease_time):
+
+        self.run_dir = run_dir
+        self.batch = batch
+        self.worker_id = worker_id
+        self.lease_time = lease_time
+        leases = os.path.join(run_dir, 'leases')
+        self.path = os.path.join(leases, '{}.lease'.format(batch))
+        self.done_path = os.path.join(leases, '{}.done'.format(batch))
+
+    def _write(self, path, flags):
+
+        fd = os.open(path, flags, 0o644)
+        with os.fdopen(fd, 'w') as f:
+            f.write('{}\t{}\n'.format(self.worker_id,
+                                      time.time() + self.lease_time))
+
+    def read(self, path=None):
+        """
+        Return (worker_id, expiry) of the current holder or None.
+        """
+
+        try:
+            with open(path or self.path) as f:
+                worker_id, expiry = f.read().split('\t')
+        except (OSError, ValueError):
+            return None
+
+        return worker_id, float(expiry)
+
+    def is_done(self):
+        return os.path.isfile(self.done_path)
+
+    def acquire(self):
+        """
+        Create the lease, or steal it when the holder let it expire.
+        """
+
+        if self.is_done():
+            return False
+        create = os.O_WRONLY | os.O_CREAT | os.O_EXCL
+        try:
+            self._write(self.path, create)
+            return self._check_done()
+        except FileExistsError:
+            pass
+        except FileNotFoundError:
+            # the run was finished and removed
+            return False
+
+        holder = self.read()
+        if holder is None or holder[1] > time.time():
+            return False
+
+        # only one of the workers racing to steal can win the rename, but
+        # a worker that read the same expired holder may rename away the
+        # lease a faster stealer already replaced it with
+        stolen = '{}.stolen.{}'.format(self.path, self.worker_id)
+        try:
+            os.rename(self.path, stolen)
+        except FileNotFoundError:
+            return False
+        if self.read(stolen) != holder:
+            os.rename(stolen, self.path)
+            return False
+        os.remove(stolen)
+        try:
+            self._write(self.path, create)
+        except (FileExistsError, FileNotFoundError):
+            return False
+
+        return self._check_done()
+
+    def _check_done(self):
+        """
+        Give up a lease just created on a batch whose holder marked it done
+        and released it since is_done was checked.
+        """
+
+        if self.is_done():
+            self.release(done=False)
+            return False
+
+        return True
+
+    def renew(self):
+        """
+        Push the expiry back, or raise LeaseLost if another worker has
+        taken the batch over.
+        """
+
+        holder = self.read()
+        if holder is None or holder[0] != self.worker_id:
+            raise LeaseLost(self.batch)
+        tmp = '{}.{}.tmp'.format(self.path, self.worker_id)
+        self._write(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC)
+        # check again right before the lease is replaced
+        holder = self.read()
+        if holder is None or holder[0] != self.worker_id:
+            os.remove(tmp)
+            raise LeaseLost(self.batch)
+        os.replace(tmp, self.path)
+
+    def release(self, done=True):
+
+        if done:
+            open(self.done_path, 'w').close()
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+def claim_batch(run_dir, worker_id, lease_time):
+
+    for batch in get_batches(run_dir):
+        lease = Lease(run_dir, batch, worker_id, lease_time)
+        if lease.acquire():
+            return lease
+
+    return None
+
+
+def is_complete(run_dir):
+
+    # a removed run was completed
+    return all(
+        Lease(run_dir, batch, None, 0).is_done()
+        for batch in get_batches(run_dir))
+
+
+def fetch_genome(genbank_mirror, assembly_summary, accession, logger,
+                 connections=None, events=None):
+    """
+    Download, unzip and rename a single genome into its species directory,
+    unless an earlier holder of the batch already did.
+    """
+
+    if connections is None:
+        with transfer.Transfer() as connections:
+            return fetch_genome(genbank_mirror, assembly_summary, accession,
+                                logger, connections, events)
+    if events is None:
+        with EventStream(get_events_dir(genbank_mirror)) as events:
+            return fetch_genome(genbank_mirror, assembly_summary, accession,
+                                logger, connections, events)
+
+    species = assembly_summary.scientific_name.loc[accession]
+    species_dir = os.path.join(genbank_mirror, species)
+    os.makedirs(species_dir, exist_ok=True)
+    for f in os.listdir(species_dir):
+        if f.startswith(accession) and f.endswith('.fasta'):
+            return
+
+    sync.sync_genome(genbank_mirror, assembly_summary, accession, logger,
+                     connections, events)
+    genome_id, genome_url = sync.get_genome_id_and_url(assembly_summary,
+                                                       accession)
+    for ext in ['.fna.gz', '.fasta.gz']:
+        zipped = '{}_genomic{}'.format(genome_id, ext)
+        if os.path.isfile(os.path.join(species_dir, zipped)):
+            curate.unzip_genome(species_dir, zipped, accession)
+            name = curate.rename_genome(accession, assembly_summary)
+            if name:
+                os.rename(
+                    os.path.join(species_dir, '{}.fasta'.format(accession)),
+                    os.path.join(species_dir, name))
+            break
+
+
+def run_worker(genbank_mirror, assembly_summary, run_id, logger,
+               lease_time=600, fetch=fetch_genome, poll=None):
+    """
+    Claim and process batches of run_id until every batch is done.  Leases
+    are renewed after each genome; a worker that stops renewing loses its
+    batch to the next worker that finds the lease expired.  Downloads go
+    through .part files named after the worker, as the worker that lost a
+    batch may still be downloading it.  A genome that can't be downloaded
+    is logged and skipped, to be fetched by a later run.  Returns the
+    accessions this worker fetched.
+    """
+
+    run_dir = get_run_dir(genbank_mirror, run_id)
+    worker_id = get_worker_id()
+    poll = lease_time / 10 if poll is None else poll
+    fetched = []
+
+    # one event stream for the worker keeps writes off the per-genome path
+    part_suffix = '.{}.part'.format(worker_id)
+    with transfer.Transfer(part_suffix=part_suffix) as connections, \
+            EventStream(get_events_dir(genbank_mirror)) as events:
+        while not is_complete(run_dir):
+            lease = claim_batch(run_dir, worker_id, lease_time)
+            if lease is None:
+                # everything left is leased by live workers; wait for them
+                # to finish or for a lease to expire
+                time.sleep(poll)
+                continue
+            logger.info('{} claimed {}'.format(worker_id, lease.batch))
+            try:
+                for accession in read_batch(run_dir, lease.batch):
+                    try:
+                        fetch(genbank_mirror, assembly_summary, accession,
+                              logger, connections, events)
+                        fetched.append(accession)
+                    except (URLError, FTPError, EOFError, OSError) as e:
+                        events.emit('failed', accession=accession,
+                                    error=str(e))
+                        logger.info('Failed to fetch {}\n{}'.format(
+                            accession, e))
+                    lease.renew()
+            except LeaseLost:
+                logger.info('{} lost {}'.format(worker_id, lease.batch))
+                continue
+            lease.release()
+            logger.info('{} finished {}'.format(worker_id, lease.batch))
+
+    return fetched
@@ -0,0 +1,179 @@
+import os
+import shutil
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import URLError
+
+from NCBITK import schedule, sync, transfer
+
+# Typical ratio of a FASTA's size to its gzip compressed size
+COMPRESSION_RATIO = 3.5
+# Assumed until a transfer has been recorded
+DEFAULT_THROUGHPUT = 5e6
+# Number of recent transfers averaged for the throughput estimate
+HISTORY = 10
+
+Plan = namedtuple('Plan', [
+    'genomes', 'listed', 'unknown', 'bytes', 'throughput', 'seconds',
+    'disk_needed', 'disk_free'
+])
+
+
+def get_throughput_path(genbank_mirror):
+
+    return os.path.join(genbank_mirror, '.info', 'throughput.tsv')
+
+
+def record_throughput(genbank_mirror, received, seconds):
+    """
+    Append a finished transfer of received bytes to the history.
+    """
+
+    if seconds <= 0 or received <= 0:
+        return
+    with open(get_throughput_path(genbank_mirror), 'a') as f:
+        f.write('{}\t{}\t{}\n'.format(
+            time.strftime('%Y-%m-%dT%H:%M:%S'), received, seconds))
+
+
+def read_throughput(genbank_mirror, history=HISTORY):
+    """
+    Bytes per second over the last history transfers, or None.
+    """
+
+    path = get_throughput_path(genbank_mirror)
+    if not os.path.isfile(path):
+        return None
+
+    with open(path) as f:
+        runs = [line.rstrip('\n').split('\t') for line in f if line.strip()]
+    runs = runs[-history:]
+    received = sum(int(run[1]) for run in runs)
+    seconds = sum(float(run[2]) for run in runs)
+    if not seconds:
+        return None
+
+    return received / seconds
+
+
+def get_genome_url(assembly_summary, accession, ext='.fna.gz'):
+
+    genome_id, genome_url = sync.get_genome_id_and_url(assembly_summary,
+                                                       accession)
+
+    return '{}/{}_genomic{}'.format(genome_url, genome_id, ext)
+
+
+def list_remote_sizes(urls, threads=16):
+    """
+    Ask the servers for the size of each url, keyed like urls, with
+    threads concurrent connections.  Files that can't be listed are left
+    out.
+    """
+
+    local = threading.local()
+    connections = []
+
+    def size(item):
+        accession, url = item
+        if not hasattr(local, 'connections'):
+            local.connections = transfer.Transfer()
+            connections.append(local.connections)
+        try:
+            return accession, local.connections.size(url)
+        except (URLError, OSError, EOFError, ValueError, TypeError):
+            return accession, None
+
+    try:
+        with ThreadPoolExecutor(threads) as executor:
+            sizes = dict(executor.map(size, urls.items()))
+    finally:
+        for conn in connections:
+            conn.close()
+
+    return {a: size for a, size in sizes.items() if size is not None}
+
+
+def update_remote_sizes(genbank_mirror, assembly_summary, accessions,
+                        threads=16):
+    """
+    Sizes of the genome files for accessions, listing only those not in
+    the cache and adding them to it.  Returns the sizes and the number of
+    files listed.
+    """
+
+    cached = schedule.read_remote_sizes(genbank_mirror)
+    urls = {a: get_genome_url(assembly_summary, a)
+            for a in accessions if a not in cached}
+    listed = list_remote_sizes(urls, threads) if urls else {}
+    if listed:
+        schedule.write_remote_sizes(genbank_mirror, listed)
+    cached.update(listed)
+
+    return {a: cached[a] for a in accessions if a in cached}, len(listed)
+
+
+def plan_transfer(genbank_mirror, assembly_summary, new_genomes,
+                  old_paths=(), threads=16):
+    """
+    Estimate what syncing new_genomes takes: bytes to transfer, duration
+    at the recorded throughput and the disk space needed once the genomes
+    are decompressed, less what removing old_paths frees.
+    """
+
+    sizes, listed = update_remote_sizes(genbank_mirror, assembly_summary,
+                                        new_genomes, threads)
+    expected = schedule.get_expected_sizes(new_genomes, sizes)
+    total = sum(expected.values())
+    throughput = read_throughput(genbank_mirror)
+    seconds = total / (throughput or DEFAULT_THROUGHPUT)
+
+    # compressed files are all in place before the first is decompressed
+    largest = max(expected.values()) if expected else 0
+    decompressed = total * COMPRESSION_RATIO
+    disk_needed = max(total + largest * COMPRESSION_RATIO, decompressed)
+    disk_needed -= sum(os.path.getsize(p) for p in old_paths
+                       if os.path.isfile(p))
+
+    return Plan(
+        genomes=len(new_genomes),
+        listed=listed,
+        unknown=len(new_genomes) - len(sizes),
+        bytes=total,
+        throughput=throughput,
+        seconds=seconds,
+        disk_needed=max(0, int(disk_needed)),
+        disk_free=shutil.disk_usage(genbank_mirror).free)
+
+
+def format_size(size):
+
+    for unit in ['B', 'KB', 'MB', 'GB', 'TB']:
+        if size < 1000 or unit == 'TB':
+            return '{:.1f} {}'.format(size, unit)
+        size /= 1000
+
+
+def format_plan(plan):
+
+    lines = ['{} genome(s) to transfer, {} size(s) newly listed'.format(
+        plan.genomes, plan.listed)]
+    lines.append('{} to transfer'.format(format_size(plan.bytes)))
+    if plan.unknown:
+        lines.append('{} genome(s) could not be listed and are estimated'
+                     .format(plan.unknown))
+    if plan.throughput:
+        rate = '{}/s measured'.format(format_size(plan.throughput))
+    else:
+        rate = 'no transfer history, assuming {}/s'.format(
+            format_size(DEFAULT_THROUGHPUT))
+    lines.append('About {:.0f} minute(s) ({})'.format(plan.seconds / 60,
+                                                      rate))
+    lines.append('{} of disk needed, {} free'.format(
+        format_size(plan.disk_needed), format_size(plan.disk_free)))
+    if plan.disk_needed > plan.disk_free:
+        lines.append('Not enough free disk space')
+
+    return lines
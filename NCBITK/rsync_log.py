@@ -0,0 +1,183 @@
+import os
+import re
+from collections import namedtuple
+from datetime import datetime
+
+from NCBITK import curate
+
+# passed to rsync as --log-file-format: itemized changes, path relative to
+# the source, file length and bytes transferred
+LOG_FILE_FORMAT = '%i %n %l %b'
+
+LINE = re.compile(r'^(\d{4}/\d\d/\d\d \d\d:\d\d:\d\d) \[\d+\] (.*)$')
+ITEMIZED = re.compile(r'^([<>ch.*][fdLDS]\S{9}) (.+?)(?: (\d+) (\d+))?$')
+FAILED = re.compile(r'^rsync: (?:\[\w+\] )?.*?"(.+?)".* failed: (.*)$')
+TOTALS = re.compile(r'sent ([\d,]+) bytes\s+received ([\d,]+) bytes')
+
+RsyncFile = namedtuple(
+    'RsyncFile', ['path', 'size', 'transferred', 'finished', 'seconds'])
+RsyncFailure = namedtuple('RsyncFailure', ['path', 'message'])
+
+
+def parse_time(timestamp):
+
+    return datetime.strptime(timestamp, '%Y/%m/%d %H:%M:%S')
+
+
+class RsyncLog(object):
+    """
+    The files received, failures and totals recorded in one or more rsync
+    --log-file logs.  Logs written without LOG_FILE_FORMAT have no sizes.
+    """
+
+    def __init__(self):
+
+        self.files = []
+        self.failures = []
+        self.errors = []
+        self.sent = 0
+        self.received = 0
+        self.started = None
+        self.finished = None
+
+    def parse(self, lines):
+
+        previous = None
+        for line in lines:
+            match = LINE.match(line.rstrip('\n'))
+            if not match:
+                continue
+            timestamp, message = match.groups()
+            time = parse_time(timestamp)
+            if self.started is None or time < self.started:
+                self.started = time
+            if self.finished is None or time > self.finished:
+                self.finished = time
+
+            itemized = ITEMIZED.match(message)
+            if itemized:
+                changes, path, size, transferred = itemized.groups()
+                # only regular files received from the remote
+                if changes.startswith('>f'):
+                    seconds = (time - previous).total_seconds() \
+                        if previous else 0.0
+                    self.files.append(RsyncFile(
+                        path,
+                        None if size is None else int(size),
+                        None if transferred is None else int(transferred),
+                        time, seconds))
+                previous = time
+                continue
+            failed = FAILED.match(message)
+            if failed:
+                self.failures.append(RsyncFailure(
+                    failed.group(1).lstrip('/'), failed.group(2)))
+                continue
+            totals = TOTALS.search(message)
+            if totals:
+                self.sent += int(totals.group(1).replace(',', ''))
+                self.received += int(totals.group(2).replace(',', ''))
+                continue
+            if message.startswith('rsync error:'):
+                self.errors.append(message)
+            if previous is None:
+                previous = time
+
+        return self
+
+    def read(self, rsync_log):
+
+        if os.path.isfile(rsync_log):
+            with open(rsync_log) as f:
+                self.parse(f)
+
+        return self
+
+    @property
+    def seconds(self):
+
+        if self.started is None:
+            return 0.0
+
+        return (self.finished - self.started).total_seconds()
+
+    def get_arrived(self):
+        """
+        Paths, relative to the rsync destination, of the files received.
+        """
+
+        return [f.path for f in self.files]
+
+    def get_sizes(self):
+        """
+        Sizes of the received genomes keyed by accession.
+        """
+
+        sizes = {}
+        for f in self.files:
+            genome_id = curate.parse_genome_id(os.path.basename(f.path))
+            if genome_id and f.size is not None:
+                sizes[genome_id.group(0)] = f.size
+
+        return sizes
+
+    def emit_events(self, events):
+        """
+        Emit a 'downloaded' event per received genome and a 'failed' event
+        per failure to events, an events.EventStream.
+        """
+
+        for f in self.files:
+            genome_id = curate.parse_genome_id(os.path.basename(f.path))
+            if not genome_id:
+                continue
+            events.emit('downloaded', accession=genome_id.group(0),
+                        genome_id=os.path.basename(os.path.dirname(f.path)),
+                        path=f.path, bytes=f.size,
+                        transferred=f.transferred, seconds=f.seconds)
+        for failure in self.failures:
+            genome_id = curate.parse_genome_id(
+                os.path.basename(failure.path))
+            events.emit('failed',
+                        accession=genome_id.group(0) if genome_id else None,
+                        path=failure.path, error=failure.message)
+
+    def log_stats(self, logger):
+
+        for f in self.files:
+            logger.info('Received {} ({} of {} bytes)'.format(
+                f.path, f.transferred, f.size))
+        for failure in self.failures:
+            logger.info('Failed {}: {}'.format(failure.path,
+                                               failure.message))
+        for error in self.errors:
+            logger.info(error)
+        logger.info('rsync received {} file(s), {} bytes in {:.0f}s, '
+                    '{} failure(s)'.format(len(self.files), self.received,
+                                           self.seconds, len(self.failures)))
+
+    def write_stats(self, path):
+        """
+        Append one line of statistics per received file to path.
+        """
+
+        with open(path, 'a') as f:
+            for received in self.files:
+                f.write('{}\t{}\t{}\t{}\t{}\n'.format(
+                    received.finished.strftime('%Y-%m-%dT%H:%M:%S'),
+                    received.path, received.size, received.transferred,
+                    received.seconds))
+
+
+def get_rsync_stats_path(genbank_mirror):
+
+    return os.path.join(genbank_mirror, '.info', 'rsync_stats.tsv')
+
+
+def read_rsync_logs(rsync_logs):
+
+    log = RsyncLog()
+    for rsync_log in rsync_logs:
+        log.read(rsync_log)
+
+    return log
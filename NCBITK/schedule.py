@@ -0,0 +1,163 @@
+import heapq
+import os
+
+# Ranks for assembly_level, most complete first
+ASSEMBLY_LEVELS = ['Complete_Genome', 'Chromosome', 'Scaffold', 'Contig']
+
+# Typical size of a compressed bacterial genome, used until a remote
+# listing has been cached for an accession
+DEFAULT_SIZE = 1500000
+
+
+def get_remote_sizes_path(genbank_mirror):
+
+    return os.path.join(genbank_mirror, '.info', 'remote_sizes.tsv')
+
+
+def read_remote_sizes(genbank_mirror):
+    """
+    Cached sizes of the remote genome files keyed by accession version.
+    """
+
+    sizes = {}
+    remote_sizes = get_remote_sizes_path(genbank_mirror)
+    if not os.path.isfile(remote_sizes):
+        return sizes
+
+    with open(remote_sizes) as f:
+        for line in f:
+            accession, size = line.split('\t')
+            sizes[accession] = int(size)
+
+    return sizes
+
+
+def write_remote_sizes(genbank_mirror, sizes):
+    """
+    Merge sizes into the cache.
+    """
+
+    cached = read_remote_sizes(genbank_mirror)
+    cached.update(sizes)
+    remote_sizes = get_remote_sizes_path(genbank_mirror)
+    tmp = '{}.tmp'.format(remote_sizes)
+    with open(tmp, 'w') as f:
+        for accession, size in sorted(cached.items()):
+            f.write('{}\t{}\n'.format(accession, size))
+    os.replace(tmp, remote_sizes)
+
+
+def get_expected_sizes(accessions, remote_sizes):
+
+    known = sorted(remote_sizes[a] for a in accessions if a in remote_sizes)
+    default = known[len(known) // 2] if known else DEFAULT_SIZE
+
+    return {a: remote_sizes.get(a, default) for a in accessions}
+
+
+def get_level_rank(assembly_level):
+
+    if not isinstance(assembly_level, str):
+        return len(ASSEMBLY_LEVELS)
+    assembly_level = assembly_level.replace(' ', '_')
+    if assembly_level in ASSEMBLY_LEVELS:
+        return ASSEMBLY_LEVELS.index(assembly_level)
+
+    return len(ASSEMBLY_LEVELS)
+
+
+def get_priority(assembly_summary, accession, species_rank, by_level=True):
+    """
+    Rank of accession by its species' place in species_rank, then by
+    assembly level.
+    """
+
+    species = assembly_summary.scientific_name.loc[accession]
+    level = assembly_summary.assembly_level.loc[accession]
+
+    return (species_rank.get(species, len(species_rank)),
+            get_level_rank(level) if by_level else 0)
+
+
+def get_species_rank(species_list):
+
+    if not species_list:
+        return {}
+
+    return {name: i for i, name in enumerate(species_list)}
+
+
+def order_genomes(assembly_summary, new_genomes, sizes, species_list=None,
+                  by_level=True):
+    """
+    Order new_genomes by species_list order, then assembly level, then
+    smallest first so that as many genomes as possible complete early.
+    """
+
+    species_rank = get_species_rank(species_list)
+
+    def key(accession):
+        return (get_priority(assembly_summary, accession, species_rank,
+                             by_level) + (sizes[accession], accession))
+
+    return sorted(new_genomes, key=key)
+
+
+def shard_genomes(ordered_genomes, sizes, shards):
+    """
+    Split ordered_genomes into shards with balanced total size using
+    longest-processing-time-first packing.  Each shard keeps the order of
+    ordered_genomes.
+    """
+
+    shards = max(1, min(shards, len(ordered_genomes)))
+    position = {a: i for i, a in enumerate(ordered_genomes)}
+    heap = [(0, i) for i in range(shards)]
+    packed = [[] for i in range(shards)]
+
+    for accession in sorted(ordered_genomes, key=lambda a: -sizes[a]):
+        load, i = heapq.heappop(heap)
+        packed[i].append(accession)
+        heapq.heappush(heap, (load + sizes[accession], i))
+
+    return [sorted(shard, key=position.get) for shard in packed if shard]
+
+
+def schedule_genomes(genbank_mirror, assembly_summary, new_genomes,
+                     species_list=None, shards=1):
+    """
+    Return new_genomes ordered and packed into shards.
+    """
+
+    sizes = get_expected_sizes(new_genomes,
+                               read_remote_sizes(genbank_mirror))
+    ordered = order_genomes(assembly_summary, new_genomes, sizes,
+                            species_list)
+
+    return shard_genomes(ordered, sizes, shards)
+
+
+def schedule_tiers(genbank_mirror, assembly_summary, new_genomes,
+                   species_list=None, shards=1):
+    """
+    Split new_genomes into priority tiers, genomes of the same species_list
+    rank and assembly level, and pack each tier into shards.  rsync sorts
+    the files it is given by name, so the order within a list is lost;
+    transferring the tiers one after the other keeps the priority.
+    """
+
+    sizes = get_expected_sizes(new_genomes,
+                               read_remote_sizes(genbank_mirror))
+    ordered = order_genomes(assembly_summary, new_genomes, sizes,
+                            species_list)
+    species_rank = get_species_rank(species_list)
+    tiers = []
+    last = None
+    for accession in ordered:
+        priority = get_priority(assembly_summary, accession, species_rank)
+        if priority != last:
+            tiers.append([])
+            last = priority
+        tiers[-1].append(accession)
+
+    return [shard_genomes(tier, sizes, shards) for tier in tiers]
@@ -0,0 +1,185 @@
+import os
+import struct
+from multiprocessing import Pool
+
+import numpy as np
+
+MAGIC = b'NCSK'
+HEADER = struct.Struct('<4sBBI')
+VERSION = 1
+
+# A, C, G and T map to 0-3, anything else is ambiguous
+CODES = np.full(256, 4, dtype=np.uint8)
+for i, base in enumerate(b'ACGT'):
+    CODES[base] = i
+    CODES[ord(chr(base).lower())] = i
+
+
+def get_sketch_dir(genbank_mirror):
+
+    sketch_dir = os.path.join(genbank_mirror, '.info', 'sketches')
+    if not os.path.isdir(sketch_dir):
+        os.makedirs(sketch_dir, exist_ok=True)
+
+    return sketch_dir
+
+
+def get_sketch_path(genbank_mirror, accession):
+
+    return os.path.join(get_sketch_dir(genbank_mirror),
+                        '{}.sketch'.format(accession))
+
+
+def read_records(fasta):
+    """
+    Yield the sequence of each record in fasta as bytes.
+    """
+
+    seq = []
+    with open(fasta, 'rb') as f:
+        for line in f:
+            if line.startswith(b'>'):
+                if seq:
+                    yield b''.join(seq)
+                seq = []
+            else:
+                seq.append(line.rstrip(b'\r\n'))
+    if seq:
+        yield b''.join(seq)
+
+
+def mix64(x):
+    """
+    splitmix64 finalizer over a uint64 array.
+    """
+
+    x = x ^ (x >> np.uint64(30))
+    x = x * np.uint64(0xbf58476d1ce4e5b9)
+    x = x ^ (x >> np.uint64(27))
+    x = x * np.uint64(0x94d049bb133111eb)
+    x = x ^ (x >> np.uint64(31))
+    return x
+
+
+def hash_kmers(seq, k):
+    """
+    Hash every canonical k-mer of seq without ambiguous bases.
+    """
+
+    codes = CODES[np.frombuffer(seq, dtype=np.uint8)]
+    n = len(codes) - k + 1
+    if n < 1:
+        return np.empty(0, dtype=np.uint64)
+
+    invalid = np.concatenate(([0], np.cumsum(codes == 4)))
+    valid = invalid[k:] - invalid[:-k] == 0
+
+    codes = codes.astype(np.uint64)
+    forward = np.zeros(n, dtype=np.uint64)
+    reverse = np.zeros(n, dtype=np.uint64)
+    for j in range(k):
+        window = codes[j:j + n]
+        forward = (forward << np.uint64(2)) | window
+        reverse = reverse | ((np.uint64(3) - window) << np.uint64(2 * j))
+    reverse[~valid] = 0
+
+    return mix64(np.minimum(forward, reverse)[valid])
+
+
+def sketch_genome(fasta, k=21, size=1000):
+    """
+    Bottom-size MinHash sketch of all records in fasta.
+    """
+
+    hashes = [np.unique(hash_kmers(seq, k)) for seq in read_records(fasta)]
+    if not hashes:
+        return np.empty(0, dtype=np.uint64)
+
+    return np.unique(np.concatenate(hashes))[:size]
+
+
+def write_sketch(hashes, k, path):
+
+    tmp = '{}.tmp'.format(path)
+    with open(tmp, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, k, len(hashes)))
+        f.write(hashes.astype('<u8').tobytes())
+    os.replace(tmp, path)
+
+
+def read_sketch(path):
+    """
+    Return (k, hashes) from a sketch file.
+    """
+
+    with open(path, 'rb') as f:
+        magic, version, k, count = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC or version != VERSION:
+            raise ValueError('{} is not a sketch file'.format(path))
+        hashes = np.fromfile(f, dtype='<u8', count=count)
+
+    return k, hashes
+
+
+def mash_distance(a, b, k, size=1000):
+    """
+    Mash distance between two sorted bottom-size sketches.
+    """
+
+    union = np.union1d(a, b)[:size]
+    if not len(union):
+        return 1.0
+    shared = np.intersect1d(np.intersect1d(a, b), union, assume_unique=True)
+    jaccard = len(shared) / len(union)
+    if not jaccard:
+        return 1.0
+
+    return float(-np.log(2 * jaccard / (1 + jaccard)) / k)
+
+
+def get_sketch_files(genbank_mirror, local_genomes):
+    """
+    Split the local genomes into those with an up to date sketch and those
+    whose sketch is missing or older than the genome.
+    """
+
+    sketch_dir = get_sketch_dir(genbank_mirror)
+    present = set(os.listdir(sketch_dir))
+    sketch_files = {}
+    missing_sketch_files = []
+
+    for accession, genome_path in local_genomes.items():
+        name = '{}.sketch'.format(accession)
+        sketch_path = os.path.join(sketch_dir, name)
+        if name in present and (os.path.getmtime(sketch_path) >=
+                                os.path.getmtime(genome_path)):
+            sketch_files[accession] = sketch_path
+        else:
+            missing_sketch_files.append(accession)
+
+    return sketch_files, missing_sketch_files
+
+
+def _sketch_job(job):
+
+    accession, genome_path, sketch_path, k, size = job
+    write_sketch(sketch_genome(genome_path, k, size), k, sketch_path)
+
+    return accession
+
+
+def sketch_genbank(genbank_mirror, local_genomes, missing_sketch_files,
+                   logger, k=21, size=1000, processes=None):
+    """
+    Sketch the genomes listed in missing_sketch_files across a process pool.
+    """
+
+    jobs = [(accession, local_genomes[accession],
+             get_sketch_path(genbank_mirror, accession), k, size)
+            for accession in missing_sketch_files]
+    if not jobs:
+        return
+
+    with Pool(processes) as pool:
+        for accession in pool.imap_unordered(_sketch_job, jobs):
+            logger.info('Sketched {}'.format(accession))
@@ -5,25 +5,54 @@ import re
 import argparse
 import subprocess
 
-from urllib.request import urlretrieve
 from urllib.error import URLError
 from ftplib import error_temp
-from time import strftime, sleep
+from time import strftime, sleep, time
+
+from NCBITK import rsync_log, schedule, transfer
+from NCBITK.events import EventStream, get_events_dir
+
+# rsync module holding the genomes/all/ tree that ftp_path points into
+RSYNC_SOURCE = 'ftp.ncbi.nlm.nih.gov::genomes/all/'
+
+
+def get_md5s(connections, genome_url):
+    """
+    Digests from the md5checksums.txt published with each assembly.
+    """
+
+    try:
+        md5checksums = connections.read('{}/md5checksums.txt'.format(
+            genome_url))
+    except URLError:
+        return {}
+
+    return transfer.parse_md5checksums(md5checksums.decode())
 
 
 def grab_zipped_genome(genbank_mirror,
                        species,
                        genome_id,
                        genome_url,
-                       ext=".fna.gz"):
+                       ext=".fna.gz",
+                       connections=None):
     """
     Download compressed genome from ftp://ftp.ncbi.nlm.nih.gov/genomes/all/
+    Interrupted downloads are resumed from the .part file left behind.
     """
 
+    if connections is None:
+        with transfer.Transfer() as connections:
+            return grab_zipped_genome(genbank_mirror, species, genome_id,
+                                      genome_url, ext, connections)
+
     zipped_path = "{}_genomic{}".format(genome_id, ext)
     zipped_url = "{}/{}".format(genome_url, zipped_path)
     zipped_dst = os.path.join(genbank_mirror, species, zipped_path)
-    urlretrieve(zipped_url, zipped_dst)
+    md5s = get_md5s(connections, genome_url)
+
+    return connections.fetch(zipped_url, zipped_dst,
+                             md5=md5s.get(zipped_path))
 
 
 def get_genome_id_and_url(assembly_summary, accession):
@@ -34,37 +63,80 @@ def get_genome_id_and_url(assembly_summary, accession):
     return genome_id, genome_url
 
 
-def sync_latest_genomes(genbank_mirror, assembly_summary, new_genomes, logger):
+def sync_genome(genbank_mirror, assembly_summary, accession, logger,
+                connections, events):
+    """
+    Download one genome, retrying once on a temporary FTP error and falling
+    back to the .fasta.gz name.  Emits a 'downloaded' or 'retry' event.
+    """
 
+    genome_id, genome_url = get_genome_id_and_url(assembly_summary,
+                                                  accession)
+    species = assembly_summary.scientific_name.loc[accession]
+    start = time()
+
+    def downloaded(dst):
+        events.emit('downloaded', accession=accession, genome_id=genome_id,
+                    path=dst, bytes=os.path.getsize(dst),
+                    seconds=time() - start)
+        logger.info("Downloaded {}".format(genome_id))
+
+    try:
+        dst = grab_zipped_genome(genbank_mirror, species, genome_id,
+                                 genome_url, connections=connections)
+        downloaded(dst)
+    except error_temp as e:
+        events.emit('retry', accession=accession, error=str(e))
+        logger.info('error_temp for {}\n{}'.format(genome_id, e))
+        sleep(2)
+        dst = grab_zipped_genome(genbank_mirror, species, genome_id,
+                                 genome_url, connections=connections)
+        downloaded(dst)
+    except URLError as e:
+        events.emit('retry', accession=accession, error=str(e))
+        logger.info('URLError[1] for {}\n{}'.format(genome_id, e))
+        dst = grab_zipped_genome(
+            genbank_mirror,
+            species,
+            genome_id,
+            genome_url,
+            ext=".fasta.gz",
+            connections=connections)
+        downloaded(dst)
+
+
+def sync_latest_genomes(genbank_mirror, assembly_summary, new_genomes, logger,
+                        species_list=None, connections=None, events=None):
+    """
+    Download new_genomes one by one.  A 'downloaded' or 'retry' event per
+    genome goes to events, by default a file of this process in the
+    mirror's events directory.
+    """
+
+    if connections is None:
+        with transfer.Transfer() as connections:
+            return sync_latest_genomes(genbank_mirror, assembly_summary,
+                                       new_genomes, logger, species_list,
+                                       connections, events)
+    if events is None:
+        with EventStream(get_events_dir(genbank_mirror)) as events:
+            return sync_latest_genomes(genbank_mirror, assembly_summary,
+                                       new_genomes, logger, species_list,
+                                       connections, events)
+
+    new_genomes = sum(schedule.schedule_genomes(
+        genbank_mirror, assembly_summary, new_genomes, species_list), [])
     for accession in new_genomes:
-        genome_id, genome_url = get_genome_id_and_url(assembly_summary,
-                                                      accession)
-        species = assembly_summary.scientific_name.loc[accession]
-        try:
-            grab_zipped_genome(genbank_mirror, species, genome_id, genome_url)
-            logger.info("Downloaded {}".format(genome_id))
-        except error_temp as e:
-            logger.info('error_temp for {}\n{}'.format(genome_id, e))
-            sleep(2)
-            grab_zipped_genome(genbank_mirror, species, genome_id, genome_url)
-            logger.info("Downloaded {}".format(genome_id))
-        except URLError as e:
-            logger.info('URLError[1] for {}\n{}'.format(genome_id, e))
-            grab_zipped_genome(
-                genbank_mirror,
-                species,
-                genome_id,
-                genome_url,
-                ext=".fasta.gz")
-            logger.info("Downloaded {}".format(genome_id))
-        except URLError as e:
-            logger.info('URLError[2] for {}\n{}'.format(genome_id, e))
-            continue
-
-
-def write_ftp_paths(genbank_mirror, assembly_summary, new_genomes):
-
-    ftp_paths_file = os.path.join(genbank_mirror, '.info', 'ftp_paths.txt')
+        sync_genome(genbank_mirror, assembly_summary, accession, logger,
+                    connections, events)
+
+
+def write_ftp_paths(genbank_mirror, assembly_summary, new_genomes,
+                    ftp_paths_file=None):
+
+    if ftp_paths_file is None:
+        ftp_paths_file = os.path.join(genbank_mirror, '.info',
+                                      'ftp_paths.txt')
 
     if os.path.isfile(ftp_paths_file):
         os.remove(ftp_paths_file)
@@ -72,8 +144,7 @@ def write_ftp_paths(genbank_mirror, assembly_summary, new_genomes):
     with open(ftp_paths_file, 'a') as f:
         for accession in new_genomes:
             genome_url = assembly_summary.ftp_path[accession]
-            genome_url = re.sub(r'ftp://ftp.ncbi.nlm.nih.gov/genomes/all/', '',
-                                genome_url)
+            genome_url = re.sub(r'^.*?/genomes/all/', '', genome_url)
             genome_parent_dir = genome_url.split('/')[-1]
             genome_url = '{}/{}_genomic.fna.gz'.format(genome_url,
                                                        genome_parent_dir)
@@ -83,21 +154,54 @@ def write_ftp_paths(genbank_mirror, assembly_summary, new_genomes):
     return ftp_paths_file
 
 
-def rsync_latest_genomes(genbank_mirror, assembly_summary, new_genomes):
+def rsync_latest_genomes(genbank_mirror, assembly_summary, new_genomes,
+                         shards=1, species_list=None, source=RSYNC_SOURCE):
+    """
+    Fetch new_genomes into incoming with rsync.  Genomes are split into
+    priority tiers by species_list order and assembly level, and each tier
+    into shards of balanced expected size, each transferred by its own rsync
+    process.  A tier starts once the one before it is done, as rsync
+    transfers the files of a list in name order, not in the order given.
+    source is the rsync location of genomes/all/, e.g.
+    rsync://host:port/genomes/all/ for a local mirror.
+    Returns the rsync log of each shard, for rsync_log.read_rsync_logs.
+    """
 
-    ftp_paths_file = write_ftp_paths(genbank_mirror, assembly_summary,
-                                     new_genomes)
-    rsync_log = os.path.join(genbank_mirror, '.info',
-                             'rsync_{}.out'.format(strftime('%Y.%m.%d.%H:%M')))
+    tiers = schedule.schedule_tiers(genbank_mirror, assembly_summary,
+                                    new_genomes, species_list, shards)
+    timestamp = strftime('%Y.%m.%d.%H:%M')
     incoming = os.path.join(genbank_mirror, 'incoming')
     if not os.path.isdir(incoming):
         os.mkdir(incoming)
 
-    cmd = 'rsync --chmod=ugo=rwX --times --progress --itemize-changes --stats --files-from={}\
-    --log-file={} --prune-empty-dirs ftp.ncbi.nlm.nih.gov::genomes/all/ {}'.format(
-        ftp_paths_file, rsync_log, incoming)
-
-    subprocess.Popen(cmd, shell=True).wait()
+    rsync_logs = []
+    for t, scheduled in enumerate(tiers):
+        processes = []
+        for i, shard in enumerate(scheduled):
+            suffix = ''
+            if len(tiers) > 1:
+                suffix += '.{}'.format(t)
+            if len(scheduled) > 1:
+                suffix += '.{}'.format(i)
+            ftp_paths_file = os.path.join(genbank_mirror, '.info',
+                                          'ftp_paths{}.txt'.format(suffix))
+            write_ftp_paths(genbank_mirror, assembly_summary, shard,
+                            ftp_paths_file)
+            rsync_logs.append(os.path.join(
+                genbank_mirror, '.info', 'rsync_{}{}.out'.format(timestamp,
+                                                                 suffix)))
+
+            cmd = 'rsync --chmod=ugo=rwX --times --progress --itemize-changes --stats --files-from={}\
+            --log-file={} --log-file-format="{}" --prune-empty-dirs {} {}'.format(
+                ftp_paths_file, rsync_logs[-1], rsync_log.LOG_FILE_FORMAT,
+                source, incoming)
+
+            processes.append(subprocess.Popen(cmd, shell=True))
+
+        for process in processes:
+            process.wait()
+
+    return rsync_logs
 
 
 def main():
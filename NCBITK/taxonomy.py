@@ -0,0 +1,190 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+ROOT = 1
+
+
+def get_taxonomy_path(info_dir):
+
+    return os.path.join(info_dir, 'taxonomy.npz')
+
+
+def normalize_name(name):
+
+    return name.replace('_', ' ').strip().lower()
+
+
+def read_nodes(nodes_dmp):
+    """
+    Return (taxids, parents) from nodes.dmp.
+    """
+
+    nodes = pd.read_csv(
+        nodes_dmp, sep='\t', header=None, usecols=[0, 2], dtype=np.int64)
+
+    return nodes[0].values, nodes[2].values
+
+
+def read_scientific_names(names_dmp):
+
+    names = pd.read_csv(
+        names_dmp, sep='\t', header=None, usecols=[0, 2, 6],
+        quoting=3, dtype={0: np.int64, 2: str, 6: str})
+    names = names[names[6] == 'scientific name']
+
+    return names[0].values, names[2].values
+
+
+def euler_intervals(parent):
+    """
+    Number the nodes in preorder from ROOT.  The subtree of a node is then
+    preorder[tin[node]:tout[node]].
+    """
+
+    size = len(parent)
+    nodes = np.flatnonzero(parent >= 0)
+    nodes = nodes[nodes != ROOT]
+    order = np.argsort(parent[nodes], kind='stable')
+    children = nodes[order]
+    starts = np.searchsorted(parent[children], np.arange(size + 1))
+
+    tin = np.full(size, -1, dtype=np.int32)
+    tout = np.full(size, -1, dtype=np.int32)
+    preorder = np.empty(len(nodes) + 1, dtype=np.int32)
+    counter = 0
+    stack = [(ROOT, False)]
+    while stack:
+        node, done = stack.pop()
+        if done:
+            tout[node] = counter
+            continue
+        tin[node] = counter
+        preorder[counter] = node
+        counter += 1
+        stack.append((node, True))
+        for child in children[starts[node]:starts[node + 1]][::-1]:
+            stack.append((int(child), False))
+
+    return tin, tout, preorder[:counter]
+
+
+def build_taxonomy(nodes_dmp, names_dmp, taxonomy_path):
+    """
+    Pack nodes.dmp and the scientific names from names.dmp into a parent
+    pointer array with preorder intervals and a sorted name table.
+    """
+
+    taxids, parents = read_nodes(nodes_dmp)
+    parent = np.full(taxids.max() + 1, -1, dtype=np.int32)
+    parent[taxids] = parents
+    tin, tout, preorder = euler_intervals(parent)
+
+    name_taxids, names = read_scientific_names(names_dmp)
+    keys = [normalize_name(name).encode() for name in names]
+    order = sorted(range(len(keys)), key=keys.__getitem__)
+    keys = [keys[i] for i in order]
+    offsets = np.zeros(len(keys) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(key) for key in keys])
+    blob = np.frombuffer(b''.join(keys), dtype=np.uint8)
+
+    np.savez(
+        taxonomy_path,
+        parent=parent,
+        tin=tin,
+        tout=tout,
+        preorder=preorder,
+        name_blob=blob,
+        name_offsets=offsets,
+        name_taxids=name_taxids[order].astype(np.int32))
+
+    return Taxonomy(taxonomy_path)
+
+
+class Taxonomy(object):
+    """
+    Read-only taxonomy tree built by build_taxonomy.
+    """
+
+    def __init__(self, taxonomy_path):
+
+        data = np.load(taxonomy_path)
+        self.parent = data['parent']
+        self.tin = data['tin']
+        self.tout = data['tout']
+        self.preorder = data['preorder']
+        self._blob = data['name_blob'].tobytes()
+        self._offsets = data['name_offsets']
+        self._name_taxids = data['name_taxids']
+
+    def _key(self, i):
+        return self._blob[self._offsets[i]:self._offsets[i + 1]]
+
+    def _bisect(self, key):
+
+        lo, hi = 0, len(self._name_taxids)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._key(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def resolve(self, taxon):
+        """
+        Return the taxids for a taxid or scientific name.
+        """
+
+        taxon = str(taxon)
+        if taxon.isdigit():
+            taxid = int(taxon)
+            if taxid < len(self.tin) and self.tin[taxid] >= 0:
+                return [taxid]
+            return []
+
+        key = normalize_name(taxon).encode()
+        i = self._bisect(key)
+        taxids = []
+        while i < len(self._name_taxids) and self._key(i) == key:
+            taxids.append(int(self._name_taxids[i]))
+            i += 1
+        return taxids
+
+    def subtree(self, taxid):
+
+        return self.preorder[self.tin[taxid]:self.tout[taxid]]
+
+    def in_subtree(self, taxids, root):
+        """
+        Boolean mask of taxids that descend from (or equal) root.
+        """
+
+        taxids = np.asarray(taxids, dtype=np.int64)
+        known = (taxids >= 0) & (taxids < len(self.tin))
+        tin = np.full(len(taxids), -1, dtype=np.int64)
+        tin[known] = self.tin[taxids[known]]
+
+        return (tin >= self.tin[root]) & (tin < self.tout[root])
+
+
+def get_taxon_accessions(assembly_summary, tree, taxa):
+    """
+    Accessions whose taxid falls under any of taxa (names or taxids).
+    """
+
+    mask = np.zeros(len(assembly_summary.index), dtype=bool)
+    for taxon in taxa:
+        for root in tree.resolve(taxon):
+            mask |= tree.in_subtree(assembly_summary.taxid.values, root)
+
+    return assembly_summary.index[mask].tolist()
+
+
+def get_taxon_species(assembly_summary, tree, taxa):
+
+    accessions = get_taxon_accessions(assembly_summary, tree, taxa)
+    species = assembly_summary.scientific_name.loc[accessions]
+
+    return tuple(sorted(set(species.dropna().tolist())))
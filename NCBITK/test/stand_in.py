@@ -0,0 +1,90 @@
+"""
+Local stand-in for the NCBI HTTP servers used by the tests.
+"""
+
+import os
+import posixpath
+import re
+import threading
+from http.server import HTTPServer, SimpleHTTPRequestHandler
+from socketserver import ThreadingMixIn
+from urllib.parse import unquote, urlsplit
+
+
+class ThreadedHTTPServer(ThreadingMixIn, HTTPServer):
+
+    daemon_threads = True
+
+
+class RangeRequestHandler(SimpleHTTPRequestHandler):
+    """
+    Serve files from a directory over keep-alive HTTP/1.1 with support for
+    single open-ended byte ranges.
+    """
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def translate_path(self, path):
+
+        path = posixpath.normpath(unquote(urlsplit(path).path))
+        parts = [part for part in path.split('/')
+                 if part not in ('', '.', '..')]
+
+        return os.path.join(self.server.directory, *parts)
+
+    def do_HEAD(self):
+
+        self.server.heads.append(self.path)
+        super(RangeRequestHandler, self).do_HEAD()
+
+    def do_GET(self):
+
+        self.server.requests.append((self.client_address, self.path,
+                                     self.headers.get('Range')))
+        path = self.translate_path(self.path)
+        if not os.path.isfile(path):
+            self.send_error(404)
+            return
+
+        with open(path, 'rb') as f:
+            data = f.read()
+        start = 0
+        match = re.match(r'bytes=(\d+)-$', self.headers.get('Range', ''))
+        if match:
+            start = int(match.group(1))
+            if start >= len(data):
+                self.send_response(416)
+                self.send_header('Content-Range',
+                                 'bytes */{}'.format(len(data)))
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header('Content-Range', 'bytes {}-{}/{}'.format(
+                start, len(data) - 1, len(data)))
+        else:
+            self.send_response(200)
+        self.send_header('Content-Length', str(len(data) - start))
+        self.end_headers()
+        self.wfile.write(data[start:])
+
+
+def serve(directory, handler=RangeRequestHandler):
+    """
+    Start a server for directory on a free port in a background thread.
+    Returns the server; its base url is server.url and the paths it was
+    asked for are in server.requests (GET) and server.heads (HEAD).
+    """
+
+    server = ThreadedHTTPServer(('127.0.0.1', 0), handler)
+    server.directory = directory
+    server.requests = []
+    server.heads = []
+    server.url = 'http://127.0.0.1:{}'.format(server.server_address[1])
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    return server
@@ -0,0 +1,87 @@
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+import pandas as pd
+from NCBITK import catalog, config, curate
+
+
+class TestCatalog(unittest.TestCase):
+    def setUp(self):
+
+        self.genbank_mirror = tempfile.mkdtemp(prefix='Genbank_')
+        self.path_vars = config.instantiate_path_vars(self.genbank_mirror)
+        self.info_dir, self.slurm, self.out, self.logger = self.path_vars
+        self.assembly_summary = pd.read_csv(
+            'NCBITK/test/resources/updated_assembly_summary.txt',
+            sep="\t",
+            index_col=0)
+        self.catalog_path = catalog.get_catalog_path(self.genbank_mirror)
+        catalog.build_catalog(self.catalog_path, self.assembly_summary)
+        self.species = 'Buchnera_aphidicola'
+        self.buchnera = self.assembly_summary[
+            self.assembly_summary.scientific_name == self.species]
+        species_dir = os.path.join(self.genbank_mirror, self.species)
+        os.mkdir(species_dir)
+        for accession in self.buchnera.index[:2]:
+            open(os.path.join(species_dir, '{}.fasta'.format(accession)),
+                 'w').close()
+        catalog.update_local(self.catalog_path,
+                             curate.get_local_genomes(self.genbank_mirror))
+
+    def run_query(self, **filters):
+
+        results = catalog.query(self.catalog_path, **filters)
+        header = next(results)
+        return [dict(zip(header, row)) for row in results]
+
+    def test_filters(self):
+
+        rows = self.run_query(species=[self.species])
+        complete = self.run_query(species=['Buchnera aphidicola'],
+                                  assembly_levels=['Complete Genome'])
+        by_taxid = self.run_query(taxids=[int(
+            self.buchnera.species_taxid.iloc[0])])
+
+        self.assertEqual([r['accession'] for r in rows],
+                         sorted(self.buchnera.index))
+        self.assertEqual(len(complete), sum(
+            self.buchnera.assembly_level == 'Complete Genome'))
+        self.assertEqual(len(by_taxid), len(self.buchnera.index))
+
+    def test_local(self):
+
+        local = self.run_query(species=[self.species], local=True)
+        missing = self.run_query(species=[self.species], local=False)
+        count = self.run_query(local=True, count=True)
+
+        self.assertEqual(len(local), 2)
+        self.assertTrue(all(r['local'] for r in local))
+        self.assertEqual(len(missing), len(self.buchnera.index) - 2)
+        self.assertEqual(count, [{'count': 2}])
+
+    def test_group_by(self):
+
+        groups = self.run_query(group_by='assembly_level')
+        counts = self.assembly_summary.assembly_level.value_counts()
+
+        self.assertEqual({g['assembly_level']: g['count'] for g in groups},
+                         counts.to_dict())
+
+    def test_write_json(self):
+
+        out = io.StringIO()
+        catalog.write_json(
+            catalog.query(self.catalog_path, isolate='Tokyo1998'), out)
+        rows = [json.loads(line) for line in out.getvalue().splitlines()]
+
+        self.assertEqual([r['accession'] for r in rows], ['GCA_000009605.1'])
+
+    def tearDown(self):
+        shutil.rmtree(self.genbank_mirror)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import os
+import shutil
+import tempfile
+import unittest
+from NCBITK import config, contigs, curate
+
+
+class TestContigs(unittest.TestCase):
+    def setUp(self):
+
+        self.genbank_mirror = tempfile.mkdtemp(prefix='Genbank_')
+        self.path_vars = config.instantiate_path_vars(self.genbank_mirror)
+        self.info_dir, self.slurm, self.out, self.logger = self.path_vars
+        self.species_dir = os.path.join(self.genbank_mirror,
+                                        'Buchnera_aphidicola')
+        os.mkdir(self.species_dir)
+        self.add_genome('GCA_000007365.1', ['CP000001.1', 'CP000002.1'])
+        self.add_genome('GCA_000007725.1', ['AE016826.1'])
+
+    def add_genome(self, accession, contig_ids):
+
+        fasta = os.path.join(self.species_dir, '{}.fasta'.format(accession))
+        with open(fasta, 'w') as f:
+            for contig_id in contig_ids:
+                f.write('>{} description\nACGTACGT\nACG\n'.format(contig_id))
+
+        return fasta
+
+    def test_lookup(self):
+
+        self.assertEqual(contigs.update_contig_index(self.genbank_mirror), 2)
+        index = contigs.ContigIndex(self.genbank_mirror)
+        hits = list(index.lookup(['CP000002.1', 'missing', 'AE016826.1']))
+
+        self.assertEqual(len(index), 3)
+        self.assertIsNone(hits[1])
+        accession, path, offset = hits[0]
+        self.assertEqual(accession, 'GCA_000007365.1')
+        with open(path, 'rb') as f:
+            f.seek(offset)
+            self.assertEqual(f.read(8), b'ACGTACGT')
+        with open(path, 'rb') as f:
+            data = f.read()
+        self.assertEqual(data.rfind(b'>CP000002.1', 0, offset),
+                         data.index(b'>CP000002.1'))
+        self.assertEqual(hits[2][0], 'GCA_000007725.1')
+
+    def test_incremental_update(self):
+
+        contigs.update_contig_index(self.genbank_mirror)
+        self.assertEqual(contigs.update_contig_index(self.genbank_mirror), 0)
+
+        self.add_genome('GCA_000009605.1', ['AP000001.1'])
+        local_genomes = curate.get_local_genomes(self.genbank_mirror)
+        os.remove(local_genomes['GCA_000007725.1'])
+        renamed = os.path.join(self.species_dir,
+                               'GCA_000007365.1_renamed.fasta')
+        os.rename(local_genomes['GCA_000007365.1'], renamed)
+
+        self.assertEqual(contigs.update_contig_index(self.genbank_mirror), 1)
+        index = contigs.ContigIndex(self.genbank_mirror)
+        self.assertEqual(index.find(['AE016826.1']).tolist(), [-1])
+        self.assertEqual(index.lookup_all('AP000001.1')[0][0],
+                         'GCA_000009605.1')
+        self.assertEqual(index.lookup_all('CP000001.1')[0][1], renamed)
+
+    def test_shared_ids(self):
+
+        self.add_genome('GCF_000007365.1', ['CP000001.1'])
+        contigs.update_contig_index(self.genbank_mirror)
+        index = contigs.ContigIndex(self.genbank_mirror)
+
+        hits = index.lookup_all('CP000001.1')
+        self.assertEqual([hit[0] for hit in hits],
+                         ['GCA_000007365.1', 'GCF_000007365.1'])
+        self.assertEqual(next(index.lookup(['CP000001.1']))[0],
+                         'GCA_000007365.1')
+
+    def tearDown(self):
+        shutil.rmtree(self.genbank_mirror)
+
+
+if __name__ == '__main__':
+    unittest.main()
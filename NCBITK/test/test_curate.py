@@ -1,4 +1,5 @@
 import glob
+import gzip
 import os
 import shutil
 import tempfile
@@ -72,12 +73,15 @@ class TestCurate(unittest.TestCase):
             self.genbank_mirror, self.updated_assembly_summary,
             self.all_species_from_assembly_summary, self.logger)
 
-        local_genomes, new_genomes, old_genomes = genbank_assessment
+        (local_genomes, new_genomes, old_genomes, sketch_files,
+         missing_sketch_files) = genbank_assessment
 
         self.assertTrue(
             len(new_genomes) == len(self.all_genomes_from_assembly_summary))
         self.assertTrue(len(local_genomes) == 0)
         self.assertTrue(len(old_genomes) == 0)
+        self.assertTrue(len(sketch_files) == 0)
+        self.assertTrue(len(missing_sketch_files) == 0)
 
     def test_assess_changes(self):
 
@@ -89,7 +93,8 @@ class TestCurate(unittest.TestCase):
             self.genbank_mirror, self.updated_assembly_summary,
             self.species_list, self.logger)
 
-        local_genomes, new_genomes, old_genomes = genbank_assessment
+        (local_genomes, new_genomes, old_genomes, sketch_files,
+         missing_sketch_files) = genbank_assessment
         before_sync_new_genomes = new_genomes[:10]
         after_sync_new_genomes = new_genomes[10:]
 
@@ -103,12 +108,14 @@ class TestCurate(unittest.TestCase):
             self.updated_assembly_summary.drop(before_sync_new_genomes[0]),
             self.species_list, self.logger)
 
-        local_genomes, new_genomes, old_genomes = genbank_assessment
+        (local_genomes, new_genomes, old_genomes, sketch_files,
+         missing_sketch_files) = genbank_assessment
 
         self.assertTrue(len(local_genomes) == len(before_sync_new_genomes))
         self.assertFalse(len(new_genomes) == 0)
         self.assertTrue(len(new_genomes) == len(after_sync_new_genomes))
         self.assertTrue(len(old_genomes) == 1)
+        self.assertTrue(len(missing_sketch_files) == len(local_genomes))
 
     # def test_get_old_genomes(self):
 
@@ -180,6 +187,108 @@ class TestCurate(unittest.TestCase):
                                             self.updated_assembly_summary)
             self.assertEqual(new_name, genome[1])
 
+    def test_parse_genome_id(self):
+
+        genomes = [('GCA_000009245.1_Francisella.fasta', 'GCA_000009245.1'),
+                   ('GCF_000009245.12_genomic.fna.gz', 'GCF_000009245.12')]
+        for genome, genome_id in genomes:
+            self.assertEqual(
+                curate.parse_genome_id(genome).group(0), genome_id)
+
+    def test_arrived_genomes(self):
+
+        os.mkdir(self.species_dir)
+        arrived = []
+        for accession in self.test_genomes[:3]:
+            genome_id = '{}_ASM1v1'.format(accession)
+            path = os.path.join('GCA', genome_id,
+                                '{}_genomic.fna.gz'.format(genome_id))
+            os.makedirs(os.path.join(self.incoming, 'GCA', genome_id))
+            with gzip.open(os.path.join(self.incoming, path), 'wb') as f:
+                f.write('>{}\nACGT\n'.format(accession).encode())
+            arrived.append(path)
+
+        # left in incoming by an interrupted rsync
+        partial = os.path.join(os.path.dirname(
+            os.path.join(self.incoming, arrived[2])), '.partial.fna.gz.x1')
+        open(partial, 'w').close()
+
+        moved = curate.post_rsync_cleanup(
+            self.genbank_mirror, self.updated_assembly_summary, self.logger,
+            arrived[:2])
+        unzipped = curate.unzip_genbank(self.genbank_mirror, moved)
+        renamed = curate.rename_genbank(
+            self.genbank_mirror, self.updated_assembly_summary, unzipped)
+
+        # the genome missing from the logs is kept and moved as well
+        self.assertEqual(len(unzipped), 3)
+        self.assertEqual(sorted(renamed), sorted(self.test_genomes[:3]))
+        self.assertEqual(list(curate.walk_files(self.incoming)), [partial])
+        for accession, path in renamed.items():
+            self.assertEqual(os.path.basename(path), curate.rename_genome(
+                accession, self.updated_assembly_summary))
+        self.assertEqual(curate.get_local_genomes(self.genbank_mirror),
+                         renamed)
+
+    def test_paired_genomes(self):
+
+        genbank = self.updated_assembly_summary.loc[self.test_genomes[:3]]
+        refseq = genbank.copy()
+        refseq.index = genbank.gbrs_paired_asm.tolist()
+        refseq['gbrs_paired_asm'] = genbank.index.tolist()
+        refseq.loc[refseq.index[2], 'paired_asm_comp'] = 'different'
+        assembly_summary = pd.concat([genbank, refseq])
+
+        pairs = curate.get_identical_pairs(assembly_summary)
+        self.assertEqual(pairs, dict(zip(refseq.index[:2], genbank.index[:2])))
+
+        to_fetch, to_link = curate.split_paired_genomes(
+            assembly_summary.index.tolist(), {}, pairs)
+        self.assertEqual(sorted(to_link), sorted(refseq.index[:2]))
+        self.assertEqual(len(to_fetch), 4)
+
+        os.mkdir(self.species_dir)
+        for accession in genbank.index:
+            fasta = os.path.join(self.species_dir,
+                                 '{}.fasta'.format(accession))
+            with open(fasta, 'w') as f:
+                f.write('>contig\nACGT\n')
+        curate.link_paired_genomes(self.genbank_mirror, assembly_summary,
+                                   pairs, self.logger)
+        local_genomes = curate.get_local_genomes(self.genbank_mirror)
+
+        self.assertEqual(len(local_genomes), 5)
+        for refseq_accession, genbank_accession in pairs.items():
+            self.assertTrue(os.path.samefile(
+                local_genomes[refseq_accession],
+                local_genomes[genbank_accession]))
+
+        # a second pass over a stale local_genomes leaves the links alone
+        stale = {accession: local_genomes[accession]
+                 for accession in genbank.index}
+        linked = curate.link_paired_genomes(self.genbank_mirror,
+                                            assembly_summary, pairs,
+                                            self.logger, stale)
+        self.assertEqual(sorted(linked), sorted(pairs))
+
+    def test_remove_linked_genome(self):
+
+        os.mkdir(self.species_dir)
+        genbank = os.path.join(self.species_dir, 'GCA_000007365.1.fasta')
+        refseq = os.path.join(self.species_dir, 'GCF_000007365.1.fasta')
+        with open(genbank, 'w') as f:
+            f.write('>contig\nACGT\n')
+        os.symlink(genbank, refseq)
+        local_genomes = curate.get_local_genomes(self.genbank_mirror)
+
+        broken = curate.remove_old_genomes(
+            self.genbank_mirror, self.updated_assembly_summary,
+            local_genomes, ['GCA_000007365.1'], self.logger)
+
+        self.assertEqual(broken, ['GCF_000007365.1'])
+        self.assertFalse(os.path.lexists(refseq))
+        self.assertEqual(curate.get_local_genomes(self.genbank_mirror), {})
+
     def tearDown(self):
         shutil.rmtree(self.genbank_mirror)
 
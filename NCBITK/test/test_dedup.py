@@ -0,0 +1,68 @@
+import os
+import shutil
+import tempfile
+import unittest
+from NCBITK import config, dedup
+
+
+class TestDedup(unittest.TestCase):
+    def setUp(self):
+
+        self.genbank_mirror = tempfile.mkdtemp(prefix='Genbank_')
+        self.path_vars = config.instantiate_path_vars(self.genbank_mirror)
+        self.info_dir, self.slurm, self.out, self.logger = self.path_vars
+        species_dir = os.path.join(self.genbank_mirror, 'Buchnera_aphidicola')
+        os.mkdir(species_dir)
+        self.genome = b'>contig\n' + b'ACGT' * 1000 + b'\n'
+        self.paths = {}
+        for accession, data in [('GCA_000007365.1', self.genome),
+                                ('GCA_000007725.1', self.genome),
+                                ('GCA_000009605.1', self.genome),
+                                ('GCA_000090965.1', b'>other\nGGCC\n')]:
+            path = os.path.join(species_dir, '{}.fasta'.format(accession))
+            with open(path, 'wb') as f:
+                f.write(data)
+            self.paths[accession] = path
+
+    def test_dry_run(self):
+
+        reclaimed = dedup.deduplicate(self.genbank_mirror, self.logger,
+                                      dry_run=True)
+
+        self.assertEqual(reclaimed, 2 * len(self.genome))
+        self.assertFalse(os.path.samefile(self.paths['GCA_000007365.1'],
+                                          self.paths['GCA_000007725.1']))
+
+    def test_deduplicate(self):
+
+        reclaimed = dedup.deduplicate(self.genbank_mirror, self.logger)
+        again = dedup.deduplicate(self.genbank_mirror, self.logger)
+
+        self.assertEqual(reclaimed, 2 * len(self.genome))
+        self.assertEqual(again, 0)
+        for accession in ['GCA_000007725.1', 'GCA_000009605.1']:
+            self.assertTrue(os.path.samefile(self.paths['GCA_000007365.1'],
+                                             self.paths[accession]))
+        with open(self.paths['GCA_000009605.1'], 'rb') as f:
+            self.assertEqual(f.read(), self.genome)
+
+    def test_hash_index(self):
+
+        dedup.deduplicate(self.genbank_mirror, self.logger)
+        index = dedup.HashIndex(self.genbank_mirror)
+        digest = dedup.sha256sum(self.paths['GCA_000090965.1'])
+
+        self.assertEqual(index.find(digest), self.paths['GCA_000090965.1'])
+        self.assertIsNone(index.find('0' * 64))
+
+        os.remove(self.paths['GCA_000090965.1'])
+        index.update(p for a, p in self.paths.items()
+                     if a != 'GCA_000090965.1')
+        self.assertIsNone(index.find(digest))
+
+    def tearDown(self):
+        shutil.rmtree(self.genbank_mirror)
+
+
+if __name__ == '__main__':
+    unittest.main()
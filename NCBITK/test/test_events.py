@@ -0,0 +1,119 @@
+import os
+import shutil
+import tempfile
+import unittest
+import pandas as pd
+from NCBITK import config, events, sync
+from NCBITK.test import stand_in
+
+
+class TestEvents(unittest.TestCase):
+    def setUp(self):
+
+        self.genbank_mirror = tempfile.mkdtemp(prefix='Genbank_')
+        self.path_vars = config.instantiate_path_vars(self.genbank_mirror)
+        self.info_dir, self.slurm, self.out, self.logger = self.path_vars
+        self.events_dir = events.get_events_dir(self.genbank_mirror)
+
+    def test_event_stream(self):
+
+        with events.EventStream(self.events_dir, batch_size=100) as stream:
+            for i in range(250):
+                stream.emit('downloaded', accession='GCA_{:09d}.1'.format(i))
+        self.events_path = stream.path
+        read = list(events.read_events(self.events_path))
+
+        self.assertEqual(len(read), 250)
+        self.assertEqual(read[-1][0]['accession'], 'GCA_000000249.1')
+        self.assertEqual(read[-1][1], os.path.getsize(self.events_path))
+        self.assertEqual(read[0][0]['event'], 'downloaded')
+
+    def test_follow(self):
+
+        with events.EventStream(self.events_dir) as stream:
+            stream.emit('retry', accession='GCA_000007365.1')
+        self.events_path = stream.path
+        with open(self.events_path, 'a') as f:
+            f.write('{"event": "downl')
+        read = list(events.read_events(self.events_path))
+        offset = read[-1][1]
+        with open(self.events_path, 'a') as f:
+            f.write('oaded"}\n')
+
+        self.assertEqual(len(read), 1)
+        self.assertEqual(
+            [event for event, offset in
+             events.read_events(self.events_path, offset)],
+            [{'event': 'downloaded'}])
+
+    def test_file_per_worker(self):
+
+        with events.EventStream(self.events_dir) as stream:
+            stream.emit('downloaded', accession='GCA_000007365.1')
+        # another host writing to the same mirror
+        with open(os.path.join(self.events_dir, 'node2.1.jsonl'), 'w') as f:
+            f.write('{"event": "retry", "accession": "GCA_000007725.1"}\n')
+
+        self.assertEqual(os.path.basename(stream.path),
+                         '{}.jsonl'.format(stream.worker))
+        self.assertEqual(
+            sorted(event['accession'] for event in
+                   events.read_all_events(self.events_dir)),
+            ['GCA_000007365.1', 'GCA_000007725.1'])
+
+    def test_one_handler(self):
+
+        info_dir, slurm, out, logger = config.instantiate_path_vars(
+            self.genbank_mirror)
+        logger.info('after second setup')
+        config.stop_logger()
+
+        self.assertIs(logger, self.logger)
+        self.assertEqual(len(logger.handlers), 1)
+        logs = [f for f in os.listdir(self.info_dir) if f.startswith('log_')]
+        text = ''
+        for log in logs:
+            with open(os.path.join(self.info_dir, log)) as f:
+                text += f.read()
+        self.assertEqual(text.count('after second setup'), 1)
+
+    def test_sync_latest_genomes(self):
+
+        remote = tempfile.mkdtemp(prefix='remote_')
+        server = stand_in.serve(remote)
+        accessions = ['GCA_000007365.1', 'GCA_000007725.1']
+        species = 'Buchnera_aphidicola'
+        os.mkdir(os.path.join(self.genbank_mirror, species))
+        for accession in accessions:
+            genome_id = '{}_ASM1v1'.format(accession)
+            os.mkdir(os.path.join(remote, genome_id))
+            with open(os.path.join(remote, genome_id,
+                                   '{}_genomic.fna.gz'.format(genome_id)),
+                      'wb') as f:
+                f.write(b'\0' * 100)
+        assembly_summary = pd.DataFrame(
+            {'ftp_path': ['{}/{}_ASM1v1'.format(server.url, a)
+                          for a in accessions],
+             'scientific_name': species,
+             'assembly_level': 'Complete Genome'},
+            index=accessions)
+        try:
+            sync.sync_latest_genomes(self.genbank_mirror, assembly_summary,
+                                     accessions, self.logger)
+        finally:
+            server.shutdown()
+            server.server_close()
+            shutil.rmtree(remote)
+        read = list(events.read_all_events(self.events_dir))
+
+        self.assertEqual(sorted(event['accession'] for event in read),
+                         accessions)
+        self.assertTrue(all(event['event'] == 'downloaded' and
+                            event['bytes'] == 100 for event in read))
+
+    def tearDown(self):
+        shutil.rmtree(self.genbank_mirror)
+
+
+if __name__ == '__main__':
+    unittest.main()
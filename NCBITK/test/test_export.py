@@ -0,0 +1,77 @@
+import io
+import os
+import shutil
+import tarfile
+import tempfile
+import unittest
+import pandas as pd
+from NCBITK import config, export, get_resources
+
+
+class TestExport(unittest.TestCase):
+    def setUp(self):
+
+        self.genbank_mirror = tempfile.mkdtemp(prefix='Genbank_')
+        self.path_vars = config.instantiate_path_vars(self.genbank_mirror)
+        self.info_dir, self.slurm, self.out, self.logger = self.path_vars
+        self.assembly_summary = pd.read_csv(
+            'NCBITK/test/resources/updated_assembly_summary.txt',
+            sep="\t",
+            index_col=0)
+        get_resources.clean_up_assembly_summary(self.assembly_summary)
+        self.species = 'Buchnera_aphidicola'
+        self.species_dir = os.path.join(self.genbank_mirror, self.species)
+        os.mkdir(self.species_dir)
+        self.accessions = self.assembly_summary.index[
+            self.assembly_summary.scientific_name == self.species].tolist()
+        self.local = sorted(self.accessions)[:3]
+        for accession in self.local:
+            fasta = os.path.join(self.species_dir,
+                                 '{}.fasta'.format(accession))
+            with open(fasta, 'w') as f:
+                f.write('>{0}_1 contig\nACGT\n>{0}_2\nGGCC'.format(accession))
+
+    def test_select_genomes(self):
+
+        selected = export.select_genomes(
+            self.assembly_summary, [self.species], ['Complete Genome'])
+
+        self.assertEqual(selected, sorted(selected))
+        self.assertTrue(selected)
+        self.assertTrue(set(selected) <= set(self.accessions))
+
+    def test_export_fasta(self):
+
+        out = io.BytesIO()
+        missing = export.export_genomes(
+            self.genbank_mirror, self.assembly_summary,
+            sorted(self.accessions), out, rename_headers=True, threads=2)
+        headers = [line for line in out.getvalue().decode().splitlines()
+                   if line.startswith('>')]
+
+        self.assertEqual(len(missing), len(self.accessions) - 3)
+        self.assertEqual(len(headers), 6)
+        self.assertTrue(headers[0].startswith('>{}_Buchnera'.format(
+            self.local[0])))
+        self.assertTrue(headers[0].endswith('|{}_1 contig'.format(
+            self.local[0])))
+
+    def test_export_tar(self):
+
+        out = io.BytesIO()
+        export.export_genomes(self.genbank_mirror, self.assembly_summary,
+                              self.local, out, output_format='tar')
+        out.seek(0)
+        with tarfile.open(fileobj=out) as tar:
+            names = tar.getnames()
+
+        self.assertEqual(names,
+                         ['{}.fasta'.format(accession)
+                          for accession in self.local])
+
+    def tearDown(self):
+        shutil.rmtree(self.genbank_mirror)
+
+
+if __name__ == '__main__':
+    unittest.main()
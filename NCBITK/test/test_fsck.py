@@ -0,0 +1,107 @@
+import gzip
+import os
+import shutil
+import tempfile
+import unittest
+import pandas as pd
+from NCBITK import config, fsck
+
+
+class TestFsck(unittest.TestCase):
+    def setUp(self):
+
+        self.genbank_mirror = tempfile.mkdtemp(prefix='Genbank_')
+        self.path_vars = config.instantiate_path_vars(self.genbank_mirror)
+        self.info_dir, self.slurm, self.out, self.logger = self.path_vars
+        self.assembly_summary = pd.read_csv(
+            'NCBITK/test/resources/updated_assembly_summary.txt',
+            sep="\t",
+            index_col=0)
+        self.species_dir = os.path.join(self.genbank_mirror,
+                                        'Buchnera_aphidicola')
+        self.incoming = os.path.join(self.genbank_mirror, 'incoming')
+        os.mkdir(self.species_dir)
+        os.mkdir(self.incoming)
+
+        fasta = b'>contig\nACGT\n'
+        compressed = gzip.compress(fasta)
+        self.files = {
+            'GCA_000007365.1.fasta': fasta,
+            'GCA_000007725.1_genomic.fna.gz': compressed,
+            'GCA_000009605.1_genomic.fna.gz': compressed[:-10],
+            'GCA_000009605.1.fasta': fasta,
+            'GCA_000090965.1.fasta': b'',
+            'GCA_000021065.1.fasta': b'<html>Not Found</html>',
+            'GCA_999999999.1.fasta': fasta,
+        }
+        for name, data in self.files.items():
+            with open(os.path.join(self.species_dir, name), 'wb') as f:
+                f.write(data)
+        with open(os.path.join(self.incoming, 'GCA_000010525.1_x.gz'),
+                  'wb') as f:
+            f.write(compressed[:-10])
+        self.part = os.path.join(self.species_dir,
+                                 'GCA_000183225.1_genomic.fna.gz.part')
+        with open(self.part, 'wb') as f:
+            f.write(compressed[:10])
+
+    def get_problems(self, problems):
+
+        return sorted((os.path.basename(p.path), p.problem)
+                      for p in problems)
+
+    def test_scan(self):
+
+        problems = fsck.scan(self.genbank_mirror, self.assembly_summary,
+                             processes=2)
+        expected = sorted([
+            ('GCA_000009605.1_genomic.fna.gz', fsck.TRUNCATED),
+            ('GCA_000009605.1_genomic.fna.gz', fsck.DUPLICATE),
+            ('GCA_000009605.1.fasta', fsck.DUPLICATE),
+            ('GCA_000090965.1.fasta', fsck.EMPTY),
+            ('GCA_000021065.1.fasta', fsck.NOT_FASTA),
+            ('GCA_999999999.1.fasta', fsck.ORPHAN),
+            ('GCA_000183225.1_genomic.fna.gz.part', fsck.PARTIAL),
+            ('GCA_000010525.1_x.gz', fsck.DEBRIS)])
+
+        self.assertEqual(self.get_problems(problems), expected)
+
+    def test_cache(self):
+
+        fsck.scan(self.genbank_mirror, self.assembly_summary)
+        cache = fsck.read_cache(self.genbank_mirror)
+        broken = os.path.join(self.species_dir, 'GCA_000021065.1.fasta')
+        # a stale cache entry is trusted while size and mtime match
+        cache[broken][2] = []
+        fsck.write_cache(self.genbank_mirror, cache)
+        problems = fsck.scan(self.genbank_mirror, self.assembly_summary)
+        self.assertNotIn(('GCA_000021065.1.fasta', fsck.NOT_FASTA),
+                         self.get_problems(problems))
+
+        os.utime(broken, ns=(0, 0))
+        problems = fsck.scan(self.genbank_mirror, self.assembly_summary)
+        self.assertIn(('GCA_000021065.1.fasta', fsck.NOT_FASTA),
+                      self.get_problems(problems))
+
+    def test_repair(self):
+
+        problems = fsck.scan(self.genbank_mirror, self.assembly_summary)
+        queue = fsck.write_repair_queue(self.genbank_mirror, problems)
+        removed = fsck.repair(problems, self.logger)
+
+        with open(queue) as f:
+            self.assertEqual(len(f.readlines()), len(removed))
+        self.assertEqual(len(removed), 3)
+        self.assertTrue(os.path.isfile(
+            os.path.join(self.species_dir, 'GCA_999999999.1.fasta')))
+        # resumable downloads and incoming are left alone
+        self.assertTrue(os.path.isfile(self.part))
+        self.assertTrue(os.path.isfile(
+            os.path.join(self.incoming, 'GCA_000010525.1_x.gz')))
+
+    def tearDown(self):
+        shutil.rmtree(self.genbank_mirror)
+
+
+if __name__ == '__main__':
+    unittest.main()
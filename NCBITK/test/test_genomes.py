@@ -0,0 +1,91 @@
+import os
+import shutil
+import tempfile
+import unittest
+from NCBITK import config, genomes
+
+
+class TestGenomes(unittest.TestCase):
+    def setUp(self):
+
+        self.genbank_mirror = tempfile.mkdtemp(prefix='Genbank_')
+        self.path_vars = config.instantiate_path_vars(self.genbank_mirror)
+        self.info_dir, self.slurm, self.out, self.logger = self.path_vars
+        self.species_dir = os.path.join(self.genbank_mirror,
+                                        'Buchnera_aphidicola')
+        os.mkdir(self.species_dir)
+        self.accession = 'GCA_000007365.1'
+        self.fasta = os.path.join(
+            self.species_dir,
+            'GCA_000007365.1_Buchnera_aphidicola_Sg_Complete_Genome.fasta')
+        self.chromosome = b'ACGTACGTAC' * 5 + b'GGG'
+        self.plasmid = b'TTTTCCCC'
+        with open(self.fasta, 'wb') as f:
+            f.write(b'>CP000001.1 Buchnera aphidicola chromosome\n')
+            for i in range(0, len(self.chromosome), 20):
+                f.write(self.chromosome[i:i + 20] + b'\n')
+            f.write(b'>CP000002.1 plasmid\n')
+            f.write(self.plasmid + b'\n')
+
+    def test_build_fai(self):
+
+        entries = genomes.build_fai(self.fasta)
+        chromosome, plasmid = entries
+
+        self.assertEqual(chromosome.name, 'CP000001.1')
+        self.assertEqual(chromosome.length, len(self.chromosome))
+        self.assertEqual(chromosome.linebases, 20)
+        self.assertEqual(chromosome.linewidth, 21)
+        self.assertEqual(plasmid.length, len(self.plasmid))
+
+    def test_index_genbank(self):
+
+        genomes.index_genbank(self.genbank_mirror)
+        fai = os.path.join(self.info_dir, 'fai',
+                           '{}.fai'.format(self.accession))
+        index = genomes.read_fai(fai)
+
+        self.assertEqual(list(index), ['CP000001.1', 'CP000002.1'])
+
+    def test_fetch(self):
+
+        with genomes.GenomeCollection(self.genbank_mirror) as collection:
+            self.assertIn(self.accession, collection)
+            whole = collection.fetch(self.accession, 'CP000001.1')
+            self.assertEqual(bytes(whole), self.chromosome)
+            within_line = collection.fetch(self.accession, 'CP000001.1', 2,
+                                           12)
+            self.assertIsInstance(within_line, memoryview)
+            self.assertEqual(bytes(within_line), self.chromosome[2:12])
+            within_line.release()
+            across_lines = collection.fetch(self.accession, 'CP000001.1',
+                                            15, 45)
+            self.assertEqual(across_lines, self.chromosome[15:45])
+            plasmid = collection.fetch(self.accession, 'CP000002.1')
+            self.assertEqual(bytes(plasmid), self.plasmid)
+            plasmid.release()
+
+    def test_fetch_out_of_range(self):
+
+        with genomes.GenomeCollection(self.genbank_mirror) as collection:
+            for start, end in [(-2, None), (10, 5), (0, 54), (60, None)]:
+                with self.assertRaises(ValueError):
+                    collection.fetch(self.accession, 'CP000001.1', start, end)
+            self.assertEqual(
+                bytes(collection.fetch(self.accession, 'CP000001.1', 53)),
+                b'')
+
+    def test_close_with_live_view(self):
+
+        collection = genomes.GenomeCollection(self.genbank_mirror)
+        with collection:
+            view = collection.fetch(self.accession, 'CP000001.1', 2, 12)
+        self.assertEqual(bytes(view), self.chromosome[2:12])
+        view.release()
+
+    def tearDown(self):
+        shutil.rmtree(self.genbank_mirror)
+
+
+if __name__ == '__main__':
+    unittest.main()
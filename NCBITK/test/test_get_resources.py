@@ -1,10 +1,13 @@
 from NCBITK import config
 from NCBITK import get_resources
+from NCBITK.test import stand_in
 
 import unittest
 import os
 import re
 import glob
+import hashlib
+import tarfile
 import tempfile
 import shutil
 import pandas as pd
@@ -51,5 +54,171 @@ class TestGetResources(unittest.TestCase):
         shutil.rmtree(self.genbank_mirror)
 
 
+class TestNormalize(unittest.TestCase):
+    def setUp(self):
+        self.local_assembly_summary = pd.read_csv(
+            'NCBITK/test/resources/assembly_summary.txt',
+            sep="\t",
+            index_col=0)
+
+    def test_normalize_column(self):
+        for col in ['organism_name', 'infraspecific_name', 'isolate',
+                    'assembly_level']:
+            column = self.local_assembly_summary[col]
+            expected = column.replace(
+                r'[\W]+', '_', regex=True).replace('[_]+', '_', regex=True)
+            normalized = get_resources.normalize_column(column)
+            self.assertTrue(normalized.equals(expected))
+            self.assertEqual(normalized.isnull().sum(),
+                             column.isnull().sum())
+
+
+    def test_normalized_values_kept(self):
+        info_dir = tempfile.mkdtemp(prefix='info_')
+        normalized_path = get_resources.get_normalized_path(info_dir)
+        try:
+            get_resources.clean_up_assembly_summary(
+                self.local_assembly_summary.copy(), normalized_path)
+            normalized = get_resources.read_normalized(normalized_path)
+            # stale entries are dropped and cached values are used as is
+            normalized['gone'] = 'gone'
+            normalized['Complete Genome'] = 'cached'
+            get_resources.write_normalized(normalized_path, normalized)
+            cleaned = self.local_assembly_summary.copy()
+            get_resources.clean_up_assembly_summary(cleaned, normalized_path)
+            kept = get_resources.read_normalized(normalized_path)
+        finally:
+            shutil.rmtree(info_dir)
+
+        self.assertEqual(normalized['Chromosome'], 'Chromosome')
+        self.assertNotIn('gone', kept)
+        self.assertIn('cached', cleaned.assembly_level.tolist())
+
+
+class TestStreamAssemblySummary(unittest.TestCase):
+    def setUp(self):
+        self.path_assembly_summary = \
+            'NCBITK/test/resources/updated_assembly_summary.txt'
+        self.assembly_summary = pd.read_csv(
+            self.path_assembly_summary, sep="\t", index_col=0)
+        self.species = 'Buchnera_aphidicola'
+        self.expected = self.assembly_summary[
+            self.assembly_summary.scientific_name == self.species]
+
+    def test_stream_by_taxid(self):
+        species_taxids = set(self.expected.species_taxid.tolist())
+        streamed = get_resources.stream_assembly_summary(
+            self.path_assembly_summary, species_taxids, skiprows=0,
+            chunksize=10)
+        self.assertEqual(streamed.index.tolist(),
+                         self.expected.index.tolist())
+
+    def test_stream_by_name(self):
+        streamed = get_resources.stream_assembly_summary(
+            self.path_assembly_summary, species=[self.species], skiprows=0,
+            chunksize=10)
+        self.assertEqual(streamed.index.tolist(),
+                         self.expected.index.tolist())
+        self.assertEqual(streamed.columns.tolist(),
+                         self.expected.columns.tolist())
+
+    def test_stream_from_url(self):
+        server = stand_in.serve('NCBITK/test/resources')
+        try:
+            streamed = get_resources.stream_assembly_summary(
+                '{}/updated_assembly_summary.txt'.format(server.url),
+                species=[self.species], skiprows=0, chunksize=10)
+        finally:
+            server.shutdown()
+            server.server_close()
+        self.assertEqual(streamed.index.tolist(),
+                         self.expected.index.tolist())
+
+    def test_get_species_taxids(self):
+        names = pd.DataFrame(
+            {'scientific_name': ['Buchnera aphidicola', 'Escherichia coli',
+                                 'Buchnera aphidicola str. Sg']},
+            index=pd.Index([9, 562, 198804], name='species_taxid'))
+        taxids = get_resources.get_species_taxids(
+            names, ['Buchnera_aphidicola', 'Escherichia coli'])
+        self.assertEqual(taxids, {9, 562})
+
+
+class TestTaxdump(unittest.TestCase):
+    def setUp(self):
+        self.genbank_mirror = tempfile.mkdtemp(prefix='Genbank_')
+        self.path_vars = config.instantiate_path_vars(self.genbank_mirror)
+        self.info_dir, self.slurm, self.out, self.logger = self.path_vars
+        self.remote = tempfile.mkdtemp(prefix='remote_')
+        self.write_taxdump([(1, 'root'), (2, 'Bacteria'),
+                            (562, 'Escherichia coli')])
+        self.server = stand_in.serve(self.remote)
+        self.url = '{}/taxdump.tar.gz'.format(self.server.url)
+
+    def write_taxdump(self, names):
+        dmp_dir = tempfile.mkdtemp(prefix='dmp_', dir=self.remote)
+        with open(os.path.join(dmp_dir, 'nodes.dmp'), 'w') as f:
+            for taxid, name in names:
+                parent = 1 if taxid < 562 else 2
+                f.write('{}\t|\t{}\t|\tno rank\t|\n'.format(taxid, parent))
+        with open(os.path.join(dmp_dir, 'names.dmp'), 'w') as f:
+            for taxid, name in names:
+                f.write('{}\t|\t{}\t|\t\t|\tscientific name\t|\n'.format(
+                    taxid, name))
+                f.write('{}\t|\t{} alias\t|\t\t|\tsynonym\t|\n'.format(
+                    taxid, name))
+        taxdump = os.path.join(self.remote, 'taxdump.tar.gz')
+        with tarfile.open(taxdump, 'w:gz') as tar:
+            for dmp in ['names.dmp', 'nodes.dmp']:
+                tar.add(os.path.join(dmp_dir, dmp), dmp)
+        shutil.rmtree(dmp_dir)
+        with open(taxdump, 'rb') as f:
+            md5 = hashlib.md5(f.read()).hexdigest()
+        with open('{}.md5'.format(taxdump), 'w') as f:
+            f.write('{}  taxdump.tar.gz\n'.format(md5))
+
+    def get_downloads(self):
+        return [path for client, path, byte_range in self.server.requests
+                if path.endswith('.tar.gz')]
+
+    def test_unchanged_taxdump(self):
+        names = get_resources.get_taxdump(self.genbank_mirror, self.url)
+        cached = get_resources.get_taxdump(self.genbank_mirror, self.url)
+
+        self.assertEqual(names.scientific_name.loc[562], 'Escherichia coli')
+        self.assertTrue(cached.equals(names))
+        self.assertEqual(len(self.get_downloads()), 1)
+        self.assertEqual(len(self.server.requests), 3)
+
+    def test_changed_taxdump(self):
+        get_resources.get_taxdump(self.genbank_mirror, self.url)
+        self.write_taxdump([(1, 'root'), (2, 'Bacteria'),
+                            (562, 'Escherichia coli'),
+                            (590, 'Salmonella')])
+        names = get_resources.get_taxdump(self.genbank_mirror, self.url)
+
+        self.assertEqual(len(self.get_downloads()), 2)
+        self.assertEqual(names.scientific_name.loc[590], 'Salmonella')
+
+    def test_offline(self):
+        names = get_resources.get_taxdump(self.genbank_mirror, self.url)
+        self.server.shutdown()
+        self.server.server_close()
+        cached = get_resources.get_taxdump(self.genbank_mirror, self.url)
+
+        self.assertTrue(cached.equals(names))
+
+        shutil.rmtree(self.info_dir)
+        os.makedirs(self.info_dir)
+        with self.assertRaises(OSError):
+            get_resources.get_taxdump(self.genbank_mirror, self.url)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.genbank_mirror)
+        shutil.rmtree(self.remote)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,193 @@
+import logging
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+import pandas as pd
+from NCBITK import config, events, lease, transfer
+
+
+def fake_fetch(genbank_mirror, assembly_summary, accession, logger,
+               connections=None, events=None):
+
+    species = assembly_summary.scientific_name.loc[accession]
+    species_dir = os.path.join(genbank_mirror, species)
+    os.makedirs(species_dir, exist_ok=True)
+    with open(os.path.join(species_dir, '{}.fasta'.format(accession)),
+              'w') as f:
+        f.write('>contig\nACGT\n')
+    with open(os.path.join(genbank_mirror, 'fetch_log.txt'), 'a') as f:
+        f.write('{}\t{}\n'.format(os.getpid(), accession))
+    time.sleep(0.01)
+
+
+def worker(genbank_mirror, assembly_summary, run_id):
+
+    logger = logging.getLogger('test_lease')
+    lease.run_worker(genbank_mirror, assembly_summary, run_id, logger,
+                     lease_time=30, fetch=fake_fetch, poll=0.05)
+
+
+def failing_fetch(genbank_mirror, assembly_summary, accession, logger,
+                  connections=None, events=None):
+
+    if accession.endswith('65.1'):
+        raise transfer.TransferError('md5 mismatch')
+    fake_fetch(genbank_mirror, assembly_summary, accession, logger)
+
+
+class TestLease(unittest.TestCase):
+    def setUp(self):
+
+        self.genbank_mirror = tempfile.mkdtemp(prefix='Genbank_')
+        self.path_vars = config.instantiate_path_vars(self.genbank_mirror)
+        self.info_dir, self.slurm, self.out, self.logger = self.path_vars
+        self.assembly_summary = pd.read_csv(
+            'NCBITK/test/resources/updated_assembly_summary.txt',
+            sep="\t",
+            index_col=0)
+        self.new_genomes = self.assembly_summary.index[
+            self.assembly_summary.scientific_name.notnull()].tolist()[:40]
+        self.run_id = lease.get_run_id(self.new_genomes)
+        self.run_dir = lease.publish_batches(
+            self.genbank_mirror, self.run_id, self.new_genomes, batch_size=5)
+
+    def read_fetch_log(self):
+
+        with open(os.path.join(self.genbank_mirror, 'fetch_log.txt')) as f:
+            return [line.split() for line in f]
+
+    def test_publish_batches(self):
+
+        again = lease.publish_batches(self.genbank_mirror, self.run_id,
+                                      self.new_genomes[:3], batch_size=1)
+        batches = lease.get_batches(self.run_dir)
+
+        self.assertEqual(again, self.run_dir)
+        self.assertEqual(len(batches), 8)
+        self.assertEqual(lease.read_batch(self.run_dir, batches[0]),
+                         sorted(self.new_genomes)[:5])
+
+    def test_multiple_workers(self):
+
+        processes = [
+            multiprocessing.Process(
+                target=worker,
+                args=(self.genbank_mirror, self.assembly_summary,
+                      self.run_id)) for i in range(3)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join(60)
+
+        fetched = self.read_fetch_log()
+        accessions = [accession for pid, accession in fetched]
+
+        self.assertTrue(lease.is_complete(self.run_dir))
+        self.assertEqual(sorted(accessions), sorted(self.new_genomes))
+        self.assertTrue(len(set(pid for pid, accession in fetched)) > 1)
+
+    def test_steal_expired_lease(self):
+
+        batch = lease.get_batches(self.run_dir)[0]
+        dead = lease.Lease(self.run_dir, batch, 'dead.1', -1)
+        self.assertTrue(dead.acquire())
+        live = lease.Lease(self.run_dir, lease.get_batches(self.run_dir)[1],
+                           'live.1', 60)
+        self.assertTrue(live.acquire())
+        self.assertFalse(
+            lease.Lease(self.run_dir, live.batch, 'other.1', 60).acquire())
+        live.release(done=False)
+
+        fetched = lease.run_worker(self.genbank_mirror, self.assembly_summary,
+                                   self.run_id, self.logger, fetch=fake_fetch)
+
+        self.assertEqual(sorted(fetched), sorted(self.new_genomes))
+        with self.assertRaises(lease.LeaseLost):
+            dead.renew()
+
+    def test_steal_race(self):
+
+        batch = lease.get_batches(self.run_dir)[0]
+        dead = lease.Lease(self.run_dir, batch, 'dead.1', -1)
+        self.assertTrue(dead.acquire())
+        expired = dead.read()
+        first = lease.Lease(self.run_dir, batch, 'first.1', 60)
+        second = lease.Lease(self.run_dir, batch, 'second.1', 60)
+        self.assertTrue(first.acquire())
+        # second read the expired holder before first replaced it
+        second.read = lambda path=None: \
+            expired if path is None else lease.Lease.read(first, path)
+
+        self.assertFalse(second.acquire())
+        self.assertEqual(first.read()[0], 'first.1')
+        first.renew()
+        with self.assertRaises(lease.LeaseLost):
+            lease.Lease(self.run_dir, batch, 'second.1', 60).renew()
+
+    def test_failed_fetch(self):
+
+        fetched = lease.run_worker(self.genbank_mirror, self.assembly_summary,
+                                   self.run_id, self.logger,
+                                   fetch=failing_fetch)
+        failed = [a for a in self.new_genomes if a.endswith('65.1')]
+
+        self.assertTrue(failed)
+        self.assertEqual(sorted(fetched + failed), sorted(self.new_genomes))
+        logged = [event['accession'] for event in events.read_all_events(
+            events.get_events_dir(self.genbank_mirror))
+                  if event['event'] == 'failed']
+        self.assertEqual(sorted(logged), sorted(failed))
+        self.assertTrue(lease.remove_run(self.run_dir))
+        self.assertFalse(lease.remove_run(self.run_dir))
+
+        # the next run publishes the failed genomes again
+        run_id = lease.get_run_id(failed)
+        lease.publish_batches(self.genbank_mirror, run_id, failed)
+        fetched = lease.run_worker(self.genbank_mirror, self.assembly_summary,
+                                   run_id, self.logger, fetch=fake_fetch)
+
+        self.assertEqual(sorted(fetched), sorted(failed))
+
+    def test_join_run(self):
+
+        first = lease.join_run(self.genbank_mirror, self.new_genomes[:10])
+        # a worker started later sees fewer new genomes
+        later = lease.join_run(self.genbank_mirror, self.new_genomes[5:10])
+
+        self.assertEqual(later, first)
+        self.assertTrue(lease.remove_run(
+            lease.get_run_dir(self.genbank_mirror, first)))
+        self.assertIsNone(lease.read_current(
+            lease.get_current_path(self.genbank_mirror)))
+        self.assertNotEqual(
+            lease.join_run(self.genbank_mirror, self.new_genomes[5:10]),
+            first)
+
+    def test_run_once(self):
+
+        lock = lease.get_resources_lock_path(self.genbank_mirror)
+        self.assertEqual(lease.run_once(lock, lambda: 1), (True, 1))
+        self.assertFalse(os.path.exists(lock))
+
+        open(lock, 'w').close()
+        os.utime(lock, (0, 0))
+        # a stale lock is taken over
+        self.assertEqual(lease.run_once(lock, lambda: 2), (True, 2))
+
+        # another worker is refreshing; wait for it instead
+        open(lock, 'w').close()
+        threading.Timer(0.1, os.remove, [lock]).start()
+        self.assertEqual(lease.run_once(lock, lambda: 3, poll=0.01),
+                         (False, None))
+
+    def tearDown(self):
+        shutil.rmtree(self.genbank_mirror)
+
+
+if __name__ == '__main__':
+    unittest.main()
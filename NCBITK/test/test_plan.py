@@ -0,0 +1,85 @@
+import os
+import shutil
+import tempfile
+import unittest
+import pandas as pd
+from NCBITK import config, plan, schedule
+from NCBITK.test import stand_in
+
+
+class TestPlan(unittest.TestCase):
+    def setUp(self):
+
+        self.genbank_mirror = tempfile.mkdtemp(prefix='Genbank_')
+        self.path_vars = config.instantiate_path_vars(self.genbank_mirror)
+        self.info_dir, self.slurm, self.out, self.logger = self.path_vars
+        self.remote = tempfile.mkdtemp(prefix='remote_')
+        self.server = stand_in.serve(self.remote)
+        self.sizes = {'GCA_000007365.1': 1000, 'GCA_000007725.1': 3000}
+        ftp_paths = []
+        for accession, size in sorted(self.sizes.items()):
+            genome_id = '{}_ASM1v1'.format(accession)
+            os.mkdir(os.path.join(self.remote, genome_id))
+            with open(os.path.join(self.remote, genome_id,
+                                   '{}_genomic.fna.gz'.format(genome_id)),
+                      'wb') as f:
+                f.write(b'\0' * size)
+            ftp_paths.append('{}/{}'.format(self.server.url, genome_id))
+        # no file on the server for the third genome
+        ftp_paths.append('{}/GCA_000009605.1_ASM1v1'.format(self.server.url))
+        self.accessions = sorted(self.sizes) + ['GCA_000009605.1']
+        self.assembly_summary = pd.DataFrame(
+            {'ftp_path': ftp_paths}, index=self.accessions)
+
+    def test_update_remote_sizes(self):
+
+        sizes, listed = plan.update_remote_sizes(
+            self.genbank_mirror, self.assembly_summary, self.accessions,
+            threads=2)
+        heads = len(self.server.heads)
+        cached, relisted = plan.update_remote_sizes(
+            self.genbank_mirror, self.assembly_summary, self.accessions)
+
+        self.assertEqual(sizes, self.sizes)
+        self.assertEqual(listed, 2)
+        self.assertEqual(heads, 3)
+        self.assertEqual(cached, self.sizes)
+        self.assertEqual(relisted, 0)
+        # only the genome that could not be listed is asked for again
+        self.assertEqual(len(self.server.heads), 4)
+        self.assertEqual(schedule.read_remote_sizes(self.genbank_mirror),
+                         self.sizes)
+
+    def test_plan_transfer(self):
+
+        plan.record_throughput(self.genbank_mirror, 1000, 1)
+        plan.record_throughput(self.genbank_mirror, 3000, 1)
+        transfer_plan = plan.plan_transfer(
+            self.genbank_mirror, self.assembly_summary, self.accessions)
+
+        # the unlisted genome is assumed to be of the median known size
+        self.assertEqual(transfer_plan.bytes, 7000)
+        self.assertEqual(transfer_plan.unknown, 1)
+        self.assertEqual(transfer_plan.throughput, 2000)
+        self.assertEqual(transfer_plan.seconds, 3.5)
+        self.assertEqual(transfer_plan.disk_needed,
+                         int(7000 * plan.COMPRESSION_RATIO))
+        self.assertTrue(plan.format_plan(transfer_plan))
+
+    def test_no_history(self):
+
+        self.assertIsNone(plan.read_throughput(self.genbank_mirror))
+        transfer_plan = plan.plan_transfer(
+            self.genbank_mirror, self.assembly_summary, self.accessions[:1])
+        self.assertEqual(transfer_plan.seconds,
+                         1000 / plan.DEFAULT_THROUGHPUT)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.genbank_mirror)
+        shutil.rmtree(self.remote)
+
+
+if __name__ == '__main__':
+    unittest.main()
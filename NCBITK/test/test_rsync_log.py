@@ -0,0 +1,86 @@
+import os
+import shutil
+import tempfile
+import unittest
+from NCBITK import config, events, rsync_log
+
+LOG = """\
+2024/03/01 10:00:00 [4242] receiving file list
+2024/03/01 10:00:04 [4242] cd+++++++++ GCA/000/007/365/GCA_000007365.1_ASM736v1/ 4096 0
+2024/03/01 10:00:06 [4242] >f+++++++++ GCA/000/007/365/GCA_000007365.1_ASM736v1/GCA_000007365.1_ASM736v1_genomic.fna.gz 189254 189254
+2024/03/01 10:00:09 [4242] >f.st...... GCA/000/007/725/GCA_000007725.1_ASM772v1/GCA_000007725.1_ASM772v1_genomic.fna.gz 176871 1024
+2024/03/01 10:00:09 [4242] rsync: [sender] link_stat "/GCA/000/009/605/GCA_000009605.1_ASM960v1/GCA_000009605.1_ASM960v1_genomic.fna.gz" (in genomes) failed: No such file or directory (2)
+2024/03/01 10:00:10 [4242] sent 1,482 bytes  received 190,911 bytes  total size 366,125
+2024/03/01 10:00:10 [4242] rsync error: some files/attrs were not transferred (see previous errors) (code 23) at main.c(1819) [generator=3.2.7]
+"""
+
+
+class TestRsyncLog(unittest.TestCase):
+    def setUp(self):
+
+        self.genbank_mirror = tempfile.mkdtemp(prefix='Genbank_')
+        self.path_vars = config.instantiate_path_vars(self.genbank_mirror)
+        self.info_dir, self.slurm, self.out, self.logger = self.path_vars
+        self.rsync_log = os.path.join(self.info_dir, 'rsync_test.out')
+        with open(self.rsync_log, 'w') as f:
+            f.write(LOG)
+
+    def test_parse(self):
+
+        log = rsync_log.read_rsync_logs([self.rsync_log])
+
+        self.assertEqual(len(log.files), 2)
+        self.assertEqual(log.files[0].size, 189254)
+        self.assertEqual(log.files[1].transferred, 1024)
+        self.assertEqual([f.seconds for f in log.files], [2.0, 3.0])
+        self.assertEqual(log.get_sizes(), {'GCA_000007365.1': 189254,
+                                           'GCA_000007725.1': 176871})
+        self.assertTrue(log.get_arrived()[0].startswith('GCA/000/007/365/'))
+        self.assertEqual(log.failures[0].path.split('/')[-2],
+                         'GCA_000009605.1_ASM960v1')
+        self.assertEqual(len(log.errors), 1)
+        self.assertEqual((log.sent, log.received), (1482, 190911))
+        self.assertEqual(log.seconds, 10.0)
+
+    def test_default_format(self):
+
+        log = rsync_log.RsyncLog().parse([
+            '2024/03/01 10:00:06 [1] >f+++++++++ GCA/x/GCA_000007365.1_a b'])
+
+        self.assertEqual(log.get_arrived(), ['GCA/x/GCA_000007365.1_a b'])
+        self.assertIsNone(log.files[0].size)
+        self.assertEqual(log.get_sizes(), {})
+
+    def test_write_stats(self):
+
+        log = rsync_log.read_rsync_logs([self.rsync_log, 'missing.out'])
+        stats = rsync_log.get_rsync_stats_path(self.genbank_mirror)
+        log.write_stats(stats)
+        log.log_stats(self.logger)
+
+        with open(stats) as f:
+            lines = [line.split('\t') for line in f]
+        self.assertEqual(len(lines), 2)
+        self.assertEqual(lines[0][0], '2024-03-01T10:00:06')
+
+    def test_emit_events(self):
+
+        log = rsync_log.read_rsync_logs([self.rsync_log])
+        events_dir = events.get_events_dir(self.genbank_mirror)
+        with events.EventStream(events_dir) as stream:
+            log.emit_events(stream)
+        emitted = list(events.read_all_events(events_dir))
+
+        self.assertEqual([e['event'] for e in emitted],
+                         ['downloaded', 'downloaded', 'failed'])
+        self.assertEqual(emitted[0]['accession'], 'GCA_000007365.1')
+        self.assertEqual(emitted[0]['genome_id'], 'GCA_000007365.1_ASM736v1')
+        self.assertEqual(emitted[1]['transferred'], 1024)
+        self.assertEqual(emitted[2]['accession'], 'GCA_000009605.1')
+
+    def tearDown(self):
+        shutil.rmtree(self.genbank_mirror)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+import os
+import shutil
+import tempfile
+import unittest
+import pandas as pd
+from NCBITK import config, schedule, sync
+
+
+class TestSchedule(unittest.TestCase):
+    def setUp(self):
+
+        self.genbank_mirror = tempfile.mkdtemp(prefix='Genbank_')
+        self.path_vars = config.instantiate_path_vars(self.genbank_mirror)
+        self.info_dir, self.slurm, self.out, self.logger = self.path_vars
+        self.assembly_summary = pd.DataFrame(
+            {'scientific_name': ['Escherichia_coli', 'Escherichia_coli',
+                                 'Bacillus_anthracis', 'Bacillus_anthracis',
+                                 'Escherichia_coli'],
+             'assembly_level': ['Contig', 'Complete Genome', 'Contig',
+                                'Complete_Genome', 'Complete Genome'],
+             'ftp_path': [
+                 'ftp://ftp.ncbi.nlm.nih.gov/genomes/all/GCA/000/000/00{0}/'
+                 'GCA_00000000{0}.1_ASM{0}v1'.format(i) for i in range(5)]},
+            index=['GCA_00000000{}.1'.format(i) for i in range(5)])
+        self.new_genomes = list(self.assembly_summary.index)
+        self.sizes = {a: (i + 1) * 100 for i, a in
+                      enumerate(self.new_genomes)}
+
+    def test_order_genomes(self):
+
+        ordered = schedule.order_genomes(self.assembly_summary,
+                                         self.new_genomes, self.sizes)
+        by_species = schedule.order_genomes(
+            self.assembly_summary, self.new_genomes, self.sizes,
+            species_list=['Bacillus_anthracis', 'Escherichia_coli'])
+
+        self.assertEqual(ordered, ['GCA_000000001.1', 'GCA_000000003.1',
+                                   'GCA_000000004.1', 'GCA_000000000.1',
+                                   'GCA_000000002.1'])
+        self.assertEqual(by_species[:2], ['GCA_000000003.1',
+                                          'GCA_000000002.1'])
+
+    def test_shard_genomes(self):
+
+        sizes = dict(self.sizes)
+        sizes['GCA_000000004.1'] = 10000
+        shards = schedule.shard_genomes(self.new_genomes, sizes, 2)
+        loads = sorted(sum(sizes[a] for a in shard) for shard in shards)
+
+        self.assertEqual(shards[0], ['GCA_000000004.1'])
+        self.assertEqual(loads, [1000, 10000])
+        self.assertEqual(sorted(sum(shards, [])), sorted(self.new_genomes))
+
+    def test_schedule_tiers(self):
+
+        tiers = schedule.schedule_tiers(
+            self.genbank_mirror, self.assembly_summary, self.new_genomes,
+            species_list=['Escherichia_coli'], shards=2)
+
+        self.assertEqual(tiers, [[['GCA_000000001.1'], ['GCA_000000004.1']],
+                                 [['GCA_000000000.1']],
+                                 [['GCA_000000003.1']],
+                                 [['GCA_000000002.1']]])
+
+    def test_remote_sizes_cache(self):
+
+        schedule.write_remote_sizes(self.genbank_mirror,
+                                    {'GCA_000000000.1': 10})
+        schedule.write_remote_sizes(self.genbank_mirror,
+                                    {'GCA_000000001.1': 30})
+        remote_sizes = schedule.read_remote_sizes(self.genbank_mirror)
+        expected = schedule.get_expected_sizes(self.new_genomes, remote_sizes)
+
+        self.assertEqual(expected['GCA_000000001.1'], 30)
+        self.assertEqual(expected['GCA_000000004.1'], 30)
+
+    def test_write_ftp_paths_order(self):
+
+        shards = schedule.schedule_genomes(self.genbank_mirror,
+                                           self.assembly_summary,
+                                           self.new_genomes)
+        ftp_paths_file = sync.write_ftp_paths(
+            self.genbank_mirror, self.assembly_summary, shards[0])
+        with open(ftp_paths_file) as f:
+            paths = f.read().splitlines()
+
+        self.assertEqual(len(shards), 1)
+        self.assertTrue(paths[0].startswith('GCA/000/000/001/'))
+        self.assertTrue(paths[0].endswith('_genomic.fna.gz'))
+
+    def tearDown(self):
+        shutil.rmtree(self.genbank_mirror)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+import os
+import random
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from NCBITK import config, curate, sketch
+
+
+class TestSketch(unittest.TestCase):
+    def setUp(self):
+
+        self.genbank_mirror = tempfile.mkdtemp(prefix='Genbank_')
+        self.path_vars = config.instantiate_path_vars(self.genbank_mirror)
+        self.info_dir, self.slurm, self.out, self.logger = self.path_vars
+        self.species_dir = os.path.join(self.genbank_mirror,
+                                        'Buchnera_aphidicola')
+        os.mkdir(self.species_dir)
+        rng = random.Random(0)
+        self.seq = ''.join(rng.choice('ACGT') for i in range(5000))
+        mutated = list(self.seq)
+        for i in range(0, len(mutated), 100):
+            mutated[i] = 'A' if mutated[i] != 'A' else 'C'
+        self.genomes = {
+            'GCA_000007365.1': self.seq,
+            'GCA_000007725.1': ''.join(mutated)}
+        for accession, seq in self.genomes.items():
+            fasta = os.path.join(self.species_dir,
+                                 '{}.fasta'.format(accession))
+            with open(fasta, 'w') as f:
+                f.write('>contig\n{}\n'.format(seq))
+
+    def test_hash_kmers_canonical(self):
+
+        seq = b'ACGTTGCANNACGGT'
+        complement = bytes.maketrans(b'ACGTN', b'TGCAN')
+        reverse = seq.translate(complement)[::-1]
+
+        forward_hashes = sketch.hash_kmers(seq, 5)
+        reverse_hashes = sketch.hash_kmers(reverse, 5)
+
+        self.assertEqual(len(forward_hashes), 5)
+        self.assertEqual(sorted(forward_hashes), sorted(reverse_hashes))
+
+    def test_sketch_genbank(self):
+
+        local_genomes = curate.get_local_genomes(self.genbank_mirror)
+        sketch_files, missing = sketch.get_sketch_files(
+            self.genbank_mirror, local_genomes)
+        self.assertEqual(sorted(missing), sorted(self.genomes))
+
+        sketch.sketch_genbank(self.genbank_mirror, local_genomes, missing,
+                              self.logger, processes=2)
+        sketch_files, missing = sketch.get_sketch_files(
+            self.genbank_mirror, local_genomes)
+        self.assertEqual(len(sketch_files), len(self.genomes))
+        self.assertFalse(missing)
+
+        k, a = sketch.read_sketch(sketch_files['GCA_000007365.1'])
+        k, b = sketch.read_sketch(sketch_files['GCA_000007725.1'])
+        self.assertEqual(k, 21)
+        self.assertTrue(np.all(np.diff(a.astype(float)) > 0))
+        self.assertEqual(sketch.mash_distance(a, a, k), 0)
+        distance = sketch.mash_distance(a, b, k)
+        self.assertTrue(0 < distance < 0.05)
+
+    def tearDown(self):
+        shutil.rmtree(self.genbank_mirror)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+import os
+import shutil
+import tempfile
+import unittest
+import click
+import pandas as pd
+from NCBITK import taxonomy
+from NCBITK.__main__ import select_taxa
+
+
+class TestTaxonomy(unittest.TestCase):
+    def setUp(self):
+
+        self.info_dir = tempfile.mkdtemp(prefix='info_')
+        self.nodes_dmp = os.path.join(self.info_dir, 'nodes.dmp')
+        self.names_dmp = os.path.join(self.info_dir, 'names.dmp')
+        # root -> Bacteria -> Enterobacteriaceae -> {Escherichia, Salmonella}
+        #      -> Bacteria -> Bacillus
+        nodes = [(1, 1, 'no rank'), (2, 1, 'superkingdom'),
+                 (543, 2, 'family'), (561, 543, 'genus'),
+                 (562, 561, 'species'), (590, 543, 'genus'),
+                 (28901, 590, 'species'), (1386, 2, 'genus'),
+                 (1392, 1386, 'species'), (83333, 562, 'no rank')]
+        names = [(1, 'root'), (2, 'Bacteria'), (543, 'Enterobacteriaceae'),
+                 (561, 'Escherichia'), (562, 'Escherichia coli'),
+                 (590, 'Salmonella'), (28901, 'Salmonella enterica'),
+                 (1386, 'Bacillus'), (1392, 'Bacillus anthracis'),
+                 (83333, 'Escherichia coli K-12')]
+        with open(self.nodes_dmp, 'w') as f:
+            for taxid, parent, rank in nodes:
+                f.write('{}\t|\t{}\t|\t{}\t|\n'.format(taxid, parent, rank))
+        with open(self.names_dmp, 'w') as f:
+            for taxid, name in names:
+                f.write('{}\t|\t{}\t|\t\t|\tscientific name\t|\n'.format(
+                    taxid, name))
+                f.write('{}\t|\t{} alias\t|\t\t|\tsynonym\t|\n'.format(
+                    taxid, name))
+        self.tree = taxonomy.build_taxonomy(
+            self.nodes_dmp, self.names_dmp,
+            taxonomy.get_taxonomy_path(self.info_dir))
+        self.assembly_summary = pd.DataFrame(
+            {'taxid': [83333, 28901, 1392, 999999],
+             'species_taxid': [562, 28901, 1392, 999999],
+             'scientific_name': ['Escherichia_coli', 'Salmonella_enterica',
+                                 'Bacillus_anthracis', None]},
+            index=['GCA_000005845.2', 'GCA_000006945.2', 'GCA_000008445.1',
+                   'GCA_000000001.1'])
+
+    def test_resolve(self):
+
+        self.assertEqual(self.tree.resolve('Enterobacteriaceae'), [543])
+        self.assertEqual(self.tree.resolve('escherichia_coli'), [562])
+        self.assertEqual(self.tree.resolve('543'), [543])
+        self.assertEqual(self.tree.resolve('Enterobacteriaceae alias'), [])
+
+    def test_subtree(self):
+
+        subtree = sorted(self.tree.subtree(543).tolist())
+
+        self.assertEqual(subtree, [543, 561, 562, 590, 28901, 83333])
+
+    def test_get_taxon_species(self):
+
+        tree = taxonomy.Taxonomy(taxonomy.get_taxonomy_path(self.info_dir))
+        species = taxonomy.get_taxon_species(self.assembly_summary, tree,
+                                             ['Enterobacteriaceae'])
+        accessions = taxonomy.get_taxon_accessions(self.assembly_summary,
+                                                   tree, ['1386'])
+
+        self.assertEqual(species, ('Escherichia_coli', 'Salmonella_enterica'))
+        self.assertEqual(accessions, ['GCA_000008445.1'])
+
+    def test_select_taxa(self):
+
+        species = select_taxa(self.info_dir, self.assembly_summary,
+                              ['Salmonella'])
+
+        self.assertEqual(species, ('Salmonella_enterica', ))
+        with self.assertRaises(click.BadParameter):
+            select_taxa(self.info_dir, self.assembly_summary, ['Salmonela'])
+        # a known taxon without genomes in the summary
+        with self.assertRaises(click.BadParameter):
+            select_taxa(self.info_dir, self.assembly_summary.iloc[:1],
+                        ['Bacillus'])
+        os.remove(taxonomy.get_taxonomy_path(self.info_dir))
+        with self.assertRaises(click.UsageError):
+            select_taxa(self.info_dir, self.assembly_summary, ['Salmonella'])
+
+    def tearDown(self):
+        shutil.rmtree(self.info_dir)
+
+
+if __name__ == '__main__':
+    unittest.main()
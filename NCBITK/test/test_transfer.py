@@ -0,0 +1,129 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import unittest
+from NCBITK import config, curate, sync, transfer
+from NCBITK.test import stand_in
+
+
+class TruncatingHandler(stand_in.RangeRequestHandler):
+    """
+    Advertise the whole file but close the connection after 400 bytes.
+    """
+
+    def do_GET(self):
+
+        self.server.requests.append((self.client_address, self.path,
+                                     self.headers.get('Range')))
+        self.send_response(200)
+        self.send_header('Content-Length', '1000')
+        self.end_headers()
+        self.wfile.write(b'x' * 400)
+        self.close_connection = True
+
+
+class TestTransfer(unittest.TestCase):
+    def setUp(self):
+
+        self.genbank_mirror = tempfile.mkdtemp(prefix='Genbank_')
+        self.path_vars = config.instantiate_path_vars(self.genbank_mirror)
+        self.info_dir, self.slurm, self.out, self.logger = self.path_vars
+        self.remote = tempfile.mkdtemp(prefix='remote_')
+        self.species = 'Buchnera_aphidicola'
+        os.mkdir(os.path.join(self.genbank_mirror, self.species))
+        self.genome_id = 'GCA_000007365.1_ASM736v1'
+        genome_dir = os.path.join(self.remote, self.genome_id)
+        os.mkdir(genome_dir)
+        self.name = '{}_genomic.fna.gz'.format(self.genome_id)
+        self.data = os.urandom(100000)
+        with open(os.path.join(genome_dir, self.name), 'wb') as f:
+            f.write(self.data)
+        with open(os.path.join(genome_dir, 'md5checksums.txt'), 'w') as f:
+            f.write('{}  ./{}\n'.format(
+                hashlib.md5(self.data).hexdigest(), self.name))
+        self.server = stand_in.serve(self.remote)
+        self.genome_url = '{}/{}'.format(self.server.url, self.genome_id)
+        self.dst = os.path.join(self.genbank_mirror, self.species, self.name)
+
+    def test_resume(self):
+
+        with open('{}.part'.format(self.dst), 'wb') as f:
+            f.write(self.data[:40000])
+
+        sync.grab_zipped_genome(self.genbank_mirror, self.species,
+                                self.genome_id, self.genome_url)
+
+        with open(self.dst, 'rb') as f:
+            self.assertEqual(f.read(), self.data)
+        self.assertFalse(os.path.exists('{}.part'.format(self.dst)))
+        self.assertIn('bytes=40000-',
+                      [r[2] for r in self.server.requests])
+
+    def test_persistent_connection(self):
+
+        with transfer.Transfer() as connections:
+            for i in range(3):
+                sync.grab_zipped_genome(self.genbank_mirror, self.species,
+                                        self.genome_id, self.genome_url,
+                                        connections=connections)
+        clients = set(r[0] for r in self.server.requests)
+
+        self.assertEqual(len(self.server.requests), 6)
+        self.assertEqual(len(clients), 1)
+
+    def test_checksum_mismatch(self):
+
+        url = '{}/{}'.format(self.genome_url, self.name)
+        with transfer.Transfer() as connections:
+            with self.assertRaises(transfer.TransferError):
+                connections.fetch(url, self.dst, md5='0' * 32)
+            with self.assertRaises(transfer.TransferError):
+                connections.fetch(url + '.missing', self.dst)
+
+        self.assertFalse(os.path.exists(self.dst))
+
+    def test_truncated_download(self):
+
+        server = stand_in.serve(self.remote, TruncatingHandler)
+        url = '{}/{}/{}'.format(server.url, self.genome_id, self.name)
+        try:
+            with transfer.Transfer() as connections:
+                with self.assertRaises(transfer.TransferError):
+                    connections.fetch(url, self.dst)
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        self.assertFalse(os.path.exists(self.dst))
+        self.assertEqual(os.path.getsize('{}.part'.format(self.dst)), 400)
+
+    def test_complete_part(self):
+
+        # a .part holding the whole file gets a 416 and is moved into place
+        with open('{}.part'.format(self.dst), 'wb') as f:
+            f.write(self.data)
+        url = '{}/{}'.format(self.genome_url, self.name)
+        with transfer.Transfer() as connections:
+            connections.fetch(url, self.dst)
+
+        with open(self.dst, 'rb') as f:
+            self.assertEqual(f.read(), self.data)
+
+    def test_partial_files_are_not_genomes(self):
+
+        part = os.path.join(self.genbank_mirror, self.species,
+                            'GCA_000007365.1_genomic.fasta.gz.part')
+        open(part, 'w').close()
+
+        self.assertFalse(curate.get_local_genomes(self.genbank_mirror))
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.genbank_mirror)
+        shutil.rmtree(self.remote)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+import os
+import shutil
+import tempfile
+import unittest
+import pandas as pd
+from NCBITK import config, curate, get_resources, views
+
+
+class TestViews(unittest.TestCase):
+    def setUp(self):
+
+        self.genbank_mirror = tempfile.mkdtemp(prefix='Genbank_')
+        self.view_dir = tempfile.mkdtemp(prefix='View_')
+        self.path_vars = config.instantiate_path_vars(self.genbank_mirror)
+        self.info_dir, self.slurm, self.out, self.logger = self.path_vars
+        self.assembly_summary = pd.read_csv(
+            'NCBITK/test/resources/updated_assembly_summary.txt',
+            sep="\t",
+            index_col=0)
+        get_resources.clean_up_assembly_summary(self.assembly_summary)
+        self.species = 'Buchnera_aphidicola'
+        self.species_dir = os.path.join(self.genbank_mirror, self.species)
+        os.mkdir(self.species_dir)
+        self.accessions = sorted(self.assembly_summary.index[
+            self.assembly_summary.scientific_name == self.species].tolist())
+        self.local = self.accessions[:3]
+        for accession in self.local:
+            self.add_genome(accession)
+
+    def add_genome(self, accession):
+
+        name = curate.rename_genome(accession, self.assembly_summary)
+        with open(os.path.join(self.species_dir, name), 'w') as f:
+            f.write('>{}\nACGT\n'.format(accession))
+
+    def get_links(self):
+
+        return sorted(f for f in os.listdir(self.view_dir)
+                      if not f.startswith('.'))
+
+    def test_refresh_view(self):
+
+        views.create_view(self.view_dir, self.genbank_mirror, [self.species])
+        added, removed = views.refresh_view(self.view_dir,
+                                            self.assembly_summary)
+        links = self.get_links()
+
+        self.assertEqual((added, removed), (3, 0))
+        self.assertEqual(links, sorted(
+            curate.rename_genome(a, self.assembly_summary)
+            for a in self.local))
+        for link in links:
+            path = os.path.join(self.view_dir, link)
+            self.assertTrue(os.path.islink(path))
+            self.assertEqual(os.path.basename(os.path.realpath(path)), link)
+        self.assertEqual(views.read_views(self.genbank_mirror),
+                         [os.path.abspath(self.view_dir)])
+
+        self.assertEqual(
+            views.refresh_view(self.view_dir, self.assembly_summary), (0, 0))
+
+        os.remove(curate.get_local_genomes(self.genbank_mirror)[
+            self.local[0]])
+        self.add_genome(self.accessions[3])
+        views.refresh_views(self.genbank_mirror, self.assembly_summary,
+                            self.logger)
+        self.assertEqual(len(self.get_links()), 3)
+        self.assertFalse(any(l.startswith(self.local[0])
+                             for l in self.get_links()))
+        self.assertTrue(any(l.startswith(self.accessions[3])
+                            for l in self.get_links()))
+
+    def test_hardlink_view(self):
+
+        views.create_view(self.view_dir, self.genbank_mirror,
+                          accessions=self.local[:2], link='hardlink')
+        views.refresh_view(self.view_dir, self.assembly_summary)
+        local_genomes = curate.get_local_genomes(self.genbank_mirror)
+
+        self.assertEqual(len(self.get_links()), 2)
+        for link in self.get_links():
+            path = os.path.join(self.view_dir, link)
+            self.assertFalse(os.path.islink(path))
+            accession = curate.parse_genome_id(link).group(0)
+            self.assertTrue(os.path.samefile(path, local_genomes[accession]))
+
+    def test_one_per_species(self):
+
+        views.create_view(self.view_dir, self.genbank_mirror,
+                          one_per_species=True)
+        views.refresh_view(self.view_dir, self.assembly_summary)
+
+        self.assertEqual(len(self.get_links()), 1)
+
+    def test_view_inside_mirror(self):
+
+        with self.assertRaises(ValueError):
+            views.create_view(os.path.join(self.genbank_mirror, 'view'),
+                              self.genbank_mirror)
+
+    def tearDown(self):
+        shutil.rmtree(self.genbank_mirror)
+        shutil.rmtree(self.view_dir)
+
+
+if __name__ == '__main__':
+    unittest.main()
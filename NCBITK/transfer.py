@@ -0,0 +1,246 @@
+import ftplib
+import hashlib
+import http.client
+import os
+import re
+from io import BytesIO
+from urllib.error import URLError
+from urllib.parse import urlparse
+
+BLOCK_SIZE = 1 << 20
+
+
+class TransferError(URLError):
+    pass
+
+
+def md5sum(path):
+
+    md5 = hashlib.md5()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(BLOCK_SIZE), b''):
+            md5.update(block)
+
+    return md5.hexdigest()
+
+
+def parse_md5checksums(text):
+    """
+    Map file names to digests from an NCBI md5checksums.txt.
+    """
+
+    md5s = {}
+    for line in text.splitlines():
+        fields = line.split()
+        if len(fields) == 2:
+            md5s[os.path.basename(fields[1])] = fields[0]
+
+    return md5s
+
+
+class Transfer(object):
+    """
+    Download files into place through .part files.  Partial files are
+    resumed with HTTP Range requests or FTP REST, and connections are kept
+    open and reused for files on the same host.  part_suffix names the
+    partial files; processes that may download the same file at once need
+    suffixes of their own.
+    """
+
+    def __init__(self, timeout=60, part_suffix='.part'):
+
+        self.timeout = timeout
+        self.part_suffix = part_suffix
+        self._connections = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _connect(self, url):
+
+        key = (url.scheme, url.hostname, url.port)
+        if key not in self._connections:
+            if url.scheme == 'ftp':
+                conn = ftplib.FTP(timeout=self.timeout)
+                conn.connect(url.hostname, url.port or 21)
+                conn.login()
+                conn.voidcmd('TYPE I')
+            elif url.scheme == 'https':
+                conn = http.client.HTTPSConnection(
+                    url.hostname, url.port, timeout=self.timeout)
+            else:
+                conn = http.client.HTTPConnection(
+                    url.hostname, url.port, timeout=self.timeout)
+            self._connections[key] = conn
+
+        return self._connections[key]
+
+    def _drop(self, url):
+
+        conn = self._connections.pop((url.scheme, url.hostname, url.port),
+                                     None)
+        if conn is not None:
+            try:
+                conn.close()
+            except (OSError, EOFError):
+                pass
+
+    def _retry(self, func, url, f):
+        """
+        Write url to f with a pooled connection, reconnecting once if the
+        server closed it while idle.  Both attempts resume from f.tell().
+        Returns what func returns, for the getters the total size of the
+        remote file when the server reports it.
+        """
+
+        try:
+            return func(self._connect(url), url, f)
+        except (http.client.RemoteDisconnected, http.client.CannotSendRequest,
+                ConnectionError, EOFError, ftplib.error_temp):
+            self._drop(url)
+            return func(self._connect(url), url, f)
+
+    def _ftp_get(self, conn, url, f):
+
+        offset = f.tell()
+        try:
+            total = conn.size(url.path)
+        except ftplib.error_perm:
+            # SIZE not supported
+            total = None
+        try:
+            conn.retrbinary('RETR {}'.format(url.path), f.write,
+                            blocksize=BLOCK_SIZE, rest=offset or None)
+        except ftplib.error_perm as e:
+            raise TransferError('{}: {}'.format(url.geturl(), e))
+
+        return total
+
+    def _http_get(self, conn, url, f):
+
+        offset = f.tell()
+        headers = {'Range': 'bytes={}-'.format(offset)} if offset else {}
+        conn.request('GET', url.path, headers=headers)
+        response = conn.getresponse()
+        content_range = response.getheader('Content-Range', '')
+        if response.status == 416:
+            response.read()
+            # nothing left to send only when the .part is the whole file
+            match = re.match(r'bytes \*/(\d+)$', content_range)
+            if not match:
+                f.seek(0)
+                f.truncate()
+                raise TransferError('{}: HTTP 416 without a size'.format(
+                    url.geturl()))
+            return int(match.group(1))
+        if response.status == 206:
+            match = re.match(r'bytes \d+-\d+/(\d+)$', content_range)
+            total = int(match.group(1)) if match else None
+        elif response.status == 200:
+            length = response.getheader('Content-Length')
+            total = int(length) if length is not None else None
+            if offset:
+                f.seek(0)
+                f.truncate()
+        else:
+            response.read()
+            raise TransferError('{}: HTTP {}'.format(url.geturl(),
+                                                     response.status))
+        try:
+            for block in iter(lambda: response.read(BLOCK_SIZE), b''):
+                f.write(block)
+        except http.client.IncompleteRead as e:
+            # the server closed early; keep what arrived for a resume
+            f.write(e.partial)
+            conn.close()
+
+        return total
+
+    def _ftp_size(self, conn, url, sizes):
+
+        try:
+            sizes.append(conn.size(url.path))
+        except ftplib.error_perm as e:
+            raise TransferError('{}: {}'.format(url.geturl(), e))
+
+    def _http_size(self, conn, url, sizes):
+
+        conn.request('HEAD', url.path)
+        response = conn.getresponse()
+        response.read()
+        if response.status != 200:
+            raise TransferError('{}: HTTP {}'.format(url.geturl(),
+                                                     response.status))
+        sizes.append(int(response.getheader('Content-Length')))
+
+    def size(self, url):
+        """
+        Return the size of a remote file without downloading it.
+        """
+
+        sizes = []
+        url = urlparse(url)
+        get = self._ftp_size if url.scheme == 'ftp' else self._http_size
+        self._retry(get, url, sizes)
+
+        return sizes[0]
+
+    def read(self, url):
+        """
+        Return the contents of a small remote file.
+        """
+
+        f = BytesIO()
+        url = urlparse(url)
+        get = self._ftp_get if url.scheme == 'ftp' else self._http_get
+        self._retry(get, url, f)
+
+        return f.getvalue()
+
+    def fetch(self, url, dst, size=None, md5=None):
+        """
+        Download url to dst, resuming the partial file dst + part_suffix if
+        it exists.  dst is only created once the size, given or reported by
+        the server, and the md5 (when given) match.  A short download keeps
+        its partial file for the next attempt to resume.
+        """
+
+        part = '{}{}'.format(dst, self.part_suffix)
+        offset = os.path.getsize(part) if os.path.isfile(part) else 0
+        if size is not None and offset > size:
+            offset = 0
+
+        parsed = urlparse(url)
+        get = self._ftp_get if parsed.scheme == 'ftp' else self._http_get
+        with open(part, 'ab' if offset else 'wb') as f:
+            total = self._retry(get, parsed, f)
+
+        expected = size if size is not None else total
+        received = os.path.getsize(part)
+        if expected is not None and received != expected:
+            if received > expected:
+                os.remove(part)
+            raise TransferError('{}: expected {} bytes, have {}'.format(
+                url, expected, received))
+        if md5 is not None and md5sum(part) != md5:
+            os.remove(part)
+            raise TransferError('{}: md5 mismatch'.format(url))
+        os.replace(part, dst)
+
+        return dst
+
+    def close(self):
+
+        for key in list(self._connections):
+            conn = self._connections.pop(key)
+            try:
+                if isinstance(conn, ftplib.FTP):
+                    conn.quit()
+                else:
+                    conn.close()
+            except (OSError, EOFError, ftplib.Error):
+                pass
+
@@ -0,0 +1,230 @@
+import json
+import os
+
+from NCBITK import curate, export, schedule
+
+DEFINITION = '.ncbitk_view.json'
+MANIFEST = '.ncbitk_manifest.tsv'
+
+
+def get_views_path(genbank_mirror):
+    """
+    Views registered with the mirror, refreshed after each sync.
+    """
+
+    return os.path.join(genbank_mirror, '.info', 'views.txt')
+
+
+def read_views(genbank_mirror):
+
+    views_path = get_views_path(genbank_mirror)
+    if not os.path.isfile(views_path):
+        return []
+
+    with open(views_path) as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def register_view(genbank_mirror, view_dir):
+
+    views = read_views(genbank_mirror)
+    if view_dir in views:
+        return
+    views_path = get_views_path(genbank_mirror)
+    tmp = '{}.tmp'.format(views_path)
+    with open(tmp, 'w') as f:
+        for view in views + [view_dir]:
+            f.write('{}\n'.format(view))
+    os.replace(tmp, views_path)
+
+
+def create_view(view_dir, genbank_mirror, species=(), assembly_levels=(),
+                accessions=(), one_per_species=False, link='symlink'):
+    """
+    Write the definition of a view of the mirror to view_dir and register
+    it so that syncs keep it up to date.  view_dir may not be inside the
+    mirror, where its links would be taken for genomes.
+    """
+
+    view_dir = os.path.abspath(view_dir)
+    genbank_mirror = os.path.abspath(genbank_mirror)
+    if os.path.commonpath([view_dir, genbank_mirror]) == genbank_mirror:
+        raise ValueError('{} is inside {}'.format(view_dir, genbank_mirror))
+    if link not in ('symlink', 'hardlink'):
+        raise ValueError('Unknown link type {}'.format(link))
+
+    os.makedirs(view_dir, exist_ok=True)
+    definition = {
+        'genbank_mirror': genbank_mirror,
+        'species': sorted(species),
+        'assembly_levels': sorted(assembly_levels),
+        'accessions': sorted(accessions),
+        'one_per_species': one_per_species,
+        'link': link,
+    }
+    path = os.path.join(view_dir, DEFINITION)
+    with open('{}.tmp'.format(path), 'w') as f:
+        json.dump(definition, f, indent=2)
+    os.replace('{}.tmp'.format(path), path)
+    register_view(genbank_mirror, view_dir)
+
+    return definition
+
+
+def read_definition(view_dir):
+
+    with open(os.path.join(view_dir, DEFINITION)) as f:
+        return json.load(f)
+
+
+def read_manifest(view_dir):
+    """
+    The links in view_dir as {name: (accession, src, inode)}.
+    """
+
+    manifest = {}
+    path = os.path.join(view_dir, MANIFEST)
+    if not os.path.isfile(path):
+        return manifest
+
+    with open(path) as f:
+        for line in f:
+            name, accession, src, inode = line.rstrip('\n').split('\t')
+            manifest[name] = (accession, src, int(inode))
+
+    return manifest
+
+
+def write_manifest(view_dir, manifest):
+
+    path = os.path.join(view_dir, MANIFEST)
+    tmp = '{}.tmp'.format(path)
+    with open(tmp, 'w') as f:
+        for name, (accession, src, inode) in sorted(manifest.items()):
+            f.write('{}\t{}\t{}\t{}\n'.format(name, accession, src, inode))
+    os.replace(tmp, path)
+
+
+def pick_one_per_species(assembly_summary, accessions):
+    """
+    The most complete, most recently released genome of each species.
+    """
+
+    def released(accession):
+        if 'seq_rel_date' not in assembly_summary.columns:
+            return ''
+        seq_rel_date = assembly_summary.seq_rel_date.loc[accession]
+        return seq_rel_date if isinstance(seq_rel_date, str) else ''
+
+    def level(accession):
+        return schedule.get_level_rank(
+            assembly_summary.assembly_level.loc[accession])
+
+    # stable sorts: by level, then newest release, then accession
+    ordered = sorted(sorted(accessions), key=released, reverse=True)
+    picked = {}
+    for accession in sorted(ordered, key=level):
+        picked.setdefault(
+            assembly_summary.scientific_name.loc[accession], accession)
+
+    return sorted(picked.values())
+
+
+def select_view(definition, assembly_summary, local_genomes):
+    """
+    Accessions of local genomes that belong in the view.
+    """
+
+    selected = export.select_genomes(
+        assembly_summary, definition['species'],
+        definition['assembly_levels'], definition['accessions'])
+    selected = [a for a in selected if a in local_genomes]
+    if definition['one_per_species']:
+        selected = pick_one_per_species(assembly_summary, selected)
+
+    return selected
+
+
+def make_link(src, dst, link):
+
+    tmp = '{}.tmp'.format(dst)
+    if os.path.lexists(tmp):
+        os.remove(tmp)
+    if link == 'hardlink':
+        try:
+            os.link(src, tmp)
+        except OSError:
+            # across filesystems
+            os.symlink(src, tmp)
+    else:
+        os.symlink(src, tmp)
+    os.replace(tmp, dst)
+
+
+def refresh_view(view_dir, assembly_summary, local_genomes=None,
+                 logger=None):
+    """
+    Bring the links in view_dir in line with its definition.  Only links
+    whose genome was added, removed or replaced since the last refresh are
+    touched; the rest are checked against the manifest alone.  Returns the
+    number of links added and removed.
+    """
+
+    definition = read_definition(view_dir)
+    genbank_mirror = definition['genbank_mirror']
+    hardlink = definition['link'] == 'hardlink'
+    if local_genomes is None:
+        local_genomes = curate.get_local_genomes(genbank_mirror)
+    manifest = read_manifest(view_dir)
+    by_accession = {entry[0]: name for name, entry in manifest.items()}
+
+    wanted = {}
+    for accession in select_view(definition, assembly_summary,
+                                 local_genomes):
+        src = os.path.abspath(local_genomes[accession])
+        # hard links must follow a genome replaced under the same path
+        inode = os.stat(src).st_ino if hardlink else 0
+        name = by_accession.get(accession)
+        if name is None or manifest[name][1:] != (src, inode):
+            name = curate.rename_genome(accession, assembly_summary) or \
+                os.path.basename(src)
+        wanted[name] = (accession, src, inode)
+
+    removed = 0
+    for name, entry in manifest.items():
+        if wanted.get(name) == entry:
+            continue
+        try:
+            os.remove(os.path.join(view_dir, name))
+        except FileNotFoundError:
+            pass
+        removed += 1
+
+    added = 0
+    for name, entry in wanted.items():
+        if manifest.get(name) == entry:
+            continue
+        make_link(entry[1], os.path.join(view_dir, name), definition['link'])
+        added += 1
+
+    write_manifest(view_dir, wanted)
+    if logger is not None:
+        logger.info('View {}: {} link(s) added, {} removed'.format(
+            view_dir, added, removed))
+
+    return added, removed
+
+
+def refresh_views(genbank_mirror, assembly_summary, logger,
+                  local_genomes=None):
+    """
+    Refresh every view registered with the mirror that still exists.
+    """
+
+    if local_genomes is None:
+        local_genomes = curate.get_local_genomes(genbank_mirror)
+    for view_dir in read_views(genbank_mirror):
+        if not os.path.isfile(os.path.join(view_dir, DEFINITION)):
+            logger.info('View {} no longer exists'.format(view_dir))
+            continue
+        refresh_view(view_dir, assembly_summary, local_genomes, logger)